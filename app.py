@@ -1,43 +1,263 @@
-﻿from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+﻿import time
+BOOT_STARTED = time.perf_counter()
+from flask import Flask, Response, request, jsonify, render_template, session, redirect, url_for
 from flask_cors import CORS
 import logging
+import logging.handlers
+import random
 import functools
+import itertools
 import re
 import json
 from datetime import datetime
+from html import unescape as html_unescape
 import uuid
+import hashlib
+import hmac
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
-from collections import deque
+from collections import deque, OrderedDict, namedtuple
 import csv
 import io
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
+import importlib
 import os
 import sys
 import requests
-from bs4 import BeautifulSoup
-import time
-
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('freeisland.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from requests.adapters import HTTPAdapter
+import http.cookiejar
+import threading
+import queue
+import contextlib
+import contextvars
+import asyncio
+import atexit
+import codecs
+import zlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait as wait_futures, FIRST_COMPLETED
+import sqlite3
+
+
+# Imports pesados (Selenium, webdriver_manager, parser HTML, aiohttp) são carregados
+# só no primeiro uso para o cold start no Render servir /login rapidamente.
+LAZY_IMPORT_LOCK = threading.RLock()
+LAZY_IMPORT_TIMINGS = OrderedDict()
+
+
+class LazyImport:
+    """Referência a um módulo (ou atributo dele) importado no primeiro acesso"""
+
+    registry = []
+
+    def __init__(self, module, attr=None):
+        self.module = module
+        self.attr = attr
+        self.target = None
+        LazyImport.registry.append(self)
+
+    def resolve(self):
+        if self.target is None:
+            with LAZY_IMPORT_LOCK:
+                if self.target is None:
+                    start = time.perf_counter()
+                    already_loaded = self.module in sys.modules
+                    module = importlib.import_module(self.module)
+                    if self.module not in LAZY_IMPORT_TIMINGS:
+                        LAZY_IMPORT_TIMINGS[self.module] = {
+                            "import_ms": round((time.perf_counter() - start) * 1000, 1),
+                            "already_loaded": already_loaded,
+                            "loaded_after_boot_s": round(time.perf_counter() - BOOT_STARTED, 2),
+                        }
+                    self.target = getattr(module, self.attr) if self.attr else module
+        return self.target
+
+    def is_available(self):
+        try:
+            self.resolve()
+            return True
+        except ImportError:
+            return False
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+
+webdriver = LazyImport('selenium.webdriver')
+Service = LazyImport('selenium.webdriver.chrome.service', 'Service')
+Options = LazyImport('selenium.webdriver.chrome.options', 'Options')
+By = LazyImport('selenium.webdriver.common.by', 'By')
+WebDriverWait = LazyImport('selenium.webdriver.support.ui', 'WebDriverWait')
+# Em cláusulas except use TimeoutException.resolve() (precisa da classe real)
+TimeoutException = LazyImport('selenium.common.exceptions', 'TimeoutException')
+ChromeDriverManager = LazyImport('webdriver_manager.chrome', 'ChromeDriverManager')
+lxml_html = LazyImport('lxml.html')
+lxml_etree = LazyImport('lxml.etree')
+aiohttp = LazyImport('aiohttp')  # Engine assíncrona é opcional
+
+BOOT_PHASES = OrderedDict()
+
+
+def mark_boot_phase(name):
+    BOOT_PHASES[name] = round((time.perf_counter() - BOOT_STARTED) * 1000, 1)
+
+
+mark_boot_phase("imports")
+
+# Configuração de logging: formatação e I/O numa thread de fundo (QueueListener), arquivo
+# com rotação por tamanho e amostragem/limite por evento nos logs verbosos do hot path.
+# A rotação não é coordenada entre processos: um worker por instância (ver README, Processos)
+LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+LOG_FILE_PATH = os.environ.get('LOG_FILE_PATH', 'freeisland.log')
+LOG_FILE_MAX_BYTES = int(os.environ.get('LOG_FILE_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.environ.get('LOG_FILE_BACKUPS', '3'))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+# "chave=taxa": chave é o nome do evento do log_event ou o sufixo do logger (price, site, parser)
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', 'price=0.1,site=0.1,parser=0.25,html_parse=0.2,extraction_stage=0.2')
+LOG_RATE_LIMIT_PER_MINUTE = int(os.environ.get('LOG_RATE_LIMIT_PER_MINUTE', '600'))
+
+
+class JsonLogMessage:
+    """Mensagem do log_event: o json.dumps só acontece quando o handler formata (na thread do listener)"""
+
+    __slots__ = ('entry', 'event')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.event = entry["message"]
+
+    def __str__(self):
+        return json.dumps(self.entry, ensure_ascii=False, default=str)
+
+
+class LogSampler(logging.Filter):
+    """Amostragem e limite por minuto por chave de log; WARNING ou acima sempre passa"""
+
+    def __init__(self, sample_rates, rate_limit_per_minute, root_name):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limit = rate_limit_per_minute
+        self.root_prefix = root_name + '.'
+        self.lock = threading.Lock()
+        self.window = None
+        self.windows = {}
+        self.sampled_out = {}
+        self.rate_limited = {}
+
+    @staticmethod
+    def parse_rates(spec):
+        rates = {}
+        for item in spec.split(','):
+            key, _, rate = item.partition('=')
+            try:
+                rates[key.strip()] = max(0.0, min(1.0, float(rate)))
+            except ValueError:
+                continue
+        return rates
+
+    def key(self, record):
+        """Chave de cardinalidade limitada: evento, sufixo do logger, template %-style ou logger+nível"""
+        if isinstance(record.msg, JsonLogMessage):
+            return record.msg.event
+        if record.name.startswith(self.root_prefix):
+            return record.name[len(self.root_prefix):]
+        if record.args and isinstance(record.msg, str):
+            return record.msg
+        # Mensagem já formatada (pode conter URL, erro...): nunca vira chave
+        return f"{record.name}:{record.levelname}"
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = self.key(record)
+        rate = self.sample_rates.get(key)
+        if rate is not None and random.random() >= rate:
+            with self.lock:
+                self.sampled_out[key] = self.sampled_out.get(key, 0) + 1
+            return False
+        if self.rate_limit <= 0:
+            return True
+        window = int(time.time() // 60)
+        with self.lock:
+            if window != self.window:
+                # Minuto novo: as contagens anteriores não valem mais
+                self.window = window
+                self.windows = {}
+            count = self.windows.get(key, 0)
+            if count >= self.rate_limit:
+                self.rate_limited[key] = self.rate_limited.get(key, 0) + 1
+                return False
+            self.windows[key] = count + 1
+        return True
+
+    def stats(self):
+        with self.lock:
+            top = lambda counts: dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:15])
+            return {
+                "sample_rates": self.sample_rates,
+                "rate_limit_per_minute": self.rate_limit,
+                "sampled_out": top(self.sampled_out),
+                "rate_limited": top(self.rate_limited),
+            }
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler sem formatação no produtor; fila cheia descarta em vez de bloquear o request"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 logger = logging.getLogger(__name__)
+PRICE_LOGGER = logger.getChild('price')
+SITE_LOGGER = logger.getChild('site')
+PARSER_LOGGER = logger.getChild('parser')
+LOG_SAMPLER = LogSampler(LogSampler.parse_rates(LOG_SAMPLE_RATES), LOG_RATE_LIMIT_PER_MINUTE, logger.name)
+LOG_OUTPUT_HANDLERS = [
+    logging.handlers.RotatingFileHandler(LOG_FILE_PATH, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8'),
+    logging.StreamHandler()
+]
+for log_handler in LOG_OUTPUT_HANDLERS:
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+LOG_QUEUE = None
+LOG_QUEUE_HANDLER = None
+if LOG_ASYNC:
+    LOG_QUEUE = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    LOG_QUEUE_HANDLER = NonBlockingQueueHandler(LOG_QUEUE)
+    LOG_QUEUE_HANDLER.addFilter(LOG_SAMPLER)
+    LOG_LISTENER = logging.handlers.QueueListener(LOG_QUEUE, *LOG_OUTPUT_HANDLERS, respect_handler_level=True)
+    LOG_LISTENER.start()
+    # stop() drena a fila antes de sair
+    atexit.register(LOG_LISTENER.stop)
+    logging.basicConfig(level=logging.INFO, handlers=[LOG_QUEUE_HANDLER])
+else:
+    for log_handler in LOG_OUTPUT_HANDLERS:
+        log_handler.addFilter(LOG_SAMPLER)
+    logging.basicConfig(level=logging.INFO, handlers=LOG_OUTPUT_HANDLERS)
+
+
+def logging_stats():
+    return {
+        "async": LOG_ASYNC,
+        "file": LOG_FILE_PATH,
+        "max_bytes": LOG_FILE_MAX_BYTES,
+        "backups": LOG_FILE_BACKUPS,
+        "queue_depth": LOG_QUEUE.qsize() if LOG_QUEUE is not None else None,
+        "queue_dropped": LOG_QUEUE_HANDLER.dropped if LOG_QUEUE_HANDLER is not None else None,
+        **LOG_SAMPLER.stats(),
+    }
 
 IS_PRODUCTION = os.environ.get('RENDER') == 'true'
-BASE_SCRAPE_DELAY_SECONDS = int(os.environ.get('SCRAPE_BASE_DELAY_SECONDS', '5'))
-PROD_SCRAPE_DELAY_SECONDS = int(os.environ.get('SCRAPE_PROD_DELAY_SECONDS', '0'))
 # Versionamento:
 # correção -> 0.0.1 | coisa nova -> 0.1.0 | estrutura completamente nova -> 1.0.0
 # Atualize o arquivo VERSION a cada push.
@@ -55,6 +275,118 @@ ALWAYS_USE_SELENIUM = os.environ.get('ALWAYS_USE_SELENIUM', 'false').lower() in
 AMAZON_USE_SELENIUM_IN_PROD = os.environ.get('AMAZON_USE_SELENIUM_IN_PROD', 'false').lower() in ('1', 'true', 'yes')
 MERCADOLIVRE_USE_SELENIUM_IN_PROD = os.environ.get('MERCADOLIVRE_USE_SELENIUM_IN_PROD', 'false').lower() in ('1', 'true', 'yes')
 USE_UNDETECTED_IN_PROD = os.environ.get('USE_UNDETECTED_IN_PROD', 'false').lower() in ('1', 'true', 'yes')
+# Startup: 'lazy' adia imports pesados e o Chrome até o primeiro uso; 'eager' carrega tudo no boot
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'lazy' if IS_PRODUCTION else 'eager').lower()
+STARTUP_BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS', '1500'))
+# Rate limit por site (token bucket): rajada máxima e reposição em requisições por minuto
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RATE_LIMIT_AMAZON_BURST = float(os.environ.get('RATE_LIMIT_AMAZON_BURST', '4'))
+RATE_LIMIT_AMAZON_PER_MINUTE = float(os.environ.get('RATE_LIMIT_AMAZON_PER_MINUTE', '20'))
+RATE_LIMIT_MERCADOLIVRE_BURST = float(os.environ.get('RATE_LIMIT_MERCADOLIVRE_BURST', '6'))
+RATE_LIMIT_MERCADOLIVRE_PER_MINUTE = float(os.environ.get('RATE_LIMIT_MERCADOLIVRE_PER_MINUTE', '30'))
+# Fast path de extração: JSON-LD/meta/blobs embutidos antes de montar o DOM
+EMBEDDED_FAST_PATH = os.environ.get('EMBEDDED_FAST_PATH', 'true').lower() in ('1', 'true', 'yes')
+# Download em streaming das páginas de produto: para quando os markers apareceram (+ margem) ou no teto
+STREAM_FETCH_ENABLED = os.environ.get('STREAM_FETCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+STREAM_FETCH_CHUNK_BYTES = int(os.environ.get('STREAM_FETCH_CHUNK_BYTES', str(16 * 1024)))
+STREAM_FETCH_TAIL_BYTES = int(os.environ.get('STREAM_FETCH_TAIL_BYTES', str(64 * 1024)))
+STREAM_FETCH_MAX_BYTES = int(os.environ.get('STREAM_FETCH_MAX_BYTES', str(1536 * 1024)))
+# Pool HTTP compartilhado: número de hosts mantidos e conexões keep-alive por host
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+HTTP_POOL_BLOCK = os.environ.get('HTTP_POOL_BLOCK', 'false').lower() in ('1', 'true', 'yes')
+# Cache de resultados por identidade do produto (ASIN / MLB)
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '256'))
+RESULT_CACHE_AMAZON_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_AMAZON_TTL_SECONDS', '600'))
+RESULT_CACHE_MERCADOLIVRE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_MERCADOLIVRE_TTL_SECONDS', '600'))
+# Cache persistente (SQLite) de resolução de links encurtados/sociais
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RESOLVE_CACHE_PATH = os.environ.get('RESOLVE_CACHE_PATH', os.path.join(APP_DIR, 'resolve_cache.sqlite3'))
+RESOLVE_CACHE_TTL_SECONDS = int(os.environ.get('RESOLVE_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+RESOLVE_CACHE_NEGATIVE_TTL_SECONDS = int(os.environ.get('RESOLVE_CACHE_NEGATIVE_TTL_SECONDS', '900'))
+RESOLVE_CACHE_MAX_ENTRIES = int(os.environ.get('RESOLVE_CACHE_MAX_ENTRIES', '5000'))
+# Estatísticas por seletor/estágio das cadeias de extração (persistidas) e reordenação adaptativa
+SELECTOR_STATS_PATH = os.environ.get('SELECTOR_STATS_PATH', os.path.join(APP_DIR, 'selector_stats.sqlite3'))
+ADAPTIVE_SELECTOR_ORDER = os.environ.get('ADAPTIVE_SELECTOR_ORDER', 'true').lower() in ('1', 'true', 'yes')
+SELECTOR_STATS_MIN_SAMPLES = int(os.environ.get('SELECTOR_STATS_MIN_SAMPLES', '20'))
+SELECTOR_STATS_DECAY = float(os.environ.get('SELECTOR_STATS_DECAY', '0.05'))
+SELECTOR_STATS_FLUSH_SECONDS = int(os.environ.get('SELECTOR_STATS_FLUSH_SECONDS', '30'))
+# Cache das linhas recentes servidas em /data (poll do dashboard) com ETag/304
+DATA_CACHE_TTL_SECONDS = float(os.environ.get('DATA_CACHE_TTL_SECONDS', '10'))
+# Feed ao vivo (SSE) do dashboard: um único poller compartilhado por todas as abas abertas
+SSE_ENABLED = os.environ.get('SSE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SSE_POLL_SECONDS = float(os.environ.get('SSE_POLL_SECONDS', '15'))
+SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', '4'))
+SSE_STREAM_MAX_SECONDS = int(os.environ.get('SSE_STREAM_MAX_SECONDS', '300'))
+SSE_KEEPALIVE_SECONDS = float(os.environ.get('SSE_KEEPALIVE_SECONDS', '15'))
+SSE_ROWS_LIMIT = int(os.environ.get('SSE_ROWS_LIMIT', '20'))
+# Espelho local (SQLite) dos produtos para o sync incremental /data/changes
+PRODUCT_MIRROR_PATH = os.environ.get('PRODUCT_MIRROR_PATH', os.path.join(APP_DIR, 'product_mirror.sqlite3'))
+PRODUCT_MIRROR_SYNC_SECONDS = float(os.environ.get('PRODUCT_MIRROR_SYNC_SECONDS', '30'))
+PRODUCT_MIRROR_REFRESH_ROWS = int(os.environ.get('PRODUCT_MIRROR_REFRESH_ROWS', '100'))
+# Varredura completa (alterações em linhas antigas e deleções) no máximo a cada N segundos
+PRODUCT_MIRROR_RECONCILE_SECONDS = float(os.environ.get('PRODUCT_MIRROR_RECONCILE_SECONDS', '600'))
+CHANGES_MAX_LIMIT = int(os.environ.get('CHANGES_MAX_LIMIT', '1000'))
+# Exportações: páginas por keyset em criado_em, streamadas sem limite de linhas
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', '1000'))
+EXPORT_PAGE_TIMEOUT_SECONDS = int(os.environ.get('EXPORT_PAGE_TIMEOUT_SECONDS', '30'))
+# Spool local (SQLite) do /save: grava e responde na hora; um flusher envia em lotes ao Supabase
+SAVE_SPOOL_ENABLED = os.environ.get('SAVE_SPOOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SAVE_SPOOL_PATH = os.environ.get('SAVE_SPOOL_PATH', os.path.join(APP_DIR, 'save_spool.sqlite3'))
+SAVE_SPOOL_BATCH_SIZE = int(os.environ.get('SAVE_SPOOL_BATCH_SIZE', '50'))
+SAVE_SPOOL_TIMEOUT_SECONDS = int(os.environ.get('SAVE_SPOOL_TIMEOUT_SECONDS', '10'))
+SAVE_SPOOL_POLL_SECONDS = int(os.environ.get('SAVE_SPOOL_POLL_SECONDS', '5'))
+SAVE_SPOOL_RETRY_BASE_SECONDS = float(os.environ.get('SAVE_SPOOL_RETRY_BASE_SECONDS', '2'))
+SAVE_SPOOL_RETRY_MAX_SECONDS = float(os.environ.get('SAVE_SPOOL_RETRY_MAX_SECONDS', '300'))
+SAVE_SPOOL_MAX_ATTEMPTS = int(os.environ.get('SAVE_SPOOL_MAX_ATTEMPTS', '20'))
+# Coluna (com índice único em produtos) que recebe o id gerado no enqueue: reenvios viram no-op
+# via on_conflict + resolution=ignore-duplicates. Vazio desliga a deduplicação
+SAVE_IDEMPOTENCY_COLUMN = os.environ.get('SAVE_IDEMPOTENCY_COLUMN', 'save_id').strip()
+SAVE_MAX_ROW_BYTES = int(os.environ.get('SAVE_MAX_ROW_BYTES', '65536'))
+# /scrape/batch: pool de workers e limite de scrapes simultâneos por site
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', '50'))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '8'))
+BATCH_AMAZON_CONCURRENCY = int(os.environ.get('BATCH_AMAZON_CONCURRENCY', '3'))
+BATCH_MERCADOLIVRE_CONCURRENCY = int(os.environ.get('BATCH_MERCADOLIVRE_CONCURRENCY', '3'))
+BATCH_TIMEOUT_SECONDS = int(os.environ.get('BATCH_TIMEOUT_SECONDS', '110'))
+# Duração estimada de um scrape depois de obter o token: itens cujo token sai tarde demais viram rate_limited
+BATCH_SCRAPE_ESTIMATE_SECONDS = float(os.environ.get('BATCH_SCRAPE_ESTIMATE_SECONDS', '10'))
+# Engine de scraping: 'sync' (requests + Selenium) ou 'async' (asyncio/aiohttp, só caminho requests)
+SCRAPE_ENGINE = os.environ.get('SCRAPE_ENGINE', 'sync').lower()
+ASYNC_MAX_CONCURRENT_SCRAPES = int(os.environ.get('ASYNC_MAX_CONCURRENT_SCRAPES', '200'))
+ASYNC_AMAZON_CONCURRENCY = int(os.environ.get('ASYNC_AMAZON_CONCURRENCY', '50'))
+ASYNC_MERCADOLIVRE_CONCURRENCY = int(os.environ.get('ASYNC_MERCADOLIVRE_CONCURRENCY', '50'))
+ASYNC_LIMIT_PER_HOST = int(os.environ.get('ASYNC_LIMIT_PER_HOST', '20'))
+ASYNC_SCRAPE_TIMEOUT_SECONDS = int(os.environ.get('ASYNC_SCRAPE_TIMEOUT_SECONDS', '60'))
+# Pool de WebDrivers: tamanho, reciclagem após N páginas e health check em background
+SELENIUM_POOL_SIZE = int(os.environ.get('SELENIUM_POOL_SIZE', '1' if IS_PRODUCTION else '2'))
+SELENIUM_DRIVER_MAX_PAGES = int(os.environ.get('SELENIUM_DRIVER_MAX_PAGES', '50'))
+SELENIUM_LEASE_TIMEOUT_SECONDS = int(os.environ.get('SELENIUM_LEASE_TIMEOUT_SECONDS', '30'))
+SELENIUM_HEALTH_CHECK_SECONDS = int(os.environ.get('SELENIUM_HEALTH_CHECK_SECONDS', '60'))
+# Hedging: se o requests não trouxer resultado completo em HEDGE_DELAY_SECONDS, o Selenium corre em paralelo
+HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+HEDGE_DELAY_SECONDS = float(os.environ.get('HEDGE_DELAY_SECONDS', '4'))
+HEDGE_TIMEOUT_SECONDS = float(os.environ.get('HEDGE_TIMEOUT_SECONDS', '60'))
+HEDGE_MAX_WORKERS = int(os.environ.get('HEDGE_MAX_WORKERS', '4'))
+# Threads de request por worker (mantenha igual ao --threads do Procfile); o executor do hedge
+# tem ao menos 2 por thread, senão a perna requests espera na fila atrás do Selenium de outros requests
+REQUEST_THREADS = int(os.environ.get('REQUEST_THREADS', '8'))
+# Navegação rápida: pageLoadStrategy eager, bloqueio de recursos via CDP e espera por seletores
+SELENIUM_FAST_NAVIGATION = os.environ.get('SELENIUM_FAST_NAVIGATION', 'true').lower() in ('1', 'true', 'yes')
+SELENIUM_EXTRA_BLOCKED_URLS = [u.strip() for u in os.environ.get('SELENIUM_EXTRA_BLOCKED_URLS', '').split(',') if u.strip()]
+# /metrics (formato texto do Prometheus): token Bearer opcional; sem token exige login
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Tracing por request: spans por estágio, guardados num store limitado (ver /diagnostics)
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRACE_STORE_MAX_TRACES = int(os.environ.get('TRACE_STORE_MAX_TRACES', '100'))
+TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', '200'))
+# Erros das últimas chamadas de scraping (um por chamada) expostos no /diagnostics
+SCRAPE_ERRORS_MAX = int(os.environ.get('SCRAPE_ERRORS_MAX', '20'))
+METRICS_LATENCY_BUCKETS = tuple(
+    float(b) for b in os.environ.get(
+        'METRICS_LATENCY_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,20,40,60'
+    ).split(',') if b.strip()
+)
 
 EVENT_BUFFER = deque(maxlen=250)
 METRICS = {
@@ -64,7 +396,319 @@ METRICS = {
     "save_fail": 0,
     "data_ok": 0,
     "data_fail": 0,
+    "hedge_fired": 0,
+    "hedge_skipped": 0,
+    "hedge_win_requests": 0,
+    "hedge_win_selenium": 0,
+    "hedge_no_complete": 0,
 }
+METRICS_LOCK = threading.Lock()
+
+
+class MetricsRegistry:
+    """Contadores, gauges e histogramas com labels, exportados no formato texto do Prometheus.
+
+    Tudo protegido por um lock só (as operações são curtas). Gauges que espelham o
+    estado de outros componentes são lidos na hora do render, via callbacks.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.meta = {}
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.callbacks = []
+
+    @staticmethod
+    def label_key(labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name, kind, help_text):
+        self.meta[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, self.label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, self.label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, self.label_key(labels))
+        with self.lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+                    break
+            entry["sum"] += seconds
+            entry["count"] += 1
+
+    def gauge_callback(self, name, help_text, fn):
+        """fn() -> lista de (labels, valor), lida a cada render"""
+        self.describe(name, "gauge", help_text)
+        self.callbacks.append((name, fn))
+
+    def quantile(self, entry, q):
+        """Estimativa do quantil por interpolação linear dentro do bucket (como histogram_quantile)"""
+        if not entry["count"]:
+            return None
+        rank = q * entry["count"]
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, entry["buckets"]):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * ((rank - seen) / count)
+            seen += count
+            lower = bound
+        return self.buckets[-1] if self.buckets else None
+
+    def summary(self, name, order=("stage", "site", "outcome")):
+        """p50/p95/p99 (ms) por combinação de labels ("stage/site/outcome"), para o /diagnostics"""
+        with self.lock:
+            entries = [(labels, dict(entry, buckets=list(entry["buckets"])))
+                       for (metric, labels), entry in self.histograms.items() if metric == name]
+        result = {}
+        for labels, entry in sorted(entries):
+            stats = {"count": entry["count"], "avg_ms": round(entry["sum"] / entry["count"] * 1000, 1)}
+            for q in (0.5, 0.95, 0.99):
+                value = self.quantile(entry, q)
+                stats[f"p{int(q * 100)}_ms"] = round(value * 1000, 1) if value is not None else None
+            values = dict(labels)
+            result["/".join(values.pop(k) for k in order if k in values) + "".join(f"/{v}" for v in values.values())] = stats
+        return result
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (
+            (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in pairs
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render(self):
+        gauges = {}
+        for name, fn in self.callbacks:
+            try:
+                for labels, value in fn():
+                    if value is not None:
+                        gauges[(name, self.label_key(labels))] = value
+            except Exception as e:
+                logger.debug("Falha lendo gauge %s: %s", name, e)
+        with self.lock:
+            counters = dict(self.counters)
+            gauges.update(self.gauges)
+            histograms = {key: dict(entry, buckets=list(entry["buckets"])) for key, entry in self.histograms.items()}
+        lines = []
+        for kind, series in (("counter", counters), ("gauge", gauges), ("histogram", histograms)):
+            for name in sorted({metric for metric, _ in series}):
+                help_text = self.meta.get(name, (kind, name))[1]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(series.items()):
+                    if metric != name:
+                        continue
+                    if kind != "histogram":
+                        lines.append(f"{name}{self.format_labels(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, value["buckets"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self.format_labels(labels, [('le', repr(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{self.format_labels(labels)} {round(value['sum'], 6)}")
+                    lines.append(f"{name}_count{self.format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS_REGISTRY = MetricsRegistry(METRICS_LATENCY_BUCKETS)
+METRICS_REGISTRY.describe("freeisland_events_total", "counter", "Eventos da aplicacao (os mesmos contadores de METRICS)")
+METRICS_REGISTRY.describe(
+    "freeisland_stage_duration_seconds", "histogram",
+    "Duracao por estagio (resolve, fetch, parse, selenium_navigate, supabase_save, supabase_fetch)"
+)
+METRICS_REGISTRY.describe("freeisland_scrape_duration_seconds", "histogram", "Duracao total do scrape por site, engine e resultado")
+
+
+def incr_metric(name, value=1):
+    """Incrementa um contador de METRICS de forma atômica (e o espelha no registry)"""
+    with METRICS_LOCK:
+        METRICS[name] = METRICS.get(name, 0) + value
+    METRICS_REGISTRY.inc("freeisland_events_total", value, event=name)
+
+
+class Trace:
+    """Spans (estágio, host, bytes, resultado, duração) de um request, identificado pelo request_id"""
+
+    def __init__(self, request_id, max_spans=200):
+        self.request_id = request_id
+        self.max_spans = max_spans
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.lock = threading.Lock()
+        self.spans = []
+        self.dropped = 0
+
+    def add_span(self, name, start, duration_s, **attrs):
+        span = {
+            "name": name,
+            "start_ms": round((start - self.start) * 1000, 1),
+            "duration_ms": round(duration_s * 1000, 1),
+            "thread": threading.current_thread().name,
+            **{k: v for k, v in attrs.items() if v is not None},
+        }
+        with self.lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return
+            self.spans.append(span)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self.start) * 1000, 1)
+
+    def to_dict(self, spans=True):
+        with self.lock:
+            span_list = sorted(self.spans, key=lambda sp: sp["start_ms"])
+        by_stage = {}
+        for span in span_list:
+            by_stage[span["name"]] = round(by_stage.get(span["name"], 0) + span["duration_ms"], 1)
+        result = {
+            "request_id": self.request_id,
+            "started_at": datetime.utcfromtimestamp(self.started_at).isoformat() + "Z",
+            "duration_ms": self.duration_ms,
+            "span_count": len(span_list),
+            "dropped_spans": self.dropped,
+            "by_stage_ms": by_stage,
+        }
+        if spans:
+            result["spans"] = span_list
+        return result
+
+
+class TraceStore:
+    """Últimos traces finalizados (LRU limitado), consultáveis por request_id"""
+
+    def __init__(self, max_traces=100):
+        self.max_traces = max_traces
+        self.lock = threading.Lock()
+        self.traces = OrderedDict()
+
+    def add(self, trace):
+        with self.lock:
+            self.traces[trace.request_id] = trace
+            self.traces.move_to_end(trace.request_id)
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+
+    def get(self, request_id):
+        with self.lock:
+            return self.traces.get(request_id)
+
+    def recent(self, limit=20):
+        with self.lock:
+            traces = list(self.traces.values())[-limit:]
+        return [trace.to_dict(spans=False) for trace in reversed(traces)]
+
+
+CURRENT_TRACE = contextvars.ContextVar('current_trace', default=None)
+TRACE_STORE = TraceStore(TRACE_STORE_MAX_TRACES)
+
+
+@contextlib.contextmanager
+def start_trace(request_id):
+    """Abre o trace do request no contexto atual; ao sair, fecha e guarda no TRACE_STORE"""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    trace = Trace(request_id, max_spans=TRACE_MAX_SPANS)
+    token = CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        CURRENT_TRACE.reset(token)
+        trace.finish()
+        TRACE_STORE.add(trace)
+
+
+async def run_in_trace(trace, coro):
+    """Roda a corrotina (e as tasks filhas) com o trace no contexto da task"""
+    CURRENT_TRACE.set(trace)
+    return await coro
+
+
+def submit_in_context(executor, fn, *args):
+    """executor.submit propagando contextvars (trace) para a thread do worker"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def record_span(name, start, **attrs):
+    trace = CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add_span(name, start, time.perf_counter() - start, **attrs)
+
+
+@contextlib.contextmanager
+def timed_stage(stage, site="-", host=None):
+    """Cronometra um estágio no histograma e como span do trace atual.
+
+    O chamador pode trocar labels["outcome"] e acrescentar atributos do span (ex.: "bytes").
+    """
+    labels = {"outcome": "ok"}
+    start = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels["outcome"] = "error"
+        raise
+    finally:
+        METRICS_REGISTRY.observe(
+            "freeisland_stage_duration_seconds", time.perf_counter() - start,
+            stage=stage, site=site, outcome=labels["outcome"]
+        )
+        record_span(stage, start, site=site, host=host, **labels)
+
+
+def resolution_outcome(status_code):
+    """Resultado da resolução de um link: error (sem resposta), dead (404/410) ou ok"""
+    if status_code is None:
+        return "error"
+    return "dead" if status_code in (404, 410) else "ok"
+
+
+def http_outcome(status_code):
+    if status_code is None:
+        return "error"
+    return "ok" if 200 <= status_code < 300 else f"http_{status_code}"
+
+
+def record_scrape(site, engine, start, result=None, outcome=None):
+    """Observa a duração total de um scrape (cache hit, ok ou erro) e devolve o resultado"""
+    if outcome is None:
+        outcome = "error" if not isinstance(result, dict) or 'error' in result else "ok"
+    METRICS_REGISTRY.observe(
+        "freeisland_scrape_duration_seconds", time.perf_counter() - start,
+        site=site, engine=engine, outcome=outcome
+    )
+    return result
+
+
+def site_label(url):
+    host = (urlparse(url).netloc or '').lower()
+    if 'amazon' in host or 'amzn' in host:
+        return 'amazon'
+    if 'mercadoli' in host or 'mercadolibre' in host or 'meli' in host:
+        return 'mercadolivre'
+    return 'other'
 
 
 def new_request_id():
@@ -95,6 +739,7 @@ def inject_app_meta():
 # Configurações Supabase
 SUPABASE_URL = get_env('SUPABASE_URL', default='', required=IS_PRODUCTION)
 SUPABASE_KEY_SERVICE = get_env('SUPABASE_SERVICE_KEY', default='', required=IS_PRODUCTION)
+SUPABASE_HOST = urlparse(SUPABASE_URL).netloc
 SUPABASE_HEADERS = {
     "apikey": SUPABASE_KEY_SERVICE,
     "Authorization": f"Bearer {SUPABASE_KEY_SERVICE}",
@@ -121,6 +766,10 @@ def error_response(code, message, http_status=500, details=None, request_id=None
 
 def log_event(level, message, **fields):
     # Log estruturado simples para facilitar diagnóstico no Render
+    if "request_id" not in fields:
+        trace = CURRENT_TRACE.get()
+        if trace is not None:
+            fields["request_id"] = trace.request_id
     entry = {"message": message, "app_version": APP_VERSION}
     if fields:
         entry["fields"] = fields
@@ -134,17 +783,1350 @@ def log_event(level, message, **fields):
         })
     except Exception:
         pass
-    logger.log(level, json.dumps(entry, ensure_ascii=False))
+    logger.log(level, JsonLogMessage(entry))
+
+
+class BlockAllCookiesPolicy(http.cookiejar.DefaultCookiePolicy):
+    """Impede que cookies de uma resposta vazem para os próximos scrapes"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class PooledHttpClient:
+    """Cliente HTTP compartilhado com pools keep-alive por host.
+
+    O HTTPAdapter (urllib3 PoolManager) é thread-safe e mantém um pool por host;
+    cada thread usa sua própria Session montada sobre os mesmos adapters, então
+    conexões quentes são reaproveitadas sem compartilhar estado de Session.
+    Cookies não persistem entre chamadas (mesmo comportamento de requests.request),
+    mas continuam valendo dentro de uma cadeia de redirects.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.local = threading.local()
+
+    def get_session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+            session.cookies.set_policy(BlockAllCookiesPolicy())
+            self.local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.get_session().request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        pools = []
+        try:
+            for key in list(self.adapter.poolmanager.pools.keys()):
+                pool = self.adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                pools.append({
+                    "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                    "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                })
+        except Exception:
+            pass
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "pool_block": self.pool_block,
+            "pools": pools,
+        }
+
+
+HTTP_CLIENT = PooledHttpClient(
+    pool_connections=HTTP_POOL_CONNECTIONS,
+    pool_maxsize=HTTP_POOL_MAXSIZE,
+    pool_block=HTTP_POOL_BLOCK
+)
+
+
+class ScrapeResultCache:
+    """Cache LRU em memória de resultados de scraping com TTL por site"""
+
+    def __init__(self, max_entries=256, ttl_by_site=None):
+        self.max_entries = max_entries
+        self.ttl_by_site = ttl_by_site or {}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry["expires_at"] <= time.time():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry["data"]), time.time() - entry["stored_at"]
+
+    def contains(self, key):
+        """Consulta sem mexer na ordem LRU nem nas estatísticas"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry["expires_at"] > time.time()
+
+    def set(self, key, site, data):
+        ttl = self.ttl_by_site.get(site, 0)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        now = time.time()
+        with self.lock:
+            self.entries[key] = {"data": dict(data), "stored_at": now, "expires_at": now + ttl}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": dict(self.ttl_by_site),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+RESULT_CACHE = ScrapeResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    ttl_by_site={
+        "amazon": RESULT_CACHE_AMAZON_TTL_SECONDS,
+        "mercadolivre": RESULT_CACHE_MERCADOLIVRE_TTL_SECONDS,
+    }
+)
+
+
+def sqlite_connect(path):
+    """Abre conexão SQLite compartilhável entre threads (acesso serializado por lock)"""
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.DatabaseError:
+        pass
+    return conn
+
+
+class RedirectCache:
+    """Cache em disco (SQLite) de URL de entrada -> URL final resolvida.
+
+    Sobrevive à reciclagem do worker do gunicorn (--max-requests). Links mortos
+    ficam em cache negativo com TTL curto; o tamanho é limitado descartando as
+    entradas usadas há mais tempo.
+    """
+
+    PRUNE_EVERY = 50
+
+    def __init__(self, path, ttl=604800, negative_ttl=900, max_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = None
+        self.disabled = ttl <= 0 or max_entries <= 0
+        self.writes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get_conn(self):
+        if self.conn is None and not self.disabled:
+            try:
+                self.conn = sqlite_connect(self.path)
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS resolved_urls ("
+                    "input_url TEXT PRIMARY KEY, site TEXT, resolved_url TEXT, ok INTEGER, "
+                    "created_at REAL, expires_at REAL, last_used REAL)"
+                )
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_resolved_urls_last_used ON resolved_urls(last_used)")
+                self.conn.commit()
+            except Exception as e:
+                log_event(logging.WARNING, "resolve_cache_disabled", path=self.path, error=str(e))
+                self.disabled = True
+                self.conn = None
+        return self.conn
+
+    def get(self, url):
+        """Retorna {'resolved_url', 'ok'} ou None quando ausente/expirado"""
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                return None
+            now = time.time()
+            try:
+                row = conn.execute(
+                    "SELECT resolved_url, ok, expires_at FROM resolved_urls WHERE input_url = ?", (url,)
+                ).fetchone()
+                if not row or row[2] <= now:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE resolved_urls SET last_used = ? WHERE input_url = ?", (now, url))
+                conn.commit()
+            except Exception as e:
+                log_event(logging.WARNING, "resolve_cache_read_failed", error=str(e))
+                return None
+            if row[1]:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+            return {"resolved_url": row[0], "ok": bool(row[1])}
+
+    def set(self, url, site, resolved_url, ok=True):
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                return
+            now = time.time()
+            ttl = self.ttl if ok else self.negative_ttl
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO resolved_urls "
+                    "(input_url, site, resolved_url, ok, created_at, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, site, resolved_url, 1 if ok else 0, now, now + ttl, now)
+                )
+                self.writes += 1
+                if self.writes % self.PRUNE_EVERY == 0:
+                    self.prune(conn, now)
+                conn.commit()
+            except Exception as e:
+                log_event(logging.WARNING, "resolve_cache_write_failed", error=str(e))
+
+    def prune(self, conn, now):
+        conn.execute("DELETE FROM resolved_urls WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM resolved_urls WHERE input_url IN ("
+            "SELECT input_url FROM resolved_urls ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self):
+        with self.lock:
+            size = None
+            conn = self.get_conn()
+            if conn is not None:
+                try:
+                    size = conn.execute("SELECT COUNT(*) FROM resolved_urls").fetchone()[0]
+                except Exception:
+                    size = None
+            return {
+                "enabled": not self.disabled,
+                "path": self.path,
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+            }
+
+
+RESOLVE_CACHE = RedirectCache(
+    RESOLVE_CACHE_PATH,
+    ttl=RESOLVE_CACHE_TTL_SECONDS,
+    negative_ttl=RESOLVE_CACHE_NEGATIVE_TTL_SECONDS,
+    max_entries=RESOLVE_CACHE_MAX_ENTRIES
+)
+
+
+class TokenBucket:
+    """Token bucket de um site; tokens podem ficar negativos para enfileirar reservas"""
+
+    def __init__(self, burst, per_minute):
+        self.capacity = max(1.0, float(burst))
+        self.rate = max(0.001, float(per_minute) / 60.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.granted = 0
+        self.delayed = 0
+        self.waited_total = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Consome um token e retorna quantos segundos esperar até ele estar disponível"""
+        with self.lock:
+            self.refill(time.monotonic())
+            self.tokens -= 1.0
+            self.granted += 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            if wait > 0:
+                self.delayed += 1
+                self.waited_total += wait
+            return wait
+
+    def wait_for(self, count):
+        """Segundos até a count-ésima reserva a partir de agora, sem consumir tokens"""
+        with self.lock:
+            self.refill(time.monotonic())
+            missing = count - self.tokens
+            return max(0.0, missing / self.rate)
+
+    def stats(self):
+        with self.lock:
+            self.refill(time.monotonic())
+            return {
+                "capacity": self.capacity,
+                "per_minute": round(self.rate * 60, 2),
+                "tokens": round(self.tokens, 2),
+                "current_wait_s": round(max(0.0, -self.tokens) / self.rate, 2),
+                "granted": self.granted,
+                "delayed": self.delayed,
+                "waited_total_s": round(self.waited_total, 2),
+            }
+
+
+class HostRateLimiter:
+    """Limita o ritmo de scrapes por site; só atrasa quando a cota do host acabou"""
+
+    def __init__(self, limits, enabled=True):
+        self.enabled = enabled
+        self.buckets = {site: TokenBucket(burst, per_minute) for site, (burst, per_minute) in limits.items()}
+
+    def reserve(self, site):
+        bucket = self.buckets.get(site)
+        if not self.enabled or bucket is None:
+            return 0.0
+        wait = bucket.reserve()
+        if wait > 0:
+            log_event(logging.INFO, "rate_limit_wait", site=site, wait_s=round(wait, 2))
+        return wait
+
+    def projected_wait(self, site, count):
+        """Espera estimada para count scrapes do site (0 se o site não é limitado)"""
+        bucket = self.buckets.get(site)
+        if not self.enabled or bucket is None:
+            return 0.0
+        return bucket.wait_for(count)
+
+    def acquire(self, site):
+        wait = self.reserve(site)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, site):
+        wait = self.reserve(site)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "sites": {site: bucket.stats() for site, bucket in self.buckets.items()},
+        }
+
+
+RATE_LIMITER = HostRateLimiter({
+    'amazon': (RATE_LIMIT_AMAZON_BURST, RATE_LIMIT_AMAZON_PER_MINUTE),
+    'mercadolivre': (RATE_LIMIT_MERCADOLIVRE_BURST, RATE_LIMIT_MERCADOLIVRE_PER_MINUTE),
+}, enabled=RATE_LIMIT_ENABLED)
+
+
+# Markers logados em *_requests_html_markers; o fetch em streaming para quando cada grupo
+# obrigatório (título, preço, imagem) tiver aparecido ao menos uma vez.
+AMAZON_HTML_MARKERS = {
+    'has_product_title': ('productTitle',),
+    'has_core_price': ('corePriceDisplay',),
+    'has_meta_price': ('property="product:price:amount"', 'property="og:price:amount"'),
+    'has_og_image': ('property="og:image"',),
+}
+AMAZON_STREAM_MARKERS = [
+    AMAZON_HTML_MARKERS['has_product_title'],
+    AMAZON_HTML_MARKERS['has_core_price'] + AMAZON_HTML_MARKERS['has_meta_price'],
+    AMAZON_HTML_MARKERS['has_og_image'],
+]
+MERCADOLIVRE_HTML_MARKERS = {
+    'has_ui_pdp_title': ('ui-pdp-title',),
+    'has_meta_price': ('itemprop="price"',),
+    'has_andes_money_amount': ('andes-money-amount',),
+    'has_og_image': ('property="og:image"',),
+}
+MERCADOLIVRE_STREAM_MARKERS = [
+    MERCADOLIVRE_HTML_MARKERS['has_ui_pdp_title'],
+    MERCADOLIVRE_HTML_MARKERS['has_meta_price'] + MERCADOLIVRE_HTML_MARKERS['has_andes_money_amount'],
+    MERCADOLIVRE_HTML_MARKERS['has_og_image'],
+]
+
+
+def html_markers(markers, html):
+    return {name: any(marker in html for marker in group) for name, group in markers.items()}
+
+
+class StreamedBody:
+    """Acumula o corpo em chunks e decide quando parar de ler"""
+
+    def __init__(self, markers, encoding=None, tail_bytes=STREAM_FETCH_TAIL_BYTES, max_bytes=STREAM_FETCH_MAX_BYTES):
+        try:
+            self.decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.pending = [tuple(group) for group in markers]
+        self.overlap_chars = max((len(m) for group in self.pending for m in group), default=1) - 1
+        self.tail_bytes = tail_bytes
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.overlap = ''
+        self.bytes_read = 0
+        self.stop_at = None
+        self.reason = 'eof'
+
+    def feed(self, chunk):
+        """Adiciona um chunk; True quando já dá para parar a leitura"""
+        self.bytes_read += len(chunk)
+        text = self.decoder.decode(chunk)
+        self.parts.append(text)
+        if self.pending:
+            # Só o chunk novo (mais a sobra do anterior) é varrido: markers podem cruzar chunks
+            window = self.overlap + text
+            self.pending = [group for group in self.pending if not any(m in window for m in group)]
+            self.overlap = window[-self.overlap_chars:] if self.overlap_chars else ''
+            if not self.pending:
+                self.stop_at = self.bytes_read + self.tail_bytes
+        if self.stop_at is not None and self.bytes_read >= self.stop_at:
+            self.reason = 'markers'
+            return True
+        if self.bytes_read >= self.max_bytes:
+            self.reason = 'byte_cap'
+            return True
+        return False
+
+    def finish(self):
+        self.parts.append(self.decoder.decode(b'', final=True))
+        return ''.join(self.parts)
+
+    def log(self, site, url, content_length=None, wire_bytes=None, **fields):
+        saved = None
+        if self.reason != 'eof' and content_length is not None and wire_bytes is not None:
+            saved = max(0, content_length - wire_bytes)
+        log_event(
+            logging.INFO,
+            "stream_fetch",
+            site=site,
+            reason=self.reason,
+            bytes_read=self.bytes_read,
+            wire_bytes=wire_bytes,
+            content_length=content_length,
+            bytes_saved=saved,
+            markers_missing=len(self.pending),
+            url=url,
+            **fields
+        )
+
+
+def fetch_product_page(url, markers, site, *, headers=None, timeout=12, client=None):
+    """GET de página de produto; em streaming lê só até os markers (retorna (response, html))"""
+    with timed_stage('fetch', site, host=urlparse(url).netloc) as stage:
+        response, html, stage["bytes"] = fetch_product_body(url, markers, site, headers=headers, timeout=timeout, client=client)
+        stage["outcome"] = http_outcome(response.status_code)
+        return response, html
+
+
+def fetch_product_body(url, markers, site, *, headers=None, timeout=12, client=None):
+    if not STREAM_FETCH_ENABLED:
+        response = request_with_retries('GET', url, headers=headers, timeout=timeout, allow_redirects=True, client=client)
+        return response, response.text or "", len(response.content or b"")
+    response = request_with_retries('GET', url, headers=headers, timeout=timeout, allow_redirects=True, stream=True, client=client)
+    if response.status_code != 200:
+        response.close()
+        return response, "", 0
+    body = StreamedBody(markers, encoding=response.encoding)
+    try:
+        for chunk in response.iter_content(chunk_size=STREAM_FETCH_CHUNK_BYTES):
+            if scrape_cancelled():
+                raise ScrapeCancelled(url)
+            if body.feed(chunk):
+                break
+        html = body.finish()
+        try:
+            wire_bytes = response.raw.tell()
+        except Exception:
+            wire_bytes = None
+    finally:
+        # Parar no meio descarta a conexão (o corpo restante não é drenado)
+        response.close()
+    content_length = response.headers.get('Content-Length')
+    body.log(site, response.url, content_length=int(content_length) if content_length and content_length.isdigit() else None, wire_bytes=wire_bytes)
+    return response, html, wire_bytes if wire_bytes is not None else body.bytes_read
+
+
+class SelectorStats:
+    """Acertos, erros e latência por seletor (e por estágio) das cadeias de extração.
+
+    Os contadores ficam em memória e vão para o SQLite a cada flush_interval, então a
+    ordem aprendida sobrevive a restarts. A reordenação só acontece dentro de um tier
+    (seletores alternativos para o mesmo elemento), pela taxa de acerto recente (EWMA);
+    a prioridade entre tiers e entre estágios continua fixa.
+    """
+
+    def __init__(self, path, adaptive=True, min_samples=20, decay=0.05, flush_interval=30):
+        self.path = path
+        self.adaptive = adaptive
+        self.min_samples = min_samples
+        self.decay = decay
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.conn = None
+        self.disabled = False
+        self.loaded = False
+        self.entries = {}
+        self.dirty = set()
+        self.last_flush = time.time()
+
+    def get_conn(self):
+        if self.conn is None and not self.disabled:
+            try:
+                self.conn = sqlite_connect(self.path)
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS selector_stats ("
+                    "chain TEXT, selector TEXT, hits INTEGER, misses INTEGER, total_ms REAL, score REAL, "
+                    "updated_at REAL, PRIMARY KEY (chain, selector))"
+                )
+                self.conn.commit()
+            except Exception as e:
+                log_event(logging.WARNING, "selector_stats_persistence_disabled", path=self.path, error=str(e))
+                self.disabled = True
+                self.conn = None
+        return self.conn
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        conn = self.get_conn()
+        if conn is None:
+            return
+        try:
+            rows = conn.execute("SELECT chain, selector, hits, misses, total_ms, score FROM selector_stats").fetchall()
+        except Exception as e:
+            log_event(logging.WARNING, "selector_stats_load_failed", error=str(e))
+            return
+        for chain, selector, hits, misses, total_ms, score in rows:
+            self.entries[(chain, selector)] = {"hits": hits, "misses": misses, "total_ms": total_ms, "score": score}
+
+    def record(self, chain, selector, hit, elapsed_ms):
+        with self.lock:
+            self.load()
+            entry = self.entries.setdefault((chain, selector), {"hits": 0, "misses": 0, "total_ms": 0.0, "score": 0.5})
+            entry["hits" if hit else "misses"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["score"] = entry["score"] * (1 - self.decay) + (self.decay if hit else 0.0)
+            self.dirty.add((chain, selector))
+            if time.time() - self.last_flush >= self.flush_interval:
+                self.flush_locked()
+
+    def order(self, chain, tiers):
+        """Seletores achatados; dentro de cada tier, os que mais acertam recentemente primeiro"""
+        if not self.adaptive:
+            return [selector for tier in tiers for selector in tier]
+        with self.lock:
+            self.load()
+            ordered = []
+            for tier in tiers:
+                if len(tier) == 1:
+                    ordered.extend(tier)
+                    continue
+
+                def rank(item):
+                    index, selector = item
+                    entry = self.entries.get((chain, selector))
+                    if not entry or entry["hits"] + entry["misses"] < self.min_samples:
+                        return (-0.5, index)
+                    return (-entry["score"], index)
+
+                ordered.extend(selector for _, selector in sorted(enumerate(tier), key=rank))
+            return ordered
+
+    def flush_locked(self):
+        self.last_flush = time.time()
+        conn = self.get_conn()
+        if conn is None or not self.dirty:
+            return
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO selector_stats (chain, selector, hits, misses, total_ms, score, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (chain, selector, e["hits"], e["misses"], e["total_ms"], e["score"], self.last_flush)
+                    for (chain, selector), e in ((key, self.entries[key]) for key in self.dirty)
+                ]
+            )
+            conn.commit()
+            self.dirty.clear()
+        except Exception as e:
+            log_event(logging.WARNING, "selector_stats_flush_failed", error=str(e))
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def stats(self):
+        with self.lock:
+            self.load()
+            chains = {}
+            for (chain, selector), e in sorted(self.entries.items(), key=lambda item: (item[0][0], -item[1]["score"])):
+                attempts = e["hits"] + e["misses"]
+                chains.setdefault(chain, []).append({
+                    "selector": selector,
+                    "hits": e["hits"],
+                    "misses": e["misses"],
+                    "hit_rate": round(e["hits"] / attempts, 3) if attempts else None,
+                    "recent_score": round(e["score"], 3),
+                    "avg_ms": round(e["total_ms"] / attempts, 2) if attempts else None,
+                })
+            return {
+                "persistent": not self.disabled,
+                "path": self.path,
+                "adaptive": self.adaptive,
+                "min_samples": self.min_samples,
+                "pending_writes": len(self.dirty),
+                "chains": chains,
+            }
+
+
+SELECTOR_STATS = SelectorStats(
+    SELECTOR_STATS_PATH,
+    adaptive=ADAPTIVE_SELECTOR_ORDER,
+    min_samples=SELECTOR_STATS_MIN_SAMPLES,
+    decay=SELECTOR_STATS_DECAY,
+    flush_interval=SELECTOR_STATS_FLUSH_SECONDS
+)
+atexit.register(SELECTOR_STATS.flush)
+
+
+class RecentRowsCache:
+    """Cache curto das linhas de /data por limite, com ETag e Last-Modified estáveis.
+
+    O ETag é o hash das linhas: enquanto o conteúdo não muda, Last-Modified também não,
+    e o dashboard recebe 304. invalidate() é chamado quando um save chega ao Supabase.
+    """
+
+    def __init__(self, fetch_rows, ttl=10.0):
+        self.fetch_rows = fetch_rows
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, limit):
+        """Retorna (rows, etag, last_modified)"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(limit)
+            if entry and now < entry["expires_at"]:
+                self.hits += 1
+                return entry["rows"], entry["etag"], entry["last_modified"]
+            self.misses += 1
+        rows = self.fetch_rows(limit=limit)
+        etag = hashlib.sha1(json.dumps(rows, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        with self.lock:
+            previous = self.entries.get(limit)
+            last_modified = previous["last_modified"] if previous and previous["etag"] == etag else datetime.utcnow().replace(microsecond=0)
+            self.entries[limit] = {"rows": rows, "etag": etag, "last_modified": last_modified, "expires_at": now + self.ttl}
+        return rows, etag, last_modified
+
+    def invalidate(self):
+        with self.lock:
+            for entry in self.entries.values():
+                entry["expires_at"] = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "ttl_seconds": self.ttl,
+                "limits_cached": sorted(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+            }
+
+
+def product_row_key(row):
+    """Identidade de uma linha de produtos (a tabela não expõe id no select)"""
+    return row.get("criado_em") or row.get("mensagem") or ""
+
+
+class ProductMirror:
+    """Espelho local dos produtos com um número de sequência por alteração.
+
+    As linhas são identificadas pela chave primária (id) de produtos. Cada linha nova,
+    alterada (o hash dos campos mudou, ex.: enviado virou true) ou apagada recebe o
+    próximo seq; as apagadas ficam como tombstone e saem em /data/changes como
+    {"id", "deleted": true}. O cursor é "<epoch>-<seq>", então um sync repetido só
+    devolve o que mudou depois dele. O epoch muda quando o arquivo do espelho é recriado
+    (disco efêmero), e aí o cliente recebe reset=true e ressincroniza do zero.
+
+    O seq sai do próprio SQLite (MAX(seq) dentro de BEGIN IMMEDIATE), então processos
+    que compartilham o arquivo não repetem números.
+
+    O espelho é atualizado sob demanda: se passou sync_interval ou houve save
+    (mark_stale), busca os ids acima do maior já espelhado e revisa as refresh_rows mais
+    recentes; a cada reconcile_interval percorre a tabela inteira, o que pega alterações
+    em linhas antigas e deleções.
+    """
+
+    FIELDS = ("mensagem", "imagem_url", "enviado", "criado_em")
+    COLUMNS = "id," + ",".join(FIELDS)
+
+    def __init__(self, path, fetch_after, fetch_recent, sync_interval=30.0, refresh_rows=100,
+                 reconcile_interval=600.0):
+        self.path = path
+        self.fetch_after = fetch_after
+        self.fetch_recent = fetch_recent
+        self.sync_interval = sync_interval
+        self.refresh_rows = refresh_rows
+        self.reconcile_interval = reconcile_interval
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.conn = None
+        self.disabled = False
+        self.epoch = None
+        self.stale = True
+        self.last_sync = 0.0
+        self.last_reconcile = 0.0
+        self.last_sync_ms = None
+        self.syncs = 0
+        self.reconciles = 0
+        self.changes_served = 0
+        self.last_error = None
+
+    def get_conn(self):
+        if self.conn is None and not self.disabled:
+            try:
+                self.conn = sqlite_connect(self.path)
+                self.conn.execute("CREATE TABLE IF NOT EXISTS mirror_meta (name TEXT PRIMARY KEY, value TEXT)")
+                legacy = self.conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'product_mirror'"
+                ).fetchone()
+                if legacy:
+                    # Formato antigo (chave criado_em): descarta e troca o epoch para os clientes ressincronizarem
+                    self.conn.execute("DROP TABLE product_mirror")
+                    self.conn.execute("DELETE FROM mirror_meta WHERE name = 'epoch'")
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS product_rows ("
+                    "id INTEGER PRIMARY KEY, mensagem TEXT, imagem_url TEXT, enviado INTEGER, criado_em TEXT, "
+                    "row_hash TEXT, deleted INTEGER NOT NULL DEFAULT 0, seq INTEGER NOT NULL, updated_at REAL)"
+                )
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_product_rows_seq ON product_rows(seq)")
+                row = self.conn.execute("SELECT value FROM mirror_meta WHERE name = 'epoch'").fetchone()
+                if row:
+                    self.epoch = row[0]
+                else:
+                    self.epoch = uuid.uuid4().hex[:8]
+                    self.conn.execute("INSERT INTO mirror_meta (name, value) VALUES ('epoch', ?)", (self.epoch,))
+                self.conn.commit()
+            except Exception as e:
+                log_event(logging.ERROR, "product_mirror_disabled", path=self.path, error=str(e))
+                self.disabled = True
+                self.conn = None
+        return self.conn
+
+    def mark_stale(self):
+        self.stale = True
+
+    def row_hash(self, row):
+        values = [row.get(field) for field in self.FIELDS]
+        values[self.FIELDS.index("enviado")] = bool(row.get("enviado"))
+        return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def write(self, apply):
+        """Roda apply(conn, seq) numa transação BEGIN IMMEDIATE; seq é o maior já gravado no arquivo"""
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                return 0
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM product_rows").fetchone()[0]
+                changed = apply(conn, seq)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return changed
+
+    def upsert(self, rows):
+        """Grava linhas novas/alteradas com o próximo seq; retorna quantas mudaram"""
+        rows = [row for row in rows if row.get("id") is not None]
+        if not rows:
+            return 0
+        now = time.time()
+
+        def apply(conn, seq):
+            changed = 0
+            for row in rows:
+                digest = self.row_hash(row)
+                current = conn.execute("SELECT row_hash, deleted FROM product_rows WHERE id = ?", (row["id"],)).fetchone()
+                if current == (digest, 0):
+                    continue
+                seq += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO product_rows "
+                    "(id, mensagem, imagem_url, enviado, criado_em, row_hash, deleted, seq, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                    (row["id"], row.get("mensagem"), row.get("imagem_url"), 1 if row.get("enviado") else 0,
+                     row.get("criado_em"), digest, seq, now)
+                )
+                changed += 1
+            return changed
+
+        return self.write(apply)
+
+    def delete_missing(self, seen_ids):
+        """Vira tombstone toda linha espelhada que a varredura completa não encontrou"""
+        now = time.time()
+
+        def apply(conn, seq):
+            missing = [
+                row_id for (row_id,) in conn.execute("SELECT id FROM product_rows WHERE deleted = 0")
+                if row_id not in seen_ids
+            ]
+            for row_id in missing:
+                seq += 1
+                conn.execute(
+                    "UPDATE product_rows SET mensagem = NULL, imagem_url = NULL, enviado = NULL, criado_em = NULL, "
+                    "row_hash = NULL, deleted = 1, seq = ?, updated_at = ? WHERE id = ?",
+                    (seq, now, row_id)
+                )
+            return len(missing)
+
+        return self.write(apply)
+
+    def upsert_all(self, rows, seen_ids=None):
+        changed = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if seen_ids is not None and row.get("id") is not None:
+                seen_ids.add(row["id"])
+            if len(batch) >= 500:
+                changed += self.upsert(batch)
+                batch = []
+        return changed + self.upsert(batch)
+
+    def read_one(self, sql, params=()):
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                return None
+            return conn.execute(sql, params).fetchone()[0]
+
+    def watermark(self):
+        """Maior id já espelhado (inclui tombstones)"""
+        return self.read_one("SELECT MAX(id) FROM product_rows")
+
+    def current_seq(self):
+        return self.read_one("SELECT COALESCE(MAX(seq), 0) FROM product_rows") or 0
+
+    def sync(self, force=False):
+        """Traz do Supabase o que mudou desde o último sync (um sync por vez)"""
+        if not force and not self.stale and time.time() - self.last_sync < self.sync_interval:
+            return 0
+        with self.sync_lock:
+            if not force and not self.stale and time.time() - self.last_sync < self.sync_interval:
+                return 0
+            start = time.perf_counter()
+            self.stale = False
+            try:
+                watermark = self.watermark()
+                reconcile = force or watermark is None or time.time() - self.last_reconcile >= self.reconcile_interval
+                if reconcile:
+                    seen_ids = set()
+                    changed = self.upsert_all(self.fetch_after(None), seen_ids)
+                    changed += self.delete_missing(seen_ids)
+                else:
+                    changed = self.upsert_all(self.fetch_after(watermark))
+                    if self.refresh_rows:
+                        changed += self.upsert_all(self.fetch_recent(self.refresh_rows))
+                self.last_error = None
+            except Exception as e:
+                self.stale = True
+                self.last_error = str(e)
+                log_event(logging.ERROR, "product_mirror_sync_failed", error=str(e))
+                raise
+            self.last_sync = time.time()
+            if reconcile:
+                self.last_reconcile = self.last_sync
+                self.reconciles += 1
+            self.syncs += 1
+            self.last_sync_ms = round((time.perf_counter() - start) * 1000, 1)
+            log_event(logging.INFO, "product_mirror_sync", changed=changed, watermark=watermark,
+                      reconcile=reconcile, elapsed_ms=self.last_sync_ms)
+            return changed
+
+    def parse_cursor(self, cursor):
+        """Retorna (seq, reset); cursor de outro epoch ou inválido recomeça do zero"""
+        if not cursor:
+            return 0, False
+        epoch, _, seq = str(cursor).partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return 0, True
+        return int(seq), False
+
+    def changes(self, cursor=None, limit=200):
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                raise RuntimeError("Espelho local indisponível")
+            since, reset = self.parse_cursor(cursor)
+            current = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM product_rows").fetchone()[0]
+            if since > current:
+                # Cursor à frente do espelho: nunca foi emitido por este arquivo, recomeça do zero
+                log_event(logging.WARNING, "product_mirror_cursor_ahead", cursor=cursor, seq=current)
+                since, reset = 0, True
+            # Do zero não há o que apagar no cliente: tombstones só vão para quem já tem um cursor
+            rows = conn.execute(
+                "SELECT id, mensagem, imagem_url, enviado, criado_em, deleted, seq FROM product_rows "
+                "WHERE seq > ? AND (deleted = 0 OR ? > 0) ORDER BY seq LIMIT ?",
+                (since, since, limit + 1)
+            ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        last_seq = rows[-1][6] if rows else since
+        if not has_more:
+            last_seq = max(last_seq, current)
+        self.changes_served += len(rows)
+        return {
+            "rows": [
+                {"id": row_id, "deleted": True} if deleted else
+                {"id": row_id, "mensagem": m, "imagem_url": i, "enviado": bool(e), "criado_em": c, "deleted": False}
+                for row_id, m, i, e, c, deleted, _ in rows
+            ],
+            "cursor": f"{self.epoch}-{last_seq}",
+            "has_more": has_more,
+            "reset": reset,
+        }
+
+    def stats(self):
+        with self.lock:
+            conn = self.get_conn()
+            count = deleted = seq = None
+            if conn is not None:
+                try:
+                    count, deleted, seq = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(deleted), 0), COALESCE(MAX(seq), 0) FROM product_rows"
+                    ).fetchone()
+                except Exception:
+                    pass
+        return {
+            "enabled": not self.disabled,
+            "path": self.path,
+            "epoch": self.epoch,
+            "rows": count,
+            "tombstones": deleted,
+            "seq": seq,
+            "stale": self.stale,
+            "syncs": self.syncs,
+            "reconciles": self.reconciles,
+            "last_sync_age_s": round(time.time() - self.last_sync, 1) if self.last_sync else None,
+            "last_reconcile_age_s": round(time.time() - self.last_reconcile, 1) if self.last_reconcile else None,
+            "last_sync_ms": self.last_sync_ms,
+            "changes_served": self.changes_served,
+            "last_error": self.last_error,
+        }
+
+
+class LiveFeed:
+    """Feed de linhas novas/alteradas para os streams SSE do dashboard.
+
+    Um único poller consulta as linhas recentes (via RecentRowsCache) enquanto houver
+    assinantes e publica só o diff em relação ao último snapshot. notify() acorda o
+    poller na hora, usado quando um save chega ao Supabase. Uma consulta que falha não
+    publica nada e mantém o snapshot: tratá-la como vazia reenviaria tudo no poll seguinte.
+    """
+
+    def __init__(self, fetch_rows, limit=20, poll_interval=15.0, max_clients=4, queue_size=50):
+        self.fetch_rows = fetch_rows
+        self.limit = limit
+        self.poll_interval = poll_interval
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.subscribers = set()
+        self.rows = None
+        self.thread = None
+        self.polls = 0
+        self.published = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.failed_polls = 0
+        self.last_error = None
+
+    def subscribe(self):
+        """Registra um assinante; retorna a fila de eventos ou None se lotado"""
+        with self.lock:
+            if len(self.subscribers) >= self.max_clients:
+                self.rejected += 1
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='live-feed-poller', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber):
+        with self.lock:
+            return subscriber in self.subscribers
+
+    def snapshot(self):
+        with self.lock:
+            rows = self.rows
+        if rows is None:
+            rows = self.fetch_rows(self.limit)
+            with self.lock:
+                if self.rows is None:
+                    self.rows = rows
+        return rows
+
+    def notify(self):
+        self.wakeup.set()
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Cliente lento: derruba o stream; o EventSource reconecta e recebe um snapshot novo
+                self.unsubscribe(subscriber)
+                self.evicted += 1
+        self.published += 1
+
+    def poll_once(self):
+        try:
+            rows = self.fetch_rows(self.limit)
+        except Exception:
+            with self.lock:
+                self.failed_polls += 1
+            raise
+        with self.lock:
+            previous = {product_row_key(row): row for row in (self.rows or [])}
+            self.rows = rows
+            self.polls += 1
+        changed = [row for row in rows if previous.get(product_row_key(row)) != row]
+        if changed:
+            self.publish({"rows": changed})
+        return len(changed)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+            try:
+                self.poll_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                log_event(logging.ERROR, "live_feed_poll_exception", error=str(e))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "clients": len(self.subscribers),
+                "max_clients": self.max_clients,
+                "poller_running": self.thread is not None,
+                "poll_interval_s": self.poll_interval,
+                "polls": self.polls,
+                "published": self.published,
+                "rejected": self.rejected,
+                "evicted": self.evicted,
+                "failed_polls": self.failed_polls,
+                "last_error": self.last_error,
+            }
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class SaveSpool:
+    """Fila durável (SQLite, append-only) de inserts para o Supabase com flusher em background.
+
+    enqueue() só grava localmente; o flusher reserva um lote (lease, para não enviar em
+    dobro se houver mais de um worker), faz um POST com array e apaga as linhas aceitas.
+    Com id_column, cada linha ganha um id gerado no enqueue e gravado junto do payload: um
+    reenvio (timeout depois do commit no Supabase, crash antes do DELETE) repete o mesmo id
+    e o Supabase descarta a duplicata.
+    Falhas reagendam com backoff exponencial; erros 4xx definitivos isolam a linha ruim e,
+    após max_attempts, a linha fica como 'dead' para inspeção.
+    """
+
+    RETRYABLE_STATUS = (408, 425, 429)
+
+    def __init__(self, path, send_batch, batch_size=50, timeout=10, poll_interval=5,
+                 retry_base=2.0, retry_max=300.0, max_attempts=20, on_flush=None, id_column=None):
+        self.path = path
+        self.send_batch = send_batch
+        self.id_column = id_column
+        self.on_flush = on_flush
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.conn = None
+        self.disabled = False
+        self.flushed = 0
+        self.failed_attempts = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.total_flush_ms = 0.0
+        self.last_error = None
+
+    def get_conn(self):
+        if self.conn is None and not self.disabled:
+            try:
+                self.conn = sqlite_connect(self.path)
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS save_spool ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+                    "created_at REAL, attempts INTEGER DEFAULT 0, next_attempt_at REAL, lease_until REAL DEFAULT 0, last_error TEXT)"
+                )
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_save_spool_ready ON save_spool(status, next_attempt_at)")
+                self.conn.commit()
+            except Exception as e:
+                log_event(logging.ERROR, "save_spool_disabled", path=self.path, error=str(e))
+                self.disabled = True
+                self.conn = None
+        return self.conn
+
+    def start(self):
+        if self.thread is None and not self.disabled:
+            self.thread = threading.Thread(target=self.run, name='save-spool-flusher', daemon=True)
+            self.thread.start()
+
+    def enqueue(self, payload):
+        """Grava o payload no spool; retorna o id local ou None se o spool estiver indisponível"""
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                return None
+            if self.id_column:
+                payload = {**payload, self.id_column: payload.get(self.id_column) or str(uuid.uuid4())}
+            now = time.time()
+            cursor = conn.execute(
+                "INSERT INTO save_spool (payload, created_at, next_attempt_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            conn.commit()
+            spool_id = cursor.lastrowid
+        self.start()
+        self.wakeup.set()
+        return spool_id
+
+    def claim_batch(self):
+        with self.lock:
+            conn = self.get_conn()
+            if conn is None:
+                return []
+            now = time.time()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    "SELECT id, payload, attempts FROM save_spool WHERE status = 'pending' "
+                    "AND next_attempt_at <= ? AND lease_until <= ? ORDER BY id LIMIT ?",
+                    (now, now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    conn.executemany(
+                        "UPDATE save_spool SET lease_until = ? WHERE id = ?",
+                        [(now + self.timeout * 3, row[0]) for row in rows]
+                    )
+                conn.commit()
+                return rows
+            except Exception as e:
+                conn.rollback()
+                log_event(logging.WARNING, "save_spool_claim_failed", error=str(e))
+                return []
+
+    def complete(self, ids):
+        with self.lock:
+            conn = self.get_conn()
+            conn.executemany("DELETE FROM save_spool WHERE id = ?", [(i,) for i in ids])
+            conn.commit()
+        self.flushed += len(ids)
+        if self.on_flush:
+            self.on_flush()
+
+    def reschedule(self, rows, error, permanent=False):
+        now = time.time()
+        updates = []
+        for spool_id, _, attempts in rows:
+            attempts += 1
+            dead = permanent or attempts >= self.max_attempts
+            delay = min(self.retry_max, self.retry_base * (2 ** (attempts - 1)))
+            updates.append(('dead' if dead else 'pending', attempts, now + delay, str(error)[:500], spool_id))
+        with self.lock:
+            conn = self.get_conn()
+            conn.executemany(
+                "UPDATE save_spool SET status = ?, attempts = ?, next_attempt_at = ?, lease_until = 0, last_error = ? WHERE id = ?",
+                updates
+            )
+            conn.commit()
+        self.failed_attempts += len(rows)
+        self.last_error = str(error)[:500]
+
+    def send(self, rows):
+        start = time.perf_counter()
+        try:
+            status, body = self.send_batch([json.loads(row[1]) for row in rows], self.timeout)
+        except Exception as e:
+            status, body = None, str(e)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.total_flush_ms += elapsed_ms
+        log_event(logging.INFO, "save_spool_flush", rows=len(rows), status=status, elapsed_ms=elapsed_ms)
+        if status is not None and 200 <= status < 300:
+            self.complete([row[0] for row in rows])
+            return
+        permanent = status is not None and 400 <= status < 500 and status not in self.RETRYABLE_STATUS
+        if permanent and len(rows) > 1:
+            # Um registro inválido derruba o lote inteiro: reenviar um a um para isolar
+            for row in rows:
+                self.send([row])
+            return
+        log_event(logging.WARNING, "save_spool_flush_failed", rows=len(rows), status=status, error=str(body)[:300])
+        self.reschedule(rows, f"HTTP {status}: {body}" if status else body, permanent=permanent)
+
+    def flush_once(self):
+        rows = self.claim_batch()
+        if rows:
+            self.send(rows)
+        return len(rows)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                while self.flush_once() and not self.stop_event.is_set():
+                    pass
+            except Exception as e:
+                log_event(logging.ERROR, "save_spool_flusher_exception", error=str(e))
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def shutdown(self):
+        self.stop_event.set()
+        self.wakeup.set()
+
+    def stats(self):
+        with self.lock:
+            conn = self.get_conn()
+            depth = dead = oldest = None
+            if conn is not None:
+                try:
+                    depth, oldest = conn.execute(
+                        "SELECT COUNT(*), MIN(created_at) FROM save_spool WHERE status = 'pending'"
+                    ).fetchone()
+                    dead = conn.execute("SELECT COUNT(*) FROM save_spool WHERE status = 'dead'").fetchone()[0]
+                except Exception:
+                    pass
+        return {
+            "enabled": not self.disabled,
+            "path": self.path,
+            "depth": depth,
+            "dead": dead,
+            "oldest_pending_age_s": round(time.time() - oldest, 1) if oldest else None,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed_attempts": self.failed_attempts,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 1) if self.flushes else None,
+            "last_error": self.last_error,
+            "flusher_alive": bool(self.thread and self.thread.is_alive()),
+        }
+
+
+class StageTimer:
+    """Cronometra estágios sucessivos de uma cadeia de fallback e registra cada um em SELECTOR_STATS"""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self.start = time.perf_counter()
+
+    def done(self, stage, hit):
+        now = time.perf_counter()
+        SELECTOR_STATS.record(self.chain, stage, bool(hit), (now - self.start) * 1000)
+        self.start = now
+        return hit
 
 
-def request_with_retries(method, url, *, retries=2, base_sleep=0.8, timeout=12, **kwargs):
+def request_with_retries(method, url, *, retries=2, base_sleep=0.8, timeout=12, client=None, **kwargs):
+    client = client or HTTP_CLIENT
     last_exc = None
     for attempt in range(retries + 1):
+        if scrape_cancelled():
+            raise ScrapeCancelled(url)
         try:
             if attempt > 0:
                 time.sleep(base_sleep * (2 ** (attempt - 1)))
-            return requests.request(method, url, timeout=timeout, **kwargs)
+            attempt_start = time.perf_counter()
+            return client.request(method, url, timeout=timeout, **kwargs)
         except Exception as e:
+            # Só tentativas que falharam viram span: é aí que o tempo some em retries
+            record_span("http_attempt", attempt_start, host=urlparse(url).netloc, method=method,
+                        attempt=attempt + 1, outcome="error", error=type(e).__name__)
             last_exc = e
     raise last_exc
 
@@ -156,21 +2138,697 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Motor de extração: cada HTML é parseado uma única vez com lxml e os extratores
+# avaliam cadeias de seletores CSS compiladas para XPath (na ordem de prioridade).
+CSS_TOKEN_RE = re.compile(r'(?:[^\s>"\']|"[^"]*"|\'[^\']*\')+|>')
+CSS_PART_RE = re.compile(r'([#.])([\w-]+)|\[([\w:-]+)(?:([*^]?=)"([^"]*)")?\]|([\w-]+)')
+
+
+def css_to_xpath(selector):
+    """Compila o subconjunto de CSS usado nos extratores (tag, #id, .classe, [attr], [attr="v"],
+    [attr*="v"], [attr^="v"], descendente e '>') para XPath relativo ao nó de contexto"""
+    steps = []
+    axis = 'descendant::'
+    for token in CSS_TOKEN_RE.findall(selector):
+        if token == '>':
+            axis = 'child::'
+            continue
+        tag = '*'
+        conditions = []
+        pos = 0
+        while pos < len(token):
+            match = CSS_PART_RE.match(token, pos)
+            if not match or match.end() == pos:
+                raise ValueError(f"Seletor CSS não suportado: {selector}")
+            prefix, name, attr, op, value, element = match.groups()
+            if element:
+                tag = element.lower()
+            elif prefix == '#':
+                conditions.append(f"@id='{name}'")
+            elif prefix == '.':
+                conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')")
+            elif op == '=':
+                conditions.append(f"@{attr}='{value}'")
+            elif op == '*=':
+                conditions.append(f"contains(@{attr}, '{value}')")
+            elif op == '^=':
+                conditions.append(f"starts-with(@{attr}, '{value}')")
+            else:
+                conditions.append(f"@{attr}")
+            pos = match.end()
+        steps.append(axis + tag + ''.join(f'[{c}]' for c in conditions))
+        axis = 'descendant::'
+    if not steps:
+        raise ValueError(f"Seletor CSS vazio: {selector!r}")
+    return '/'.join(steps)
+
+
+class SelectorChain:
+    """Seletores CSS em ordem de prioridade, compilados uma vez para XPath.
+
+    Uma tupla agrupa alternativas para o mesmo elemento (um tier). Com name, cada
+    tentativa entra em SELECTOR_STATS e a ordem dentro dos tiers se adapta aos acertos.
+    """
+
+    def __init__(self, *selectors, name=None):
+        self.tiers = [list(sel) if isinstance(sel, tuple) else [sel] for sel in selectors]
+        self.selectors = [sel for tier in self.tiers for sel in tier]
+        self.name = name
+        self.compiled = None
+
+    def compile(self):
+        if self.compiled is None:
+            self.compiled = {sel: lxml_etree.XPath(css_to_xpath(sel)) for sel in self.selectors}
+        return self.compiled
+
+    def first(self, node):
+        """Primeiro elemento do seletor de maior prioridade que casar (como select_one em cadeia)"""
+        if node is None:
+            return None
+        compiled = self.compile()
+        if not self.name:
+            for sel in self.selectors:
+                found = compiled[sel](node)
+                if found:
+                    return found[0]
+            return None
+        for sel in SELECTOR_STATS.order(self.name, self.tiers):
+            start = time.perf_counter()
+            found = compiled[sel](node)
+            SELECTOR_STATS.record(self.name, sel, bool(found), (time.perf_counter() - start) * 1000)
+            if found:
+                return found[0]
+        return None
+
+    def all(self, node):
+        if node is None:
+            return []
+        compiled = self.compile()
+        return [el for sel in self.selectors for el in compiled[sel](node)]
+
+
+def node_text(node):
+    """Texto do elemento com as partes já sem espaços (equivale a get_text(strip=True) do bs4)"""
+    if node is None:
+        return ''
+    parts = []
+
+    def walk(el, is_root):
+        if isinstance(el.tag, str) and el.tag not in ('script', 'style'):
+            if el.text:
+                parts.append(el.text)
+            for child in el:
+                walk(child, False)
+        if not is_root and el.tail:
+            parts.append(el.tail)
+
+    walk(node, True)
+    return ''.join(part.strip() for part in parts if part.strip())
+
+
+class HtmlDocument:
+    """HTML de uma página, parseado uma única vez e compartilhado entre os extratores"""
+
+    def __init__(self, text):
+        self.text = text or ""
+        self.tree = None
+        self.parsed = False
+        self.parse_ms = 0.0
+
+    @classmethod
+    def of(cls, html):
+        return html if isinstance(html, cls) else cls(html)
+
+    @property
+    def root(self):
+        if not self.parsed:
+            start = time.perf_counter()
+            self.tree = self.parse(self.text)
+            self.parse_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.parsed = True
+        return self.tree
+
+    @staticmethod
+    def parse(text):
+        if not text.strip():
+            return None
+        try:
+            return lxml_html.document_fromstring(text)
+        except ValueError:
+            # str com declaração de encoding (<?xml ... encoding=...?>) precisa ir como bytes
+            return lxml_html.document_fromstring(text.encode('utf-8'))
+        except lxml_etree.ParserError:
+            return None
+
+    def to_html(self, node):
+        return lxml_html.tostring(node, encoding='unicode') if node is not None else ''
+
+
+def log_html_parse(site, stage, doc, reused, extract_start):
+    if not reused and doc.parse_ms is not None:
+        METRICS_REGISTRY.observe("freeisland_stage_duration_seconds", doc.parse_ms / 1000, stage="parse", site=site, outcome="ok")
+    log_event(
+        logging.INFO,
+        "html_parse",
+        site=site,
+        stage=stage,
+        bytes=len(doc.text),
+        parse_ms=doc.parse_ms,
+        parse_reused=reused,
+        extract_ms=round((time.perf_counter() - extract_start) * 1000, 2)
+    )
+
+
+AMAZON_PARSE_PLAN = {
+    'title': SelectorChain('#productTitle', '#title span', '#title'),
+    'price': SelectorChain(
+        ('#corePriceDisplay_desktop_feature_div .priceToPay .aok-offscreen',
+         '#corePriceDisplay_desktop_feature_div .priceToPay .a-offscreen'),
+        ('#corePriceDisplay_desktop_feature_div .a-price .aok-offscreen',
+         '#corePriceDisplay_desktop_feature_div .a-price .a-offscreen'),
+        ('#apex_desktop #apex_price .aok-offscreen',
+         '#apex_desktop #apex_price .a-offscreen'),
+        'span.a-price > span.a-offscreen',
+        'span.a-price span.a-offscreen',
+        '#priceblock_ourprice',
+        '#priceblock_dealprice',
+        '#priceblock_saleprice',
+        name='amazon_dom_price'
+    ),
+    'core_symbol': SelectorChain('#corePriceDisplay_desktop_feature_div .a-price-symbol'),
+    'core_whole': SelectorChain('#corePriceDisplay_desktop_feature_div .a-price-whole'),
+    'core_fraction': SelectorChain('#corePriceDisplay_desktop_feature_div .a-price-fraction'),
+    'any_symbol': SelectorChain('.a-price-symbol'),
+    'any_whole': SelectorChain('.a-price-whole'),
+    'any_fraction': SelectorChain('.a-price-fraction'),
+    'apex_price': SelectorChain('#apex_desktop #apex_price .aok-offscreen', '#apex_desktop #apex_price .a-offscreen'),
+    'meta_price': SelectorChain('meta[property="product:price:amount"]', 'meta[property="og:price:amount"]'),
+    'ld_json': SelectorChain('script[type="application/ld+json"]'),
+    'image': SelectorChain('#landingImage', 'img[data-a-hires]', 'img[data-old-hires]'),
+    'og_image': SelectorChain('meta[property="og:image"]'),
+}
+MERCADOLIVRE_PARSE_PLAN = {
+    'title': SelectorChain('h1.ui-pdp-title', '.ui-pdp-title', 'h1'),
+    'meta_price': SelectorChain('meta[itemprop="price"]'),
+    'price_container': SelectorChain(('#price .andes-money-amount', '.ui-pdp-price .andes-money-amount'), name='mercadolivre_dom_price'),
+    'og_image': SelectorChain('meta[property="og:image"]'),
+    'image': SelectorChain('img.ui-pdp-image', 'img[src*="http2.mlstatic.com"]'),
+    'canonical': SelectorChain('link[rel="canonical"]'),
+    'og_url': SelectorChain('meta[property="og:url"]'),
+    'first_card_title': SelectorChain('.poly-card .poly-component__title'),
+    'card': SelectorChain('.poly-card'),
+    'card_title': SelectorChain('.poly-component__title'),
+    'card_images': SelectorChain('img'),
+    'card_price': SelectorChain('.poly-price__current .andes-money-amount'),
+}
+MONEY_AMOUNT_PLAN = {
+    'symbol': SelectorChain('.andes-money-amount__currency-symbol'),
+    'fraction': SelectorChain('.andes-money-amount__fraction'),
+    'cents': SelectorChain('.andes-money-amount__cents'),
+}
+
+
+def compile_parse_plans():
+    for plan in (AMAZON_PARSE_PLAN, MERCADOLIVRE_PARSE_PLAN, MONEY_AMOUNT_PLAN):
+        for chain in plan.values():
+            chain.compile()
+
+
+# Fast path sem DOM: uma única varredura do HTML bruto atrás de metas e JSON-LD. Preço só vem de
+# fontes presas ao produto principal (oferta do JSON-LD, meta de preço): blobs como priceToPay e
+# "price":{"value"} também aparecem em carrosséis e "compre junto", então ficam para o DOM (buybox).
+HTML_ATTR_RE = re.compile(r'''([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+AMAZON_EMBEDDED_RE = re.compile(
+    r'<span\b[^>]*\bid="productTitle"[^>]*>(?P<title>[^<]*)</span>'
+    r'|(?P<landing><img\b[^>]*\bid="landingImage"[^>]*>)'
+    r'|(?P<meta><meta\b[^>]*>)'
+    r'|<script\b[^>]*application/ld\+json[^>]*>(?P<ld_json>.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+MERCADOLIVRE_EMBEDDED_RE = re.compile(
+    r'<h1\b[^>]*\bclass="[^"]*(?<![\w-])ui-pdp-title(?![\w-])[^"]*"[^>]*>(?P<title>[^<]*)</h1>'
+    r'|(?P<meta><meta\b[^>]*>)'
+    r'|<script\b[^>]*application/ld\+json[^>]*>(?P<ld_json>.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def parse_tag_attrs(tag_html):
+    attrs = {}
+    for name, double_quoted, single_quoted in HTML_ATTR_RE.findall(tag_html):
+        attrs.setdefault(name.lower(), html_unescape(double_quoted or single_quoted))
+    return attrs
+
+
+def scan_embedded_fields(pattern, text):
+    """Primeira ocorrência de cada grupo nomeado; metas e blocos JSON-LD são acumulados"""
+    found = {'meta': {}, 'ld_json': []}
+    for match in pattern.finditer(text):
+        for name, value in match.groupdict().items():
+            if value is None:
+                continue
+            if name == 'meta':
+                attrs = parse_tag_attrs(value)
+                key = attrs.get('property') or attrs.get('itemprop') or attrs.get('name')
+                if key and 'content' in attrs:
+                    found['meta'].setdefault(key.lower(), attrs['content'])
+            elif name == 'ld_json':
+                found['ld_json'].append(value)
+            else:
+                found.setdefault(name, value)
+    return found
+
+
+def embedded_json_ld_product(blocks):
+    """Primeiro nó @type Product dos blocos JSON-LD (aceita listas e @graph)"""
+    for raw in blocks:
+        try:
+            payload = json.loads(raw.strip())
+        except ValueError:
+            continue
+        nodes = payload if isinstance(payload, list) else [payload]
+        while nodes:
+            node = nodes.pop(0)
+            if not isinstance(node, dict):
+                continue
+            types = node.get('@type')
+            if 'Product' in (types if isinstance(types, list) else [types]):
+                return node
+            if isinstance(node.get('@graph'), list):
+                nodes.extend(node['@graph'])
+    return None
+
+
+def json_ld_offer_price(product):
+    offers = (product or {}).get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if not isinstance(offers, dict):
+        return None
+    price = offers.get('price') or offers.get('lowPrice')
+    return str(price) if price not in (None, '') else None
+
+
+def json_ld_image(product):
+    image = (product or {}).get('image')
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get('url') or image.get('contentUrl')
+    return image if isinstance(image, str) else None
+
+
+# Seletores usados pela extração Selenium; o modo de navegação rápida espera por eles
+AMAZON_SELENIUM_TITLE_SELECTORS = [
+    '#productTitle',
+    'h1#productTitle',
+    '.a-size-large.product-title-word-break',
+    'h1.a-size-large',
+    'h1[data-asin]',
+    '#title span',
+    '#title'
+]
+AMAZON_SELENIUM_PRICE_READY_SELECTORS = [
+    '#corePriceDisplay_desktop_feature_div .a-price',
+    '#apex_desktop_newAccordionRow .a-offscreen',
+    '#apex_desktop #apex_price',
+    '#priceblock_ourprice',
+    '#priceblock_dealprice',
+    '#priceblock_saleprice',
+    'meta[property="product:price:amount"]',
+    'meta[property="og:price:amount"]',
+]
+AMAZON_SELENIUM_IMAGE_SELECTORS = [
+    '#landingImage',
+    '#imgTagWrapperId img',
+    '.a-dynamic-image',
+    'img[data-a-hires]',
+    'img[data-old-hires]'
+]
+MERCADOLIVRE_SELENIUM_TITLE_SELECTORS = [
+    '.poly-component__title',
+    'h1.ui-pdp-title',
+    '.ui-pdp-title'
+]
+MERCADOLIVRE_SELENIUM_PRICE_SELECTORS = [
+    '.poly-price__current .andes-money-amount',
+    '.ui-pdp-price__current .andes-money-amount',
+]
+MERCADOLIVRE_SELENIUM_IMAGE_SELECTORS = [
+    '.poly-component__picture',
+    '.ui-pdp-gallery__figure__image',
+    'img[src*="http2.mlstatic.com"]'
+]
+
+# Recursos pesados e hosts de terceiros bloqueados via CDP (Network.setBlockedURLs).
+# Imagens não precisam ser baixadas: a extração lê só os atributos src/data-*.
+SELENIUM_BLOCKED_URL_PATTERNS = [
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*',
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*.mp4*', '*.webm*', '*.m3u8*',
+    '*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*adservice.google.*',
+    '*facebook.net*', '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*',
+    '*criteo.*', '*taboola.com*', '*amazon-adsystem.com*', '*fls-na.amazon.com*',
+    '*unagi.amazon.com*', '*mercadoclics.com*',
+] + SELENIUM_EXTRA_BLOCKED_URLS
+
+
+class DriverLease:
+    """WebDriver do pool emprestado com exclusividade a um scrape"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.failed = False
+        self.created_at = time.time()
+
+
+class DriverPool:
+    """Pool de WebDrivers pré-aquecidos com lease exclusivo.
+
+    WebDriver não é thread-safe: cada scrape pega um driver só para si e devolve
+    ao final. Drivers são reciclados após max_pages navegações ou em erro, e um
+    health check em background substitui instâncias mortas.
+    """
+
+    def __init__(self, factory, size=1, max_pages=50, lease_timeout=30, health_interval=60):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.lease_timeout = lease_timeout
+        self.health_interval = health_interval
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.total = 0
+        self.started = False
+        self.stop_event = threading.Event()
+        self.created = 0
+        self.create_failures = 0
+        self.recycled = 0
+        self.health_replaced = 0
+        self.leases = 0
+        self.lease_timeouts = 0
+
+    def start(self, prewarm=True):
+        """Inicia o health check e, se pedido, pré-lança os drivers em background"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        if prewarm:
+            threading.Thread(target=self.fill, name='driver-pool-warmup', daemon=True).start()
+        if self.health_interval > 0:
+            threading.Thread(target=self.health_loop, name='driver-pool-health', daemon=True).start()
+
+    def spawn(self):
+        """Cria um driver se o pool ainda não estiver cheio; retorna True se criou"""
+        with self.lock:
+            if self.total >= self.size:
+                return False
+            self.total += 1
+        driver = None
+        try:
+            driver = self.factory()
+        except Exception as e:
+            logger.error("Erro ao criar WebDriver do pool: %s", e)
+        if driver is None:
+            with self.lock:
+                self.total -= 1
+                self.create_failures += 1
+            return False
+        with self.lock:
+            self.created += 1
+        self.idle.put(DriverLease(driver))
+        return True
+
+    def fill(self):
+        while not self.stop_event.is_set() and self.spawn():
+            pass
+
+    def acquire(self):
+        """Empresta um driver ocioso; retorna None se não houver driver disponível"""
+        self.start(prewarm=False)
+        try:
+            lease = self.idle.get_nowait()
+        except queue.Empty:
+            lease = None
+        if lease is None:
+            # Pool ainda não aqueceu (ou driver reciclado): cria sob demanda se couber
+            self.spawn()
+            with self.lock:
+                has_drivers = self.total > 0
+            if not has_drivers:
+                return None
+            try:
+                lease = self.idle.get(timeout=self.lease_timeout)
+            except queue.Empty:
+                with self.lock:
+                    self.lease_timeouts += 1
+                log_event(logging.WARNING, "driver_pool_lease_timeout", timeout_s=self.lease_timeout)
+                return None
+        with self.lock:
+            self.leases += 1
+        return lease
+
+    def release(self, lease):
+        if lease is None or lease.driver is None:
+            return
+        if self.stop_event.is_set():
+            self.retire(lease)
+            return
+        if lease.failed or (self.max_pages > 0 and lease.pages >= self.max_pages):
+            log_event(logging.INFO, "driver_pool_recycle", pages=lease.pages, failed=lease.failed)
+            with self.lock:
+                self.recycled += 1
+            self.retire(lease)
+            threading.Thread(target=self.fill, name='driver-pool-refill', daemon=True).start()
+            return
+        self.idle.put(lease)
+
+    def retire(self, lease):
+        try:
+            lease.driver.quit()
+        except Exception:
+            pass
+        with self.lock:
+            self.total -= 1
+
+    def is_alive(self, lease):
+        try:
+            lease.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def health_loop(self):
+        while not self.stop_event.wait(self.health_interval):
+            checked = []
+            while True:
+                try:
+                    checked.append(self.idle.get_nowait())
+                except queue.Empty:
+                    break
+            for lease in checked:
+                if self.is_alive(lease):
+                    self.idle.put(lease)
+                else:
+                    log_event(logging.WARNING, "driver_pool_dead_driver", pages=lease.pages)
+                    with self.lock:
+                        self.health_replaced += 1
+                    self.retire(lease)
+            self.fill()
+
+    def shutdown(self):
+        self.stop_event.set()
+        while True:
+            try:
+                self.retire(self.idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "total": self.total,
+                "idle": self.idle.qsize(),
+                "max_pages": self.max_pages,
+                "created": self.created,
+                "create_failures": self.create_failures,
+                "recycled": self.recycled,
+                "health_replaced": self.health_replaced,
+                "leases": self.leases,
+                "lease_timeouts": self.lease_timeouts,
+            }
+
+
+class ScrapeContext:
+    """Estado de uma chamada de scraping: erro da etapa atual, driver emprestado e cancelamento do hedge.
+
+    Vive no CURRENT_SCRAPE (ContextVar), então requests concorrentes não veem o estado uns dos
+    outros; as threads do hedge recebem o mesmo contexto via submit_in_context.
+    """
+
+    def __init__(self, request_id=None, url=None):
+        self.request_id = request_id
+        self.url = url
+        self.site = None
+        self.last_error = None
+        self.lease = None
+        self.cancel = None
+        self.started_at = time.time()
+
+    def child(self, cancel=None):
+        """Contexto próprio de uma perna do hedge: erro e lease não vazam para a outra perna"""
+        context = ScrapeContext(request_id=self.request_id, url=self.url)
+        context.site = self.site
+        context.cancel = cancel
+        return context
+
+    def merge(self, child):
+        """Traz o resultado da perna escolhida de volta para a chamada"""
+        self.last_error = child.last_error
+
+
+class ScrapeCancelled(Exception):
+    """A perna do hedge perdeu a corrida; o trabalho restante é abandonado"""
+
+
+class ScrapeErrorLog:
+    """Últimos erros de scraping, um por chamada que terminou com last_error"""
+
+    def __init__(self, max_entries=20):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=max(1, max_entries))
+
+    def add(self, context):
+        entry = {
+            "request_id": context.request_id,
+            "site": context.site,
+            "url": context.url,
+            "at": datetime.utcfromtimestamp(context.started_at).isoformat() + "Z",
+            **context.last_error,
+        }
+        with self.lock:
+            self.entries.append(entry)
+
+    def latest(self):
+        with self.lock:
+            return self.entries[-1] if self.entries else None
+
+    def recent(self):
+        with self.lock:
+            return list(reversed(self.entries))
+
+
+CURRENT_SCRAPE = contextvars.ContextVar('current_scrape', default=None)
+SCRAPE_ERRORS = ScrapeErrorLog(SCRAPE_ERRORS_MAX)
+
+
+def scrape_cancelled():
+    context = CURRENT_SCRAPE.get()
+    cancel = context.cancel if context is not None else None
+    return bool(cancel and cancel.is_set())
+
+
+def run_in_scrape_context(context, fn, *args):
+    """Roda fn com o ScrapeContext dado (uma perna do hedge numa thread do pool)"""
+    token = CURRENT_SCRAPE.set(context)
+    try:
+        return fn(*args)
+    finally:
+        CURRENT_SCRAPE.reset(token)
+
+
 class FreeIslandScraper:
+    """Instância compartilhada entre threads: só configuração e recursos em pool (drivers).
+    O estado de cada scrape fica no ScrapeContext da chamada."""
+
     def __init__(self):
-        self.driver = None
-        self.last_error = None
-        if not IS_PRODUCTION:
-            self.setup_driver()
+        self.chromedriver_path = None
+        self.driver_pool = DriverPool(
+            self.create_driver,
+            size=SELENIUM_POOL_SIZE,
+            max_pages=SELENIUM_DRIVER_MAX_PAGES,
+            lease_timeout=SELENIUM_LEASE_TIMEOUT_SECONDS,
+            health_interval=SELENIUM_HEALTH_CHECK_SECONDS
+        )
+        # Em modo lazy o Chrome só sobe quando um caminho Selenium pede um driver
+        selenium_possible = not IS_PRODUCTION or (ALLOW_SELENIUM_IN_PROD and (AMAZON_USE_SELENIUM_IN_PROD or MERCADOLIVRE_USE_SELENIUM_IN_PROD))
+        if STARTUP_MODE == 'eager' and selenium_possible:
+            self.driver_pool.start(prewarm=True)
+
+    @contextlib.contextmanager
+    def scrape_context(self, url=None, request_id=None):
+        """Abre o ScrapeContext da chamada; chamadas aninhadas reaproveitam o contexto atual"""
+        context = CURRENT_SCRAPE.get()
+        if context is not None:
+            yield context
+            return
+        if request_id is None:
+            trace = CURRENT_TRACE.get()
+            request_id = trace.request_id if trace is not None else None
+        context = ScrapeContext(request_id=request_id, url=url)
+        token = CURRENT_SCRAPE.set(context)
+        try:
+            yield context
+        finally:
+            CURRENT_SCRAPE.reset(token)
+            if context.last_error:
+                SCRAPE_ERRORS.add(context)
+
+    @property
+    def last_error(self):
+        """Erro da etapa atual do scrape em andamento (None fora de um scrape)"""
+        context = CURRENT_SCRAPE.get()
+        return context.last_error if context is not None else None
+
+    @property
+    def current_lease(self):
+        context = CURRENT_SCRAPE.get()
+        return context.lease if context is not None else None
+
+    @property
+    def driver(self):
+        """WebDriver emprestado pelo scrape em andamento"""
+        lease = self.current_lease
+        return lease.driver if lease else None
+
+    @contextlib.contextmanager
+    def leased_driver(self):
+        """Empresta um driver do pool para o scrape atual durante o bloco"""
+        with self.scrape_context() as context:
+            lease = self.driver_pool.acquire()
+            context.lease = lease
+            try:
+                yield lease
+            except Exception:
+                if lease:
+                    lease.failed = True
+                raise
+            finally:
+                context.lease = None
+                self.driver_pool.release(lease)
+
+    def mark_driver_failed(self):
+        lease = self.current_lease
+        if lease:
+            lease.failed = True
 
     def set_last_error(self, code, message, **details):
-        self.last_error = {"error_code": code, "error": message}
+        error = {"error_code": code, "error": message}
         if details:
-            self.last_error["details"] = details
+            error["details"] = details
+        context = CURRENT_SCRAPE.get()
+        if context is not None:
+            context.last_error = error
         log_event(logging.WARNING, "scrape_stage_error", code=code, error_message=message, **details)
 
     def clear_last_error(self):
-        self.last_error = None
+        context = CURRENT_SCRAPE.get()
+        if context is not None:
+            context.last_error = None
 
     def build_chrome_options(self, production=False, user_agent=None, allow_experimental=True):
         options = Options()
@@ -189,6 +2847,9 @@ class FreeIslandScraper:
         options.add_argument('--disable-blink-features=AutomationControlled')
         options.add_argument('--disable-features=IsolateOrigins,site-per-process')
         options.add_argument('--lang=pt-BR,pt')
+        if SELENIUM_FAST_NAVIGATION:
+            # Devolve o controle no DOMContentLoaded, sem esperar imagens/iframes/ads
+            options.page_load_strategy = 'eager'
         if user_agent:
             options.add_argument(f'--user-agent={user_agent}')
         if allow_experimental:
@@ -200,14 +2861,15 @@ class FreeIslandScraper:
                     'profile.default_content_setting_values.notifications': 2
                 })
             except Exception as e:
-                logger.warning(f"Falha ao aplicar opções experimentais do Chrome: {e}")
+                logger.warning("Falha ao aplicar opções experimentais do Chrome: %s", e)
         # Garantir que binary_location seja string
         if getattr(options, "binary_location", None) is not None and not isinstance(options.binary_location, str):
             options.binary_location = str(options.binary_location)
         return options
 
-    def setup_driver(self):
-        """Configura o Selenium WebDriver para deploy no Render"""
+    def create_driver(self):
+        """Cria um Selenium WebDriver (Render ou local) já com hardening aplicado"""
+        driver = None
         if IS_PRODUCTION:
             # Configuração para Render
             options = self.build_chrome_options(
@@ -225,28 +2887,27 @@ class FreeIslandScraper:
                     sys.modules.setdefault("distutils", distutils)
                 import undetected_chromedriver as uc  # Lazy import to avoid distutils issues on newer Python
             except Exception as e:
-                logger.warning(f"Undetected Chrome indisponível: {e}")
+                logger.warning("Undetected Chrome indisponível: %s", e)
 
             if uc is not None and USE_UNDETECTED_IN_PROD:
                 try:
                     # Tentar usar undetected-chromedriver primeiro
-                    self.driver = uc.Chrome(options=options, version_main=None)
+                    driver = uc.Chrome(options=options, version_main=None)
                     logger.info("WebDriver (undetected) inicializado com sucesso no Render")
                 except Exception as e:
-                    logger.warning(f"Undetected Chrome falhou: {e}")
-                    self.driver = None
+                    logger.warning("Undetected Chrome falhou: %s", e)
+                    driver = None
             elif uc is not None:
                 logger.info("Undetected Chrome desabilitado por configuração (USE_UNDETECTED_IN_PROD=false)")
 
-            if self.driver is None:
+            if driver is None:
                 try:
                     # Fallback para Chrome normal
-                    self.driver = webdriver.Chrome(options=options)
+                    driver = webdriver.Chrome(options=options)
                     logger.info("WebDriver (normal) inicializado com sucesso no Render")
                 except Exception as e2:
-                    logger.error(f"Todos os drivers falharam: {e2}")
-                    self.driver = None
-            self.harden_driver()
+                    logger.error("Todos os drivers falharam: %s", e2)
+                    driver = None
         else:
             # Configuração para desenvolvimento local
             options = self.build_chrome_options(
@@ -256,20 +2917,24 @@ class FreeIslandScraper:
             )
             
             try:
-                service = Service(ChromeDriverManager().install())
-                self.driver = webdriver.Chrome(service=service, options=options)
+                # O download/lookup do chromedriver é feito uma vez só para todo o pool
+                if not self.chromedriver_path:
+                    self.chromedriver_path = ChromeDriverManager().install()
+                service = Service(self.chromedriver_path)
+                driver = webdriver.Chrome(service=service, options=options)
                 logger.info("WebDriver inicializado com sucesso localmente")
             except Exception as e:
-                logger.error(f"Erro ao inicializar WebDriver local: {e}")
-                self.driver = None
-            self.harden_driver()
+                logger.error("Erro ao inicializar WebDriver local: %s", e)
+                driver = None
+        self.harden_driver(driver)
+        return driver
 
-    def harden_driver(self):
-        if not self.driver:
+    def harden_driver(self, driver):
+        if not driver:
             return
         try:
-            self.driver.execute_cdp_cmd("Emulation.setTimezoneOverride", {"timezoneId": "America/Sao_Paulo"})
-            self.driver.execute_cdp_cmd(
+            driver.execute_cdp_cmd("Emulation.setTimezoneOverride", {"timezoneId": "America/Sao_Paulo"})
+            driver.execute_cdp_cmd(
                 "Network.setUserAgentOverride",
                 {
                     "userAgent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -277,7 +2942,7 @@ class FreeIslandScraper:
                     "platform": "Linux x86_64"
                 }
             )
-            self.driver.execute_cdp_cmd(
+            driver.execute_cdp_cmd(
                 "Page.addScriptToEvaluateOnNewDocument",
                 {"source": """
 Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
@@ -288,7 +2953,13 @@ window.chrome = window.chrome || { runtime: {} };
 """}
             )
         except Exception as e:
-            logger.debug(f"Falha ao aplicar hardening do driver: {e}")
+            logger.debug("Falha ao aplicar hardening do driver: %s", e)
+        if SELENIUM_FAST_NAVIGATION:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": SELENIUM_BLOCKED_URL_PATTERNS})
+            except Exception as e:
+                logger.debug("Falha ao configurar bloqueio de recursos: %s", e)
 
     def is_blocked_page(self, page_source):
         if not page_source:
@@ -303,17 +2974,39 @@ window.chrome = window.chrome || { runtime: {} };
             'temporarily unavailable',
         ))
 
-    def navigate_with_wait(self, url, wait_seconds=2, ready_timeout=10):
+    def navigate_with_wait(self, url, wait_seconds=2, ready_timeout=10, ready_selectors=None):
+        """Abre a URL e espera o conteúdo.
+
+        No modo rápido (SELENIUM_FAST_NAVIGATION) com ready_selectors, troca os sleeps
+        fixos + scroll pela espera dos grupos de seletores que a extração vai ler.
+        """
+        with timed_stage('selenium_navigate', site_label(url), host=urlparse(url).netloc) as stage:
+            return self.navigate_and_wait(url, stage, wait_seconds, ready_timeout, ready_selectors)
+
+    def navigate_and_wait(self, url, stage, wait_seconds, ready_timeout, ready_selectors):
+        lease = self.current_lease
+        if lease:
+            lease.pages += 1
         self.driver.set_page_load_timeout(20)
         try:
             self.driver.get(url)
-        except TimeoutException:
+        except TimeoutException.resolve():
             logger.warning("Timeout no carregamento (Selenium), continuando...")
             self.set_last_error("SELENIUM_TIMEOUT", "Timeout no carregamento da página", url=url)
+            stage["outcome"] = "timeout"
         except Exception as e:
-            logger.warning(f"Falha ao carregar URL no Selenium: {e}")
+            logger.warning("Falha ao carregar URL no Selenium: %s", e)
             self.set_last_error("SELENIUM_NAV_EXCEPTION", "Falha ao abrir página no Selenium", url=url, error=str(e))
+            self.mark_driver_failed()
+            stage["outcome"] = "error"
+            return False
+        if self.hedge_cancelled():
+            stage["outcome"] = "cancelled"
             return False
+        if SELENIUM_FAST_NAVIGATION and ready_selectors:
+            if not self.wait_for_selector_groups(ready_selectors, timeout=ready_timeout) and stage["outcome"] == "ok":
+                stage["outcome"] = "selectors_missing"
+            return True
         time.sleep(wait_seconds)
         self.wait_ready(timeout=ready_timeout)
         try:
@@ -324,6 +3017,37 @@ window.chrome = window.chrome || { runtime: {} };
             pass
         return True
 
+    def wait_for_selector_groups(self, groups, timeout=8):
+        """Espera até cada grupo de seletores ter ao menos um elemento (um round trip por poll)"""
+        script = (
+            "return arguments[0].map(function(sel) {"
+            " try { return !!document.querySelector(sel); } catch (e) { return false; } });"
+        )
+        joined = [', '.join(group) for group in groups]
+        found = []
+
+        def all_present(driver):
+            if self.hedge_cancelled():
+                return True
+            found[:] = driver.execute_script(script, joined) or []
+            return bool(found) and all(found)
+
+        start = time.time()
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(all_present)
+        except TimeoutException.resolve():
+            pass
+        except Exception as e:
+            logger.debug("Falha aguardando seletores: %s", e)
+        log_event(
+            logging.INFO,
+            "selenium_selector_wait",
+            elapsed_ms=int((time.time() - start) * 1000),
+            groups_found=[bool(f) for f in found],
+            all_found=bool(found) and all(found)
+        )
+        return bool(found) and all(found)
+
     def retry_if_blocked(self, wait_seconds=2, ready_timeout=8):
         """Tenta um refresh simples quando detecta bloqueio/captcha"""
         try:
@@ -331,7 +3055,8 @@ window.chrome = window.chrome || { runtime: {} };
             if self.is_blocked_page(page_source):
                 logger.warning("Bloqueio detectado, tentando refresh...")
                 self.driver.refresh()
-                time.sleep(wait_seconds)
+                if not SELENIUM_FAST_NAVIGATION:
+                    time.sleep(wait_seconds)
                 self.wait_ready(timeout=ready_timeout)
                 page_source = self.driver.page_source
                 if self.is_blocked_page(page_source):
@@ -346,18 +3071,15 @@ window.chrome = window.chrome || { runtime: {} };
         
         parsed_url = urlparse(url.lower())
         domain = parsed_url.netloc
-        full_url = url.lower()
         
-        logger.info(f"Verificando URL: {url}")
-        logger.info(f"Domínio extraído: {domain}")
-        logger.info(f"URL completa: {full_url}")
+        SITE_LOGGER.info("Verificando URL: %s (domínio: %s)", url, domain)
         
         # Verificar no domínio e na URL completa
         if any(d in domain for d in ['mercadolivre.com', 'mercadolivre.com.br', 'ml.com.br', 'ml.com', 'meli.la']):
             return 'mercadolivre'
         elif any(d in domain for d in ['amazon.com.br', 'amzn.to']):
             return 'amazon'
-        logger.warning(f"Site não reconhecido para URL: {url} - Domínio: {domain}")
+        logger.warning("Site não reconhecido para URL: %s - Domínio: %s", url, domain)
         return 'unknown'
     
     def clean_price(self, text, apply_amazon_fixes=True):
@@ -366,7 +3088,7 @@ window.chrome = window.chrome || { runtime: {} };
             return None, None
         
         original = text.strip()
-        logger.info(f"Processando preço: '{original}'")
+        PRICE_LOGGER.info("Processando preço: '%s'", original)
         
         # Primeiro: normalizar quebras de linha e espaços múltiplos
         normalized = re.sub(r'[\n\r\s]+', '', text)
@@ -420,19 +3142,19 @@ window.chrome = window.chrome || { runtime: {} };
                 if '\n' in original or '\r' in original:
                     # Preço Amazon com quebra de linha: mover vírgula 2 casas
                     price_float = price_float / 100
-                    logger.info(f"Preço Amazon corrigido (quebra linha): {original} -> {price_float}")
+                    PRICE_LOGGER.info("Preço Amazon corrigido (quebra linha): %s -> %s", original, price_float)
                 elif len(str(int(price_float))) >= 4 and '.' not in clean and ',' not in clean:
                     # Número grande sem separadores: provavelmente Amazon
                     if len(str(int(price_float))) == 5:  # 39999 -> 399.99
                         price_float = price_float / 100
-                        logger.info(f"Preço Amazon 5 dígitos corrigido: {original} -> {price_float}")
+                        PRICE_LOGGER.info("Preço Amazon 5 dígitos corrigido: %s -> %s", original, price_float)
                     elif len(str(int(price_float))) == 4:  # 1299 -> 12.99
                         price_float = price_float / 100
-                        logger.info(f"Preço Amazon 4 dígitos corrigido: {original} -> {price_float}")
+                        PRICE_LOGGER.info("Preço Amazon 4 dígitos corrigido: %s -> %s", original, price_float)
                 elif price_float >= 10000 and price_float < 100000:
                     # Padrão Amazon tradicional: mover vírgula 2 casas
                     price_float = price_float / 100
-                    logger.info(f"Preço Amazon padrão corrigido: {original} -> {price_float}")
+                    PRICE_LOGGER.info("Preço Amazon padrão corrigido: %s -> %s", original, price_float)
 
             # Formatar no padrão brasileiro
             if price_float >= 1000:
@@ -440,11 +3162,11 @@ window.chrome = window.chrome || { runtime: {} };
             else:
                 formatted = f"R$ {price_float:.2f}".replace('.', ',')
 
-            logger.info(f"Preço processado: {original} -> {formatted}")
+            PRICE_LOGGER.info("Preço processado: %s -> %s", original, formatted)
             return formatted, price_float
 
         except ValueError:
-            logger.warning(f"Não foi possível converter o preço '{original}'")
+            logger.warning("Não foi possível converter o preço '%s'", original)
             return original, None
 
     def normalize_price_text(self, text):
@@ -455,35 +3177,43 @@ window.chrome = window.chrome || { runtime: {} };
         parts = re.split(r'\s*[-–]\s*', normalized)
         return parts[0].strip() if parts else normalized
 
-    def ensure_driver(self):
-        """Garante que o WebDriver esteja pronto para uso"""
-        if self.driver is None:
-            self.setup_driver()
-        return self.driver is not None
-
     def wait_ready(self, timeout=10):
         """Aguarda o carregamento básico da página"""
         try:
             WebDriverWait(self.driver, timeout).until(
                 lambda d: d.execute_script("return document.readyState") in ("interactive", "complete")
             )
-        except TimeoutException:
+        except TimeoutException.resolve():
             logger.warning("Timeout aguardando document.readyState, continuando...")
 
     def has_any_data(self, data):
         return any(data.get(k) for k in ("title", "price", "image_url"))
 
-    def first_text_by_selectors(self, selectors, min_len=1):
+    def ordered_selectors(self, selectors, chain=None):
+        """Achata tiers (tuplas) de seletores; com chain, a ordem dentro do tier vem de SELECTOR_STATS"""
+        tiers = [list(sel) if isinstance(sel, tuple) else [sel] for sel in selectors]
+        if chain:
+            return SELECTOR_STATS.order(chain, tiers)
+        return [sel for tier in tiers for sel in tier]
+
+    def record_selector(self, chain, selector, hit, start):
+        if chain:
+            SELECTOR_STATS.record(chain, selector, hit, (time.perf_counter() - start) * 1000)
+
+    def first_text_by_selectors(self, selectors, min_len=1, chain=None):
         """Retorna o primeiro texto encontrado para a lista de seletores"""
-        for selector in selectors:
+        for selector in self.ordered_selectors(selectors, chain):
+            start = time.perf_counter()
             try:
                 elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                 for element in elements:
                     text = element.text.strip()
                     if text and len(text) >= min_len:
+                        self.record_selector(chain, selector, True, start)
                         return text
             except Exception:
-                continue
+                pass
+            self.record_selector(chain, selector, False, start)
         return None
 
     def first_attr_by_selectors(self, selectors, attrs=("src", "data-src", "data-old-hires", "data-a-hires")):
@@ -512,8 +3242,9 @@ window.chrome = window.chrome || { runtime: {} };
                 continue
         return None
 
-    def extract_price_from_selectors(self, selectors, apply_amazon_fixes=True):
-        for selector in selectors:
+    def extract_price_from_selectors(self, selectors, apply_amazon_fixes=True, chain=None):
+        for selector in self.ordered_selectors(selectors, chain):
+            start = time.perf_counter()
             try:
                 elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                 for element in elements:
@@ -522,9 +3253,11 @@ window.chrome = window.chrome || { runtime: {} };
                         price_text = self.normalize_price_text(price_text)
                         formatted, price_val = self.clean_price(price_text, apply_amazon_fixes=apply_amazon_fixes)
                         if formatted and price_val:
+                            self.record_selector(chain, selector, True, start)
                             return formatted, price_val
             except Exception:
-                continue
+                pass
+            self.record_selector(chain, selector, False, start)
         return None, None
 
     def extract_ml_money_amount_text(self, money_amount_element):
@@ -574,24 +3307,26 @@ window.chrome = window.chrome || { runtime: {} };
 
     def extract_amazon_price(self):
         """Extrai preço Amazon usando combinações de seletores mais estáveis"""
+        stages = StageTimer('amazon_selenium_price_stage')
         # 1) Preço principal no bloco corePriceDisplay (mais confiável)
         offscreen_text = self.first_text_by_selectors([
-            '#corePriceDisplay_desktop_feature_div .priceToPay .aok-offscreen',
-            '#corePriceDisplay_desktop_feature_div .priceToPay .a-offscreen',
-            '#corePriceDisplay_desktop_feature_div .a-price .aok-offscreen',
-            '#corePriceDisplay_desktop_feature_div .a-price .a-offscreen',
+            ('#corePriceDisplay_desktop_feature_div .priceToPay .aok-offscreen',
+             '#corePriceDisplay_desktop_feature_div .priceToPay .a-offscreen'),
+            ('#corePriceDisplay_desktop_feature_div .a-price .aok-offscreen',
+             '#corePriceDisplay_desktop_feature_div .a-price .a-offscreen'),
             '#apex_desktop_newAccordionRow .a-offscreen',
-        ], min_len=2)
-        if offscreen_text:
+        ], min_len=2, chain='amazon_selenium_price_offscreen')
+        if stages.done('offscreen', offscreen_text):
             return offscreen_text
 
         # 2) Montar preço por partes (símbolo + inteiro + fração) no corePriceDisplay
         containers = [
-            '#corePriceDisplay_desktop_feature_div .a-price.priceToPay',
-            '#corePriceDisplay_desktop_feature_div .a-price.aok-align-center.reinventPricePriceToPayMargin.priceToPay',
+            ('#corePriceDisplay_desktop_feature_div .a-price.priceToPay',
+             '#corePriceDisplay_desktop_feature_div .a-price.aok-align-center.reinventPricePriceToPayMargin.priceToPay'),
             '#corePriceDisplay_desktop_feature_div .a-price',
         ]
-        for selector in containers:
+        for selector in self.ordered_selectors(containers, 'amazon_selenium_price_parts'):
+            start = time.perf_counter()
             try:
                 elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                 for element in elements:
@@ -606,19 +3341,23 @@ window.chrome = window.chrome || { runtime: {} };
                             price_text = f"{symbol_text} {whole_text}"
                             if fraction_text:
                                 price_text += f",{fraction_text}"
+                            self.record_selector('amazon_selenium_price_parts', selector, True, start)
+                            stages.done('parts', True)
                             return price_text
             except Exception:
-                continue
+                pass
+            self.record_selector('amazon_selenium_price_parts', selector, False, start)
+        stages.done('parts', False)
 
         # 3) Fallback: apex_price (às vezes usado no centro)
         offscreen_text = self.first_text_by_selectors([
-            '#apex_desktop #apex_price .aok-offscreen',
-            '#apex_desktop #apex_price .a-offscreen',
+            ('#apex_desktop #apex_price .aok-offscreen',
+             '#apex_desktop #apex_price .a-offscreen'),
             '#priceblock_ourprice',
             '#priceblock_dealprice',
             '#priceblock_saleprice',
-        ], min_len=2)
-        if offscreen_text:
+        ], min_len=2, chain='amazon_selenium_price_fallback')
+        if stages.done('apex_priceblock', offscreen_text):
             return offscreen_text
 
         # 4) Fallback final: meta tags (podem existir em alguns layouts)
@@ -627,27 +3366,41 @@ window.chrome = window.chrome || { runtime: {} };
                 "var m = document.querySelector('meta[property=\"product:price:amount\"], meta[property=\"og:price:amount\"]');"
                 "return m ? m.getAttribute('content') : null;"
             )
-            if meta_price:
+            if stages.done('meta', meta_price):
                 return f"R$ {meta_price}"
         except Exception:
-            pass
+            stages.done('meta', False)
 
         return None
 
-    def scrape_amazon_requests(self, url):
-        """Extrai dados da Amazon via requests (mais rápido que Selenium)"""
-        self.clear_last_error()
-        headers = {
+    def amazon_request_headers(self):
+        return {
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-            "Connection": "close"
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
         }
+
+    def is_amazon_captcha(self, html):
+        lower_html = (html or "").lower()
+        return 'captcha' in lower_html or 'robot check' in lower_html or 'validatecaptcha' in lower_html
+
+    def log_amazon_markers(self, html, final_url):
+        log_event(
+            logging.INFO,
+            "amazon_requests_html_markers",
+            final_url=final_url,
+            **html_markers(AMAZON_HTML_MARKERS, html)
+        )
+
+    def scrape_amazon_requests(self, url):
+        """Extrai dados da Amazon via requests (mais rápido que Selenium)"""
+        self.clear_last_error()
+        headers = self.amazon_request_headers()
         try:
             start = time.time()
             resolved_url = self.resolve_amazon_url(url)
             request_url = self.canonicalize_amazon_url(resolved_url)
-            response = request_with_retries('GET', request_url, headers=headers, timeout=12, allow_redirects=True)
+            response, html = fetch_product_page(request_url, AMAZON_STREAM_MARKERS, 'amazon', headers=headers, timeout=12)
             elapsed_ms = int((time.time() - start) * 1000)
             log_event(
                 logging.INFO,
@@ -656,22 +3409,18 @@ window.chrome = window.chrome || { runtime: {} };
                 elapsed_ms=elapsed_ms,
                 final_url=response.url,
                 request_url=request_url,
-                content_length=len(response.text or "")
+                content_length=len(html)
             )
             if response.status_code != 200:
                 log_event(logging.WARNING, "amazon_requests_non_200", status=response.status_code, final_url=response.url)
                 self.set_last_error("AMAZON_REQUESTS_NON_200", "Resposta não-200 da Amazon (requests)", status=response.status_code, final_url=response.url)
                 return None
 
-            html = response.text
-            lower_html = html.lower()
-            if 'captcha' in lower_html or 'robot check' in lower_html or 'validatecaptcha' in lower_html:
+            if self.is_amazon_captcha(html):
                 # Retry único em URL canônica sem parâmetros de tracking
                 canonical_retry = self.canonicalize_amazon_url(response.url or request_url)
                 if canonical_retry != request_url:
-                    retry_response = request_with_retries('GET', canonical_retry, headers=headers, timeout=12, allow_redirects=True)
-                    retry_html = retry_response.text or ""
-                    retry_lower = retry_html.lower()
+                    retry_response, retry_html = fetch_product_page(canonical_retry, AMAZON_STREAM_MARKERS, 'amazon', headers=headers, timeout=12)
                     log_event(
                         logging.INFO,
                         "amazon_requests_retry_response",
@@ -680,160 +3429,246 @@ window.chrome = window.chrome || { runtime: {} };
                         request_url=canonical_retry,
                         content_length=len(retry_html)
                     )
-                    if retry_response.status_code == 200 and not ('captcha' in retry_lower or 'robot check' in retry_lower or 'validatecaptcha' in retry_lower):
+                    if retry_response.status_code == 200 and not self.is_amazon_captcha(retry_html):
                         response = retry_response
                         html = retry_html
-                        lower_html = retry_lower
-                if 'captcha' in lower_html or 'robot check' in lower_html or 'validatecaptcha' in lower_html:
+                if self.is_amazon_captcha(html):
                     log_event(logging.WARNING, "amazon_requests_blocked", reason="captcha_or_robot_check", final_url=response.url)
                     self.set_last_error("AMAZON_REQUESTS_BLOCKED", "Bloqueio/captcha detectado (requests)", final_url=response.url)
                     return None
-            log_event(
-                logging.INFO,
-                "amazon_requests_html_markers",
-                has_product_title=("productTitle" in html),
-                has_core_price=("corePriceDisplay" in html),
-                has_meta_price=('property="product:price:amount"' in html or 'property="og:price:amount"' in html),
-                has_og_image=('property="og:image"' in html),
-                final_url=response.url
-            )
-
-            soup = BeautifulSoup(html, 'html.parser')
-            data = {'url': url, 'resolved_url': response.url or resolved_url or url}
-
-            title_el = soup.select_one('#productTitle') or soup.select_one('#title span') or soup.select_one('#title')
-            if title_el:
-                title = title_el.get_text(strip=True)
-                if title:
-                    data['title'] = title
-
-            price_el = soup.select_one('#corePriceDisplay_desktop_feature_div .priceToPay .aok-offscreen') \
-                or soup.select_one('#corePriceDisplay_desktop_feature_div .priceToPay .a-offscreen') \
-                or soup.select_one('#corePriceDisplay_desktop_feature_div .a-price .aok-offscreen') \
-                or soup.select_one('#corePriceDisplay_desktop_feature_div .a-price .a-offscreen') \
-                or soup.select_one('#apex_desktop #apex_price .aok-offscreen') \
-                or soup.select_one('#apex_desktop #apex_price .a-offscreen') \
-                or soup.select_one('span.a-price > span.a-offscreen') \
-                or soup.select_one('span.a-price span.a-offscreen') \
-                or soup.select_one('#priceblock_ourprice') \
-                or soup.select_one('#priceblock_dealprice') \
-                or soup.select_one('#priceblock_saleprice')
-            price_text = price_el.get_text(strip=True) if price_el else None
-            if not price_text:
-                symbol = soup.select_one('#corePriceDisplay_desktop_feature_div .a-price-symbol')
-                whole = soup.select_one('#corePriceDisplay_desktop_feature_div .a-price-whole')
-                fraction = soup.select_one('#corePriceDisplay_desktop_feature_div .a-price-fraction')
-                if whole:
-                    symbol_text = symbol.get_text(strip=True) if symbol else 'R$'
-                    whole_text = whole.get_text(strip=True).rstrip(',.')
-                    fraction_text = fraction.get_text(strip=True) if fraction else ''
-                    price_text = f"{symbol_text} {whole_text}"
-                    if fraction_text:
-                        price_text += f",{fraction_text}"
-            if not price_text:
-                # Fallback mais amplo: procurar partes de preço em qualquer bloco
-                symbol = soup.select_one('.a-price-symbol')
-                whole = soup.select_one('.a-price-whole')
-                fraction = soup.select_one('.a-price-fraction')
-                if whole:
-                    symbol_text = symbol.get_text(strip=True) if symbol else 'R$'
-                    whole_text = whole.get_text(strip=True).rstrip(',.')
-                    fraction_text = fraction.get_text(strip=True) if fraction else ''
-                    price_text = f"{symbol_text} {whole_text}"
-                    if fraction_text:
-                        price_text += f",{fraction_text}"
-            if not price_text:
-                # Fallback: apex_price (às vezes aparece no centro do ATF)
-                apex_offscreen = soup.select_one('#apex_desktop #apex_price .aok-offscreen') \
-                    or soup.select_one('#apex_desktop #apex_price .a-offscreen')
-                if apex_offscreen:
-                    price_text = apex_offscreen.get_text(strip=True)
-            if not price_text:
-                # Fallback final: meta tags
-                meta_price = soup.select_one('meta[property="product:price:amount"]') or soup.select_one('meta[property="og:price:amount"]')
-                if meta_price and meta_price.get('content'):
-                    price_text = f"R$ {meta_price.get('content')}"
-            if not price_text:
-                # Fallback extra: JSON-LD
-                try:
-                    for script in soup.select('script[type="application/ld+json"]'):
-                        if not script.string:
-                            continue
-                        if '"price"' in script.string and '"priceCurrency"' in script.string:
-                            match = re.search(r'"price"\s*:\s*"?(\\d+[\\d.,]*)"?', script.string)
-                            if match:
-                                price_text = f"R$ {match.group(1)}"
-                                break
-                except Exception:
-                    pass
-            if not price_text:
-                # Fallback extra: dados de variação no HTML (twister/cards)
-                regex_candidates = [
-                    r'"displayPrice"\s*:\s*"([^"]+)"',
-                    r'"priceToPay"\s*:\s*"([^"]+)"',
-                    r'"priceAmount"\s*:\s*([0-9]+(?:\.[0-9]{1,2})?)',
-                    r'R\$\s?[0-9\.\,]{2,}',
-                ]
-                for pattern in regex_candidates:
-                    match = re.search(pattern, html, re.IGNORECASE)
-                    if not match:
-                        continue
-                    candidate = match.group(1).replace('&nbsp;', ' ').strip()
-                    if pattern.endswith('([0-9]+(?:\\.[0-9]{1,2})?)'):
-                        candidate = f"R$ {candidate}"
-                    if 'R$' in candidate or re.search(r'[0-9]', candidate):
-                        price_text = candidate
-                        break
+            self.log_amazon_markers(html, response.url)
 
-            if price_text:
-                formatted, price_val = self.clean_price(price_text)
-                if formatted:
-                    data['price'] = formatted
-                    data['price_value'] = price_val
-
-            image_el = soup.select_one('#landingImage') or soup.select_one('img[data-a-hires]') or soup.select_one('img[data-old-hires]')
-            img_src = None
-            if image_el:
-                img_src = image_el.get('data-old-hires') or image_el.get('data-a-hires') or image_el.get('src')
-            if not img_src:
-                og_img = soup.select_one('meta[property="og:image"]')
-                if og_img:
-                    img_src = og_img.get('content')
-            if img_src and 'http' in img_src:
-                data['image_url'] = img_src
+            data = self.extract_product_data('amazon', html, url, response.url or resolved_url or url)
 
             if any(data.get(k) for k in ('title', 'price', 'image_url')):
                 log_event(logging.INFO, "amazon_requests_success", has_title=bool(data.get("title")), has_price=bool(data.get("price")), has_image=bool(data.get("image_url")))
                 return data
             log_event(logging.WARNING, "amazon_requests_no_data", final_url=response.url)
             self.set_last_error("AMAZON_REQUESTS_NO_DATA", "Nenhum dado encontrado (requests)", final_url=response.url)
+        except ScrapeCancelled:
+            log_event(logging.INFO, "amazon_requests_cancelled")
         except Exception as e:
             log_event(logging.ERROR, "amazon_requests_exception", error=str(e))
             self.set_last_error("AMAZON_REQUESTS_EXCEPTION", "Erro ao requisitar Amazon (requests)", error=str(e))
 
         return None
 
+    def extract_product_data(self, site, html, url, resolved_url):
+        """Extrai título/preço/imagem: primeiro do JSON/meta embutido, DOM completo só se faltar campo"""
+        doc = HtmlDocument.of(html)
+        missing = None
+        if EMBEDDED_FAST_PATH:
+            start = time.perf_counter()
+            extract_embedded = self.extract_amazon_embedded if site == 'amazon' else self.extract_mercadolivre_embedded
+            data = extract_embedded(doc.text, url, resolved_url)
+            missing = [k for k in ('title', 'price', 'image_url') if not data.get(k)]
+            scan_ms = round((time.perf_counter() - start) * 1000, 2)
+            if not missing:
+                data['extraction_stage'] = 'embedded'
+                log_event(logging.INFO, "extraction_stage", site=site, stage="embedded", scan_ms=scan_ms, bytes=len(doc.text))
+                return data
+        parse_html = self.parse_amazon_html if site == 'amazon' else self.parse_mercadolivre_html
+        data = parse_html(doc, url, resolved_url)
+        data['extraction_stage'] = 'dom'
+        log_event(logging.INFO, "extraction_stage", site=site, stage="dom", embedded_missing=missing)
+        return data
+
+    def extract_amazon_embedded(self, html, url, resolved_url):
+        """Fast path da Amazon: productTitle, JSON-LD e metas (sem DOM)"""
+        fields = scan_embedded_fields(AMAZON_EMBEDDED_RE, html)
+        metas = fields['meta']
+        product = embedded_json_ld_product(fields['ld_json'])
+        data = {'url': url, 'resolved_url': resolved_url or url}
+
+        title = html_unescape(fields.get('title') or '').strip() or str((product or {}).get('name') or '').strip()
+        if title:
+            data['title'] = title
+
+        price_text = None
+        if json_ld_offer_price(product):
+            price_text = f"R$ {json_ld_offer_price(product)}"
+        if not price_text:
+            meta_price = metas.get('product:price:amount') or metas.get('og:price:amount')
+            if meta_price:
+                price_text = f"R$ {meta_price}"
+        if price_text:
+            # Valor decimal de máquina (JSON-LD/meta): as correções ÷100 do buybox o corromperiam
+            formatted, price_val = self.clean_price(price_text, apply_amazon_fixes=False)
+            if formatted:
+                data['price'] = formatted
+                data['price_value'] = price_val
+
+        img_src = None
+        if fields.get('landing'):
+            attrs = parse_tag_attrs(fields['landing'])
+            img_src = attrs.get('data-old-hires') or attrs.get('data-a-hires') or attrs.get('src')
+        if not img_src:
+            img_src = metas.get('og:image') or json_ld_image(product)
+        if img_src and 'http' in img_src:
+            data['image_url'] = img_src
+        return data
+
+    def extract_mercadolivre_embedded(self, html, url, resolved_url):
+        """Fast path do Mercado Livre: metas itemprop/og e JSON-LD (sem DOM)"""
+        fields = scan_embedded_fields(MERCADOLIVRE_EMBEDDED_RE, html)
+        metas = fields['meta']
+        product = embedded_json_ld_product(fields['ld_json'])
+        data = {'url': url, 'resolved_url': resolved_url or url}
+
+        title = html_unescape(fields.get('title') or '').strip() or str((product or {}).get('name') or '').strip()
+        if title:
+            data['title'] = title
+
+        price = metas.get('price') or json_ld_offer_price(product)
+        if price:
+            formatted, price_val = self.clean_price(f"R$ {price}", apply_amazon_fixes=False)
+            if formatted:
+                data['price'] = formatted
+                data['price_value'] = price_val
+
+        img_src = metas.get('og:image') or json_ld_image(product)
+        if img_src and 'http' in img_src:
+            data['image_url'] = img_src
+        return data
+
+    def parse_amazon_html(self, html, url, resolved_url):
+        """Extrai título, preço e imagem do HTML de produto da Amazon"""
+        doc = HtmlDocument.of(html)
+        reused = doc.parsed
+        root = doc.root
+        extract_start = time.perf_counter()
+        plan = AMAZON_PARSE_PLAN
+        html = doc.text
+        data = {'url': url, 'resolved_url': resolved_url or url}
+
+        title_el = plan['title'].first(root)
+        if title_el is not None:
+            title = node_text(title_el)
+            if title:
+                data['title'] = title
+
+        stages = StageTimer('amazon_dom_price_stage')
+        price_el = plan['price'].first(root)
+        price_text = stages.done('selectors', node_text(price_el) if price_el is not None else None)
+        for part in ('core', 'any'):
+            if price_text:
+                break
+            # 'any' é o fallback mais amplo: partes de preço em qualquer bloco
+            symbol = plan[f'{part}_symbol'].first(root)
+            whole = plan[f'{part}_whole'].first(root)
+            fraction = plan[f'{part}_fraction'].first(root)
+            if whole is not None:
+                symbol_text = node_text(symbol) if symbol is not None else 'R$'
+                whole_text = node_text(whole).rstrip(',.')
+                fraction_text = node_text(fraction) if fraction is not None else ''
+                price_text = f"{symbol_text} {whole_text}"
+                if fraction_text:
+                    price_text += f",{fraction_text}"
+            stages.done(f'{part}_parts', price_text)
+        if not price_text:
+            # Fallback: apex_price (às vezes aparece no centro do ATF)
+            apex_offscreen = plan['apex_price'].first(root)
+            if apex_offscreen is not None:
+                price_text = node_text(apex_offscreen)
+            stages.done('apex', price_text)
+        if not price_text:
+            # Fallback final: meta tags
+            meta_price = plan['meta_price'].first(root)
+            if meta_price is not None and meta_price.get('content'):
+                price_text = f"R$ {meta_price.get('content')}"
+            stages.done('meta', price_text)
+        if not price_text:
+            # Fallback extra: JSON-LD
+            try:
+                for script in plan['ld_json'].all(root):
+                    if not script.text:
+                        continue
+                    if '"price"' in script.text and '"priceCurrency"' in script.text:
+                        match = re.search(r'"price"\s*:\s*"?(\\d+[\\d.,]*)"?', script.text)
+                        if match:
+                            price_text = f"R$ {match.group(1)}"
+                            break
+            except Exception:
+                pass
+            stages.done('ld_json', price_text)
+        if not price_text:
+            # Fallback extra: dados de variação no HTML (twister/cards)
+            regex_candidates = [
+                r'"displayPrice"\s*:\s*"([^"]+)"',
+                r'"priceToPay"\s*:\s*"([^"]+)"',
+                r'"priceAmount"\s*:\s*([0-9]+(?:\.[0-9]{1,2})?)',
+                r'R\$\s?[0-9\.\,]{2,}',
+            ]
+            for pattern in regex_candidates:
+                match = re.search(pattern, html, re.IGNORECASE)
+                if not match:
+                    continue
+                candidate = match.group(1).replace('&nbsp;', ' ').strip()
+                if pattern.endswith('([0-9]+(?:\\.[0-9]{1,2})?)'):
+                    candidate = f"R$ {candidate}"
+                if 'R$' in candidate or re.search(r'[0-9]', candidate):
+                    price_text = candidate
+                    break
+            stages.done('regex', price_text)
+
+        if price_text:
+            formatted, price_val = self.clean_price(price_text)
+            if formatted:
+                data['price'] = formatted
+                data['price_value'] = price_val
+
+        image_el = plan['image'].first(root)
+        img_src = None
+        if image_el is not None:
+            img_src = image_el.get('data-old-hires') or image_el.get('data-a-hires') or image_el.get('src')
+        if not img_src:
+            og_img = plan['og_image'].first(root)
+            if og_img is not None:
+                img_src = og_img.get('content')
+        if img_src and 'http' in img_src:
+            data['image_url'] = img_src
+        log_html_parse('amazon', 'pdp', doc, reused, extract_start)
+        return data
+
     def resolve_amazon_url(self, url):
-        """Resolve URLs encurtadas da Amazon (ex: amzn.to)"""
-        headers = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-            "Connection": "close"
-        }
-        try:
-            response = request_with_retries('HEAD', url, headers=headers, timeout=8, allow_redirects=True)
-            if response.url:
-                return response.url
-        except Exception:
-            pass
-        try:
-            response = request_with_retries('GET', url, headers=headers, timeout=10, allow_redirects=True)
-            if response.url:
-                return response.url
-        except Exception:
-            pass
-        return url
+        """Resolve URLs encurtadas da Amazon (ex: amzn.to), usando o cache persistente"""
+        cached = RESOLVE_CACHE.get(url)
+        if cached:
+            return cached["resolved_url"]
+        with timed_stage('resolve', 'amazon', host=urlparse(url).netloc) as stage:
+            resolved, outcome = self.follow_amazon_redirects(url)
+            stage["outcome"] = outcome
+        self.cache_resolution(url, 'amazon', resolved, outcome)
+        return resolved
+
+    def follow_amazon_redirects(self, url):
+        """Segue redirects da Amazon; retorna (url_final, resultado) com resultado ok/dead/error"""
+        headers = self.amazon_request_headers()
+        for method, timeout in (('HEAD', 8), ('GET', 10)):
+            try:
+                response = request_with_retries(method, url, headers=headers, timeout=timeout, allow_redirects=True)
+                if response.url:
+                    return response.url, resolution_outcome(response.status_code)
+            except Exception:
+                continue
+        return url, "error"
+
+    def cache_resolution(self, url, site, resolved, outcome):
+        """Só grava resoluções confiáveis: link morto (404/410, cache negativo) ou URL final que
+        identifica o produto (ASIN/MLB). Exceções, timeouts e páginas de captcha, verificação ou
+        login não entram no cache, senão um fetch ruim fixaria a resposta errada por dias."""
+        if outcome == "dead":
+            RESOLVE_CACHE.set(url, site, resolved, ok=False)
+            return True
+        if site == 'amazon':
+            identity = self.extract_amazon_identity(resolved)
+        else:
+            identity = self.extract_mercadolivre_identity(resolved)
+        if outcome == "ok" and identity:
+            RESOLVE_CACHE.set(url, site, resolved, ok=True)
+            return True
+        log_event(logging.INFO, "resolve_not_cached", site=site, url=url, resolved_url=resolved, outcome=outcome)
+        return False
 
     def canonicalize_amazon_url(self, url):
         """Normaliza URL Amazon para reduzir tracking e variacao de pagina."""
@@ -864,28 +3699,32 @@ window.chrome = window.chrome || { runtime: {} };
             return url
 
     def resolve_mercadolivre_url(self, url):
-        """Resolve links encurtados/social do Mercado Livre para URL canônica do produto"""
-        headers = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-            "Connection": "close",
-            "Upgrade-Insecure-Requests": "1",
-            "Referer": "https://www.mercadolivre.com.br/",
-            "Sec-Fetch-Site": "none",
-            "Sec-Fetch-Mode": "navigate",
-            "Sec-Fetch-User": "?1",
-            "Sec-Fetch-Dest": "document"
-        }
+        """Resolve links encurtados/social do Mercado Livre, usando o cache persistente"""
+        cached = RESOLVE_CACHE.get(url)
+        if cached:
+            return cached["resolved_url"]
+        with timed_stage('resolve', 'mercadolivre', host=urlparse(url).netloc) as stage:
+            resolved, outcome = self.follow_mercadolivre_redirects(url)
+            stage["outcome"] = outcome
+        self.cache_resolution(url, 'mercadolivre', resolved, outcome)
+        return resolved
+
+    def follow_mercadolivre_redirects(self, url):
+        """Resolve links encurtados/social do Mercado Livre para URL canônica do produto.
+
+        Retorna (url_final, resultado): ok, dead (404/410) ou error (nenhuma requisição ao link respondeu).
+        """
+        headers = self.mercadolivre_resolve_headers()
         resolved = url
-        session = requests.Session()
-        session.headers.update(headers)
+        status = None
         try:
-            request_with_retries('GET', "https://www.mercadolivre.com.br/", timeout=8, headers=session.headers)
+            warmup = request_with_retries('GET', "https://www.mercadolivre.com.br/", timeout=8, headers=headers)
+            warmup.close()
         except Exception:
             pass
         try:
-            response = request_with_retries('HEAD', url, timeout=8, allow_redirects=True, headers=session.headers)
+            response = request_with_retries('HEAD', url, timeout=8, allow_redirects=True, headers=headers)
+            status = response.status_code
             if response.url:
                 resolved = response.url
         except Exception:
@@ -893,7 +3732,10 @@ window.chrome = window.chrome || { runtime: {} };
 
         try:
             if resolved == url:
-                response = request_with_retries('GET', url, timeout=10, allow_redirects=True, stream=True, headers=session.headers)
+                response = request_with_retries('GET', url, timeout=10, allow_redirects=True, stream=True, headers=headers)
+                # Corpo não é lido: fechar devolve a conexão ao pool
+                response.close()
+                status = response.status_code
                 if response.url:
                     resolved = response.url
         except Exception:
@@ -901,52 +3743,80 @@ window.chrome = window.chrome || { runtime: {} };
 
         # Se caiu em página social/forçada, tentar canônica
         try:
-            parsed = urlparse(resolved)
-            if '/social/' in parsed.path or 'forceInApp' in parsed.query or 'matt_' in parsed.query:
-                response = request_with_retries('GET', resolved, timeout=10, allow_redirects=True, headers=session.headers)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                canonical = soup.select_one('link[rel="canonical"]')
-                og_url = soup.select_one('meta[property="og:url"]')
-                candidate = None
-                if canonical and canonical.get('href'):
-                    candidate = canonical.get('href')
-                elif og_url and og_url.get('content'):
-                    candidate = og_url.get('content')
-                if not candidate:
-                    # Tentar extrair URL de produto no HTML
-                    patterns = [
-                        r'https?://(?:www\.)?mercadolivre\.com\.br/[^"\s>]+/p/[^"\s>]+',
-                        r'https?://(?:www\.)?mercadolivre\.com\.br/[^"\s>]+/MLB-\d+[^"\s>]*',
-                        r'https?://produto\.mercadolivre\.com\.br/MLB-\d+[^"\s>]*'
-                    ]
-                    for pattern in patterns:
-                        match = re.search(pattern, response.text)
-                        if match:
-                            candidate = match.group(0)
-                            break
-                if not candidate:
-                    # Tentar pegar href do primeiro card
-                    first = soup.select_one('.poly-card .poly-component__title')
-                    if first and first.get('href'):
-                        candidate = first.get('href')
+            if self.is_mercadolivre_social_url(resolved):
+                response = request_with_retries('GET', resolved, timeout=10, allow_redirects=True, headers=headers)
+                candidate = self.find_mercadolivre_canonical_candidate(response.text)
                 if candidate:
                     try:
-                        prod = request_with_retries('GET', candidate, timeout=10, allow_redirects=True, headers=session.headers)
+                        prod = request_with_retries('GET', candidate, timeout=10, allow_redirects=True, headers=headers)
                         if prod.url:
-                            return prod.url
+                            return prod.url, "ok"
                     except Exception:
-                        return candidate
+                        return candidate, "ok"
 
                 # Remover parâmetros de tracking
-                q = parse_qs(parsed.query)
-                for k in ['forceInApp', 'ref', 'matt_word', 'matt_tool', 'origin']:
-                    q.pop(k, None)
-                cleaned = parsed._replace(query=urlencode(q, doseq=True), fragment="")
-                return urlunparse(cleaned)
+                return self.strip_mercadolivre_tracking(resolved), resolution_outcome(status)
         except Exception:
             pass
 
-        return resolved
+        return resolved, resolution_outcome(status)
+
+    def mercadolivre_resolve_headers(self):
+        return {
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+            "Upgrade-Insecure-Requests": "1",
+            "Referer": "https://www.mercadolivre.com.br/",
+            "Sec-Fetch-Site": "none",
+            "Sec-Fetch-Mode": "navigate",
+            "Sec-Fetch-User": "?1",
+            "Sec-Fetch-Dest": "document"
+        }
+
+    def is_mercadolivre_social_url(self, url):
+        parsed = urlparse(url)
+        return '/social/' in parsed.path or 'forceInApp' in parsed.query or 'matt_' in parsed.query
+
+    def strip_mercadolivre_tracking(self, url):
+        parsed = urlparse(url)
+        q = parse_qs(parsed.query)
+        for k in ['forceInApp', 'ref', 'matt_word', 'matt_tool', 'origin']:
+            q.pop(k, None)
+        cleaned = parsed._replace(query=urlencode(q, doseq=True), fragment="")
+        return urlunparse(cleaned)
+
+    def find_mercadolivre_canonical_candidate(self, html):
+        """Procura a URL canônica do produto no HTML de uma página social"""
+        doc = HtmlDocument.of(html)
+        root = doc.root
+        html = doc.text
+        plan = MERCADOLIVRE_PARSE_PLAN
+        canonical = plan['canonical'].first(root)
+        og_url = plan['og_url'].first(root)
+        candidate = None
+        if canonical is not None and canonical.get('href'):
+            candidate = canonical.get('href')
+        elif og_url is not None and og_url.get('content'):
+            candidate = og_url.get('content')
+        if not candidate:
+            # Tentar extrair URL de produto no HTML
+            patterns = [
+                r'https?://(?:www\.)?mercadolivre\.com\.br/[^"\s>]+/p/[^"\s>]+',
+                r'https?://(?:www\.)?mercadolivre\.com\.br/[^"\s>]+/MLB-\d+[^"\s>]*',
+                r'https?://produto\.mercadolivre\.com\.br/MLB-\d+[^"\s>]*'
+            ]
+            for pattern in patterns:
+                match = re.search(pattern, html)
+                if match:
+                    candidate = match.group(0)
+                    break
+        if not candidate:
+            # Tentar pegar href do primeiro card
+            first = plan['first_card_title'].first(root)
+            if first is not None and first.get('href'):
+                candidate = first.get('href')
+        return candidate
 
     def try_accept_amazon_cookies(self):
         """Tenta aceitar banner de cookies da Amazon (quando aparece)"""
@@ -968,19 +3838,44 @@ window.chrome = window.chrome || { runtime: {} };
                 continue
         return False
 
-    def scrape_mercadolivre_requests(self, url):
-        """Extrai dados do Mercado Livre via requests"""
-        self.clear_last_error()
-        headers = {
+    def mercadolivre_request_headers(self):
+        return {
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-            "Connection": "close"
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8"
         }
+
+    def is_mercadolivre_captcha(self, html):
+        lower_html = (html or "").lower()
+        return 'captcha' in lower_html or 'robot' in lower_html
+
+    def log_mercadolivre_markers(self, html, final_url):
+        log_event(
+            logging.INFO,
+            "mercadolivre_requests_html_markers",
+            final_url=final_url,
+            **html_markers(MERCADOLIVRE_HTML_MARKERS, html)
+        )
+
+    def find_mercadolivre_card_url(self, html):
+        """URL do produto no primeiro card de uma página social (ou None)"""
+        doc = HtmlDocument.of(html)
+        if 'poly-card' not in doc.text or 'poly-component__title' not in doc.text:
+            return None
+        card = MERCADOLIVRE_PARSE_PLAN['card'].first(doc.root)
+        if card is None:
+            return None
+        title_el = MERCADOLIVRE_PARSE_PLAN['card_title'].first(card)
+        return title_el.get('href') if title_el is not None else None
+
+    def scrape_mercadolivre_requests(self, url):
+        """Extrai dados do Mercado Livre via requests"""
+        self.clear_last_error()
+        headers = self.mercadolivre_request_headers()
         try:
             start = time.time()
             resolved_url = self.resolve_mercadolivre_url(url)
-            response = request_with_retries('GET', resolved_url, headers=headers, timeout=12, allow_redirects=True)
+            response, html = fetch_product_page(resolved_url, MERCADOLIVRE_STREAM_MARKERS, 'mercadolivre', headers=headers, timeout=12)
             elapsed_ms = int((time.time() - start) * 1000)
             log_event(
                 logging.INFO,
@@ -988,114 +3883,16 @@ window.chrome = window.chrome || { runtime: {} };
                 status=response.status_code,
                 elapsed_ms=elapsed_ms,
                 final_url=response.url,
-                content_length=len(response.text or "")
+                content_length=len(html)
             )
             if response.status_code != 200:
                 log_event(logging.WARNING, "mercadolivre_requests_non_200", status=response.status_code, final_url=response.url)
                 self.set_last_error("MERCADOLIVRE_REQUESTS_NON_200", "Resposta não-200 do Mercado Livre (requests)", status=response.status_code, final_url=response.url)
                 return None
 
-            html = response.text
-            lower_html = html.lower()
-            social_html = html
+            doc = HtmlDocument(html)
             social_url = response.url
-
-            def extract_social_card(html_text, page_url):
-                if not html_text or 'poly-card' not in html_text:
-                    return None
-                soup_local = BeautifulSoup(html_text, 'html.parser')
-                card_local = soup_local.select_one('.poly-card')
-                if not card_local:
-                    return None
-                data_local = {'url': url, 'resolved_url': page_url or url}
-                title_el_local = card_local.select_one('.poly-component__title')
-                if title_el_local:
-                    data_local['title'] = title_el_local.get_text(strip=True)
-                    href_local = title_el_local.get('href')
-                    if href_local:
-                        data_local['resolved_url'] = href_local
-
-                def normalize_image_src(raw_src):
-                    if not raw_src:
-                        return None
-                    raw_src = raw_src.strip()
-                    if raw_src.startswith('data:'):
-                        return None
-                    if ',' in raw_src:
-                        parts = [p.strip().split(' ')[0] for p in raw_src.split(',') if p.strip()]
-                        for candidate in reversed(parts):
-                            candidate = candidate.strip()
-                            if candidate.startswith('data:'):
-                                continue
-                            if candidate.startswith('//'):
-                                candidate = f"https:{candidate}"
-                            if candidate.startswith('http'):
-                                return candidate
-                        if parts and not parts[-1].startswith('data:'):
-                            return parts[-1]
-                        return None
-                    if raw_src.startswith('//'):
-                        raw_src = f"https:{raw_src}"
-                    if raw_src.startswith('http'):
-                        return raw_src
-                    return None
-
-                img_src_local = None
-                img_attrs = (
-                    'src',
-                    'data-src',
-                    'data-lazy-src',
-                    'data-srcset',
-                    'data-lazy-srcset',
-                    'srcset',
-                    'data-original',
-                    'data-image',
-                    'data-img',
-                    'data-zoom',
-                    'data-zoom-image',
-                )
-                for img_el_local in card_local.select('img'):
-                    for attr in img_attrs:
-                        img_src_local = normalize_image_src(img_el_local.get(attr))
-                        if img_src_local:
-                            break
-                    if img_src_local:
-                        break
-
-                if not img_src_local:
-                    card_html = str(card_local)
-                    match = re.search(r'https?://[^"\\s>]*mlstatic\\.com[^"\\s>]*', card_html)
-                    if not match:
-                        match = re.search(r'//[^"\\s>]*mlstatic\\.com[^"\\s>]*', card_html)
-                        if match:
-                            img_src_local = f"https:{match.group(0)}"
-                    else:
-                        img_src_local = match.group(0)
-
-                if img_src_local:
-                    data_local['image_url'] = img_src_local
-
-                price_container_local = card_local.select_one('.poly-price__current .andes-money-amount')
-                if price_container_local:
-                    symbol = price_container_local.select_one('.andes-money-amount__currency-symbol')
-                    fraction = price_container_local.select_one('.andes-money-amount__fraction')
-                    cents = price_container_local.select_one('.andes-money-amount__cents')
-                    symbol_text = symbol.get_text(strip=True) if symbol else 'R$'
-                    fraction_text = fraction.get_text(strip=True) if fraction else ''
-                    cents_text = cents.get_text(strip=True) if cents else ''
-                    if fraction_text:
-                        price_text = f"{symbol_text} {fraction_text}"
-                        if cents_text:
-                            price_text += f",{cents_text.zfill(2)}"
-                        formatted, price_val = self.clean_price(price_text, apply_amazon_fixes=False)
-                        if formatted:
-                            data_local['price'] = formatted
-                            data_local['price_value'] = price_val
-                if any(data_local.get(k) for k in ('title', 'price', 'image_url')):
-                    return data_local
-                return None
-
-            social_data = extract_social_card(social_html, social_url)
+            social_data = self.extract_mercadolivre_social_card(doc, social_url, url)
 
             if social_data and social_data.get('price'):
                 log_event(
@@ -1110,28 +3907,23 @@ window.chrome = window.chrome || { runtime: {} };
                 return social_data
 
             # Se for página social com cards, tentar seguir para o produto
-            if 'poly-card' in html and 'poly-component__title' in html:
-                soup = BeautifulSoup(html, 'html.parser')
-                card = soup.select_one('.poly-card')
-                if card:
-                    title_el = card.select_one('.poly-component__title')
-                    candidate_url = title_el.get('href') if title_el else None
-                    if candidate_url and candidate_url != response.url:
-                        try:
-                            product_response = request_with_retries('GET', candidate_url, headers=headers, timeout=12, allow_redirects=True)
-                            if product_response.status_code == 200:
-                                html = product_response.text
-                                lower_html = html.lower()
-                                response = product_response
-                                # se caiu em captcha/robot, volta para o social
-                                if 'captcha' in lower_html or 'robot' in lower_html:
-                                    if social_data:
-                                        log_event(logging.INFO, "mercadolivre_requests_social_success", has_title=bool(social_data.get("title")), has_price=bool(social_data.get("price")), has_image=bool(social_data.get("image_url")))
-                                        return social_data
-                        except Exception:
-                            pass
-
-            if 'captcha' in lower_html or 'robot' in lower_html:
+            candidate_url = self.find_mercadolivre_card_url(doc)
+            if candidate_url and candidate_url != response.url:
+                try:
+                    product_response, product_html = fetch_product_page(candidate_url, MERCADOLIVRE_STREAM_MARKERS, 'mercadolivre', headers=headers, timeout=12)
+                    if product_response.status_code == 200:
+                        html = product_html
+                        doc = HtmlDocument(html)
+                        response = product_response
+                        # se caiu em captcha/robot, volta para o social
+                        if self.is_mercadolivre_captcha(html):
+                            if social_data:
+                                log_event(logging.INFO, "mercadolivre_requests_social_success", has_title=bool(social_data.get("title")), has_price=bool(social_data.get("price")), has_image=bool(social_data.get("image_url")))
+                                return social_data
+                except Exception:
+                    pass
+
+            if self.is_mercadolivre_captcha(html):
                 if social_data:
                     log_event(logging.INFO, "mercadolivre_requests_social_success", has_title=bool(social_data.get("title")), has_price=bool(social_data.get("price")), has_image=bool(social_data.get("image_url")))
                     return social_data
@@ -1139,73 +3931,177 @@ window.chrome = window.chrome || { runtime: {} };
                 log_event(logging.WARNING, "mercadolivre_requests_blocked", reason="captcha_or_robot", final_url=response.url)
                 self.set_last_error("MERCADOLIVRE_REQUESTS_BLOCKED", "Bloqueio/captcha detectado (requests)", final_url=response.url)
                 return None
-            log_event(
-                logging.INFO,
-                "mercadolivre_requests_html_markers",
-                has_ui_pdp_title=("ui-pdp-title" in html),
-                has_meta_price=('itemprop="price"' in html),
-                has_andes_money_amount=("andes-money-amount" in html),
-                has_og_image=('property="og:image"' in html),
-                final_url=response.url
-            )
-
-            soup = BeautifulSoup(html, 'html.parser')
-            data = {'url': url, 'resolved_url': response.url or resolved_url or url}
-
-            title_el = soup.select_one('h1.ui-pdp-title') or soup.select_one('.ui-pdp-title') or soup.select_one('h1')
-            if title_el:
-                title = title_el.get_text(strip=True)
-                if title:
-                    data['title'] = title
-
-            price_text = None
-            price_meta = soup.select_one('meta[itemprop="price"]')
-            if price_meta and price_meta.get('content'):
-                price_text = f"R$ {price_meta.get('content')}"
-            if not price_text:
-                price_container = soup.select_one('#price .andes-money-amount') or soup.select_one('.ui-pdp-price .andes-money-amount')
-                if price_container:
-                    symbol = price_container.select_one('.andes-money-amount__currency-symbol')
-                    fraction = price_container.select_one('.andes-money-amount__fraction')
-                    cents = price_container.select_one('.andes-money-amount__cents')
-                    symbol_text = symbol.get_text(strip=True) if symbol else 'R$'
-                    fraction_text = fraction.get_text(strip=True) if fraction else ''
-                    cents_text = cents.get_text(strip=True) if cents else ''
-                    if fraction_text:
-                        price_text = f"{symbol_text} {fraction_text}"
-                        if cents_text:
-                            price_text += f",{cents_text}"
-
-            if price_text:
-                formatted, price_val = self.clean_price(price_text, apply_amazon_fixes=False)
-                if formatted:
-                    data['price'] = formatted
-                    data['price_value'] = price_val
+            self.log_mercadolivre_markers(html, response.url)
 
-            img_src = None
-            og_img = soup.select_one('meta[property="og:image"]')
-            if og_img:
-                img_src = og_img.get('content')
-            if not img_src:
-                img_el = soup.select_one('img.ui-pdp-image') or soup.select_one('img[src*="http2.mlstatic.com"]')
-                if img_el:
-                    img_src = img_el.get('src') or img_el.get('data-src')
-                    if (not img_src or not img_src.startswith('http')) and img_el.get('data-srcset'):
-                        img_src = img_el.get('data-srcset').split(',')[0].split(' ')[0].strip()
-            if img_src and 'http' in img_src:
-                data['image_url'] = img_src
+            data = self.extract_product_data('mercadolivre', doc, url, response.url or resolved_url or url)
 
             if any(data.get(k) for k in ('title', 'price', 'image_url')):
                 log_event(logging.INFO, "mercadolivre_requests_success", has_title=bool(data.get("title")), has_price=bool(data.get("price")), has_image=bool(data.get("image_url")))
                 return data
             log_event(logging.WARNING, "mercadolivre_requests_no_data", final_url=response.url)
             self.set_last_error("MERCADOLIVRE_REQUESTS_NO_DATA", "Nenhum dado encontrado (requests)", final_url=response.url)
+        except ScrapeCancelled:
+            log_event(logging.INFO, "mercadolivre_requests_cancelled")
         except Exception as e:
             log_event(logging.ERROR, "mercadolivre_requests_exception", error=str(e))
             self.set_last_error("MERCADOLIVRE_REQUESTS_EXCEPTION", "Erro ao requisitar Mercado Livre (requests)", error=str(e))
 
         return None
 
+    def extract_mercadolivre_social_card(self, html_text, page_url, url):
+        """Extrai dados do primeiro card (poly-card) de páginas sociais do Mercado Livre"""
+        doc = HtmlDocument.of(html_text)
+        if not doc.text or 'poly-card' not in doc.text:
+            return None
+        reused = doc.parsed
+        plan = MERCADOLIVRE_PARSE_PLAN
+        card_local = plan['card'].first(doc.root)
+        if card_local is None:
+            return None
+        extract_start = time.perf_counter()
+        data_local = {'url': url, 'resolved_url': page_url or url}
+        title_el_local = plan['card_title'].first(card_local)
+        if title_el_local is not None:
+            data_local['title'] = node_text(title_el_local)
+            href_local = title_el_local.get('href')
+            if href_local:
+                data_local['resolved_url'] = href_local
+
+        def normalize_image_src(raw_src):
+            if not raw_src:
+                return None
+            raw_src = raw_src.strip()
+            if raw_src.startswith('data:'):
+                return None
+            if ',' in raw_src:
+                parts = [p.strip().split(' ')[0] for p in raw_src.split(',') if p.strip()]
+                for candidate in reversed(parts):
+                    candidate = candidate.strip()
+                    if candidate.startswith('data:'):
+                        continue
+                    if candidate.startswith('//'):
+                        candidate = f"https:{candidate}"
+                    if candidate.startswith('http'):
+                        return candidate
+                if parts and not parts[-1].startswith('data:'):
+                    return parts[-1]
+                return None
+            if raw_src.startswith('//'):
+                raw_src = f"https:{raw_src}"
+            if raw_src.startswith('http'):
+                return raw_src
+            return None
+
+        img_src_local = None
+        img_attrs = (
+            'src',
+            'data-src',
+            'data-lazy-src',
+            'data-srcset',
+            'data-lazy-srcset',
+            'srcset',
+            'data-original',
+            'data-image',
+            'data-img',
+            'data-zoom',
+            'data-zoom-image',
+        )
+        for img_el_local in plan['card_images'].all(card_local):
+            for attr in img_attrs:
+                img_src_local = normalize_image_src(img_el_local.get(attr))
+                if img_src_local:
+                    break
+            if img_src_local:
+                break
+
+        if not img_src_local:
+            card_html = doc.to_html(card_local)
+            match = re.search(r'https?://[^"\\s>]*mlstatic\\.com[^"\\s>]*', card_html)
+            if not match:
+                match = re.search(r'//[^"\\s>]*mlstatic\\.com[^"\\s>]*', card_html)
+                if match:
+                    img_src_local = f"https:{match.group(0)}"
+            else:
+                img_src_local = match.group(0)
+
+        if img_src_local:
+            data_local['image_url'] = img_src_local
+
+        price_container_local = plan['card_price'].first(card_local)
+        if price_container_local is not None:
+            symbol_text, fraction_text, cents_text = self.money_amount_parts(price_container_local)
+            if fraction_text:
+                price_text = f"{symbol_text} {fraction_text}"
+                if cents_text:
+                    price_text += f",{cents_text.zfill(2)}"
+                formatted, price_val = self.clean_price(price_text, apply_amazon_fixes=False)
+                if formatted:
+                    data_local['price'] = formatted
+                    data_local['price_value'] = price_val
+        log_html_parse('mercadolivre', 'social_card', doc, reused, extract_start)
+        if any(data_local.get(k) for k in ('title', 'price', 'image_url')):
+            return data_local
+        return None
+
+    def money_amount_parts(self, container):
+        """(símbolo, inteiro, centavos) de um bloco andes-money-amount"""
+        symbol = MONEY_AMOUNT_PLAN['symbol'].first(container)
+        fraction = MONEY_AMOUNT_PLAN['fraction'].first(container)
+        cents = MONEY_AMOUNT_PLAN['cents'].first(container)
+        symbol_text = node_text(symbol) if symbol is not None else 'R$'
+        fraction_text = node_text(fraction) if fraction is not None else ''
+        cents_text = node_text(cents) if cents is not None else ''
+        return symbol_text, fraction_text, cents_text
+
+    def parse_mercadolivre_html(self, html, url, resolved_url):
+        """Extrai título, preço e imagem do HTML de produto (PDP) do Mercado Livre"""
+        doc = HtmlDocument.of(html)
+        reused = doc.parsed
+        root = doc.root
+        extract_start = time.perf_counter()
+        plan = MERCADOLIVRE_PARSE_PLAN
+        data = {'url': url, 'resolved_url': resolved_url or url}
+
+        title_el = plan['title'].first(root)
+        if title_el is not None:
+            title = node_text(title_el)
+            if title:
+                data['title'] = title
+
+        price_text = None
+        price_meta = plan['meta_price'].first(root)
+        if price_meta is not None and price_meta.get('content'):
+            price_text = f"R$ {price_meta.get('content')}"
+        if not price_text:
+            price_container = plan['price_container'].first(root)
+            if price_container is not None:
+                symbol_text, fraction_text, cents_text = self.money_amount_parts(price_container)
+                if fraction_text:
+                    price_text = f"{symbol_text} {fraction_text}"
+                    if cents_text:
+                        price_text += f",{cents_text}"
+
+        if price_text:
+            formatted, price_val = self.clean_price(price_text, apply_amazon_fixes=False)
+            if formatted:
+                data['price'] = formatted
+                data['price_value'] = price_val
+
+        img_src = None
+        og_img = plan['og_image'].first(root)
+        if og_img is not None:
+            img_src = og_img.get('content')
+        if not img_src:
+            img_el = plan['image'].first(root)
+            if img_el is not None:
+                img_src = img_el.get('src') or img_el.get('data-src')
+                if (not img_src or not img_src.startswith('http')) and img_el.get('data-srcset'):
+                    img_src = img_el.get('data-srcset').split(',')[0].split(' ')[0].strip()
+        if img_src and 'http' in img_src:
+            data['image_url'] = img_src
+        log_html_parse('mercadolivre', 'pdp', doc, reused, extract_start)
+        return data
+
     def scrape_amazon(self, url):
         """Extrai dados da Amazon com Selenium"""
         try:
@@ -1218,118 +4114,113 @@ window.chrome = window.chrome || { runtime: {} };
                 if self.last_error:
                     return {'url': url, **self.last_error}
                 return {'error': 'Amazon bloqueou ou conteúdo indisponível', 'url': url, 'error_code': 'AMAZON_BLOCKED_OR_EMPTY'}
+            if self.hedging_enabled():
+                return self.hedged_scrape('amazon', url)
             # Primeiro tentar via requests (mais rápido e evita timeout do renderer)
+            tried_requests = False
             if not ALWAYS_USE_SELENIUM:
                 requests_data = self.scrape_amazon_requests(url)
+                tried_requests = True
                 if requests_data:
                     return requests_data
             if IS_PRODUCTION and not ALLOW_SELENIUM_IN_PROD:
                 # Em produção, evitar Selenium se explicitamente desabilitado
-                requests_data = self.scrape_amazon_requests(url)
+                requests_data = None if tried_requests else self.scrape_amazon_requests(url)
                 if requests_data:
                     return requests_data
                 return {'error': 'Amazon bloqueou ou conteúdo indisponível', 'url': url, 'error_code': 'AMAZON_BLOCKED_OR_EMPTY'}
 
-            if not self.ensure_driver():
-                requests_data = self.scrape_amazon_requests(url)
-                if requests_data:
-                    return requests_data
-                if self.last_error:
-                    return {'url': url, **self.last_error}
-                return {'error': 'WebDriver não inicializado', 'url': url, 'error_code': 'WEBDRIVER_UNAVAILABLE'}
-
-            resolved_url = self.resolve_amazon_url(url)
-            logger.info(f"Acessando Amazon: {url} -> {resolved_url}")
-            if not self.navigate_with_wait(resolved_url, wait_seconds=2, ready_timeout=8):
-                requests_data = self.scrape_amazon_requests(resolved_url or url)
-                if requests_data:
-                    requests_data.setdefault('original_url', url)
-                    return requests_data
-                if self.last_error:
-                    return {'url': url, **self.last_error}
-                return {'error': 'Falha ao abrir página no Selenium', 'url': url, 'error_code': 'AMAZON_NAV_FAIL'}
-            self.try_accept_amazon_cookies()
-
-            # Detectar possível captcha/bloqueio
-            try:
-                page_source = self.driver.page_source
-                if self.is_blocked_page(page_source) or 'type the characters you see' in page_source.lower():
-                    if self.retry_if_blocked(wait_seconds=2, ready_timeout=8):
-                        requests_data = self.scrape_amazon_requests(resolved_url or url)
-                        if requests_data:
-                            requests_data.setdefault('original_url', url)
-                            return requests_data
-                        if self.last_error:
-                            return {'url': url, **self.last_error}
-                        return {'error': 'Amazon apresentou captcha/bloqueio', 'url': url, 'error_code': 'AMAZON_CAPTCHA'}
-                    page_source = self.driver.page_source
-                if self.is_blocked_page(page_source) or 'type the characters you see' in page_source.lower():
-                    requests_data = self.scrape_amazon_requests(resolved_url or url)
+            with self.leased_driver() as lease:
+                if lease is None:
+                    requests_data = None if tried_requests else self.scrape_amazon_requests(url)
                     if requests_data:
-                        requests_data.setdefault('original_url', url)
                         return requests_data
                     if self.last_error:
                         return {'url': url, **self.last_error}
-                    return {'error': 'Amazon apresentou captcha/bloqueio', 'url': url, 'error_code': 'AMAZON_CAPTCHA'}
-            except Exception:
-                pass
-            
-            data = {'url': url, 'resolved_url': resolved_url}
-            
-            # Título
-            title = self.extract_title_from_selectors([
-                '#productTitle',
-                'h1#productTitle',
-                '.a-size-large.product-title-word-break',
-                'h1.a-size-large',
-                'h1[data-asin]',
-                '#title span',
-                '#title'
-            ], min_len=5)
-            if title:
-                data['title'] = title
-                logger.info(f"Título encontrado: {title}")
+                    return {'error': 'WebDriver não inicializado', 'url': url, 'error_code': 'WEBDRIVER_UNAVAILABLE'}
+                return self.scrape_amazon_selenium(url)
             
-            # Preço
-            price_text = self.extract_amazon_price()
-            if price_text:
-                formatted, price_val = self.clean_price(price_text)
-                if formatted:
-                    data['price'] = formatted
-                    data['price_value'] = price_val
-                    logger.info(f"Preço encontrado: {price_text} -> {formatted}")
-            
-            # Imagem
-            img_src = self.extract_image_from_selectors([
-                '#landingImage',
-                '#imgTagWrapperId img',
-                '.a-dynamic-image',
-                'img[data-a-hires]',
-                'img[data-old-hires]'
-            ])
-            if img_src:
-                data['image_url'] = img_src
-                logger.info(f"Imagem encontrada: {img_src}")
-
-            if self.has_any_data(data):
-                return data
+        except Exception as e:
+            logger.error("Erro ao extrair dados da Amazon: %s", e)
+            self.set_last_error("AMAZON_SCRAPE_EXCEPTION", "Erro ao extrair dados da Amazon", error=str(e))
+            return {'error': str(e), 'url': url, 'error_code': 'AMAZON_SCRAPE_EXCEPTION'}
 
-            # Fallback com requests quando Selenium não retorna dados
-            fallback_url = resolved_url or url
-            requests_data = self.scrape_amazon_requests(fallback_url)
+    def scrape_amazon_selenium(self, url, fallback_to_requests=True):
+        """Extrai dados da Amazon com o driver emprestado do pool"""
+        resolved_url = self.resolve_amazon_url(url)
+        logger.info("Acessando Amazon: %s -> %s", url, resolved_url)
+        ready_selectors = [AMAZON_SELENIUM_TITLE_SELECTORS, AMAZON_SELENIUM_PRICE_READY_SELECTORS, AMAZON_SELENIUM_IMAGE_SELECTORS]
+        if not self.navigate_with_wait(resolved_url, wait_seconds=2, ready_timeout=8, ready_selectors=ready_selectors):
+            requests_data = self.scrape_amazon_requests(resolved_url or url) if fallback_to_requests else None
             if requests_data:
                 requests_data.setdefault('original_url', url)
                 return requests_data
-
             if self.last_error:
                 return {'url': url, **self.last_error}
-            return {'error': 'Nenhum dado encontrado na Amazon', 'url': url, 'error_code': 'AMAZON_NO_DATA'}
-            
-        except Exception as e:
-            logger.error(f"Erro ao extrair dados da Amazon: {e}")
-            self.set_last_error("AMAZON_SCRAPE_EXCEPTION", "Erro ao extrair dados da Amazon", error=str(e))
-            return {'error': str(e), 'url': url, 'error_code': 'AMAZON_SCRAPE_EXCEPTION'}
-    
+            return {'error': 'Falha ao abrir página no Selenium', 'url': url, 'error_code': 'AMAZON_NAV_FAIL'}
+        self.try_accept_amazon_cookies()
+
+        # Detectar possível captcha/bloqueio
+        try:
+            page_source = self.driver.page_source
+            if self.is_blocked_page(page_source) or 'type the characters you see' in page_source.lower():
+                if self.retry_if_blocked(wait_seconds=2, ready_timeout=8):
+                    requests_data = self.scrape_amazon_requests(resolved_url or url) if fallback_to_requests else None
+                    if requests_data:
+                        requests_data.setdefault('original_url', url)
+                        return requests_data
+                    if self.last_error:
+                        return {'url': url, **self.last_error}
+                    return {'error': 'Amazon apresentou captcha/bloqueio', 'url': url, 'error_code': 'AMAZON_CAPTCHA'}
+                page_source = self.driver.page_source
+            if self.is_blocked_page(page_source) or 'type the characters you see' in page_source.lower():
+                requests_data = self.scrape_amazon_requests(resolved_url or url) if fallback_to_requests else None
+                if requests_data:
+                    requests_data.setdefault('original_url', url)
+                    return requests_data
+                if self.last_error:
+                    return {'url': url, **self.last_error}
+                return {'error': 'Amazon apresentou captcha/bloqueio', 'url': url, 'error_code': 'AMAZON_CAPTCHA'}
+        except Exception:
+            pass
+        
+        data = {'url': url, 'resolved_url': resolved_url}
+        
+        # Título
+        title = self.extract_title_from_selectors(AMAZON_SELENIUM_TITLE_SELECTORS, min_len=5)
+        if title:
+            data['title'] = title
+            PARSER_LOGGER.info("Título encontrado: %s", title)
+        
+        # Preço
+        price_text = self.extract_amazon_price()
+        if price_text:
+            formatted, price_val = self.clean_price(price_text)
+            if formatted:
+                data['price'] = formatted
+                data['price_value'] = price_val
+                PARSER_LOGGER.info("Preço encontrado: %s -> %s", price_text, formatted)
+        
+        # Imagem
+        img_src = self.extract_image_from_selectors(AMAZON_SELENIUM_IMAGE_SELECTORS)
+        if img_src:
+            data['image_url'] = img_src
+            PARSER_LOGGER.info("Imagem encontrada: %s", img_src)
+
+        if self.has_any_data(data):
+            return data
+
+        # Fallback com requests quando Selenium não retorna dados
+        fallback_url = resolved_url or url
+        requests_data = self.scrape_amazon_requests(fallback_url) if fallback_to_requests else None
+        if requests_data:
+            requests_data.setdefault('original_url', url)
+            return requests_data
+
+        if self.last_error:
+            return {'url': url, **self.last_error}
+        return {'error': 'Nenhum dado encontrado na Amazon', 'url': url, 'error_code': 'AMAZON_NO_DATA'}
+
     def scrape_mercadolivre(self, url):
         """Extrai dados do Mercado Livre com Selenium"""
         try:
@@ -1342,152 +4233,325 @@ window.chrome = window.chrome || { runtime: {} };
                 if self.last_error:
                     return {'url': url, **self.last_error}
                 return {'error': 'Mercado Livre bloqueou ou conteúdo indisponível', 'url': url, 'error_code': 'MERCADOLIVRE_BLOCKED_OR_EMPTY'}
+            if self.hedging_enabled():
+                return self.hedged_scrape('mercadolivre', url)
             # Primeiro tentar via requests
+            tried_requests = False
             if not ALWAYS_USE_SELENIUM:
                 requests_data = self.scrape_mercadolivre_requests(url)
+                tried_requests = True
                 if requests_data:
                     return requests_data
             if IS_PRODUCTION and not ALLOW_SELENIUM_IN_PROD:
-                requests_data = self.scrape_mercadolivre_requests(url)
+                requests_data = None if tried_requests else self.scrape_mercadolivre_requests(url)
                 if requests_data:
                     return requests_data
                 return {'error': 'Mercado Livre bloqueou ou conteúdo indisponível', 'url': url, 'error_code': 'MERCADOLIVRE_BLOCKED_OR_EMPTY'}
 
-            if not self.ensure_driver():
-                requests_data = self.scrape_mercadolivre_requests(url)
-                if requests_data:
-                    return requests_data
-                if self.last_error:
-                    return {'url': url, **self.last_error}
-                return {'error': 'WebDriver não inicializado', 'url': url, 'error_code': 'WEBDRIVER_UNAVAILABLE'}
-
-            logger.info(f"Acessando Mercado Livre: {url}")
-            if not self.navigate_with_wait(url, wait_seconds=2, ready_timeout=8):
-                requests_data = self.scrape_mercadolivre_requests(url)
-                if requests_data:
-                    requests_data.setdefault('original_url', url)
-                    return requests_data
-                if self.last_error:
-                    return {'url': url, **self.last_error}
-                return {'error': 'Falha ao abrir página no Selenium', 'url': url, 'error_code': 'MERCADOLIVRE_NAV_FAIL'}
+            with self.leased_driver() as lease:
+                if lease is None:
+                    requests_data = None if tried_requests else self.scrape_mercadolivre_requests(url)
+                    if requests_data:
+                        return requests_data
+                    if self.last_error:
+                        return {'url': url, **self.last_error}
+                    return {'error': 'WebDriver não inicializado', 'url': url, 'error_code': 'WEBDRIVER_UNAVAILABLE'}
+                return self.scrape_mercadolivre_selenium(url)
+            
+        except Exception as e:
+            logger.error("Erro ao extrair dados do Mercado Livre: %s", e)
+            self.set_last_error("MERCADOLIVRE_SCRAPE_EXCEPTION", "Erro ao extrair dados do Mercado Livre", error=str(e))
+            return {'error': str(e), 'url': url, 'error_code': 'MERCADOLIVRE_SCRAPE_EXCEPTION'}
+    
+    def scrape_mercadolivre_selenium(self, url, fallback_to_requests=True):
+        """Extrai dados do Mercado Livre com o driver emprestado do pool"""
+        logger.info("Acessando Mercado Livre: %s", url)
+        ready_selectors = [MERCADOLIVRE_SELENIUM_TITLE_SELECTORS, MERCADOLIVRE_SELENIUM_PRICE_SELECTORS, MERCADOLIVRE_SELENIUM_IMAGE_SELECTORS]
+        if not self.navigate_with_wait(url, wait_seconds=2, ready_timeout=8, ready_selectors=ready_selectors):
+            requests_data = self.scrape_mercadolivre_requests(url) if fallback_to_requests else None
+            if requests_data:
+                requests_data.setdefault('original_url', url)
+                return requests_data
+            if self.last_error:
+                return {'url': url, **self.last_error}
+            return {'error': 'Falha ao abrir página no Selenium', 'url': url, 'error_code': 'MERCADOLIVRE_NAV_FAIL'}
 
-            try:
-                page_source = self.driver.page_source
-                if self.is_blocked_page(page_source):
-                    if self.retry_if_blocked(wait_seconds=2, ready_timeout=8):
-                        requests_data = self.scrape_mercadolivre_requests(url)
-                        if requests_data:
-                            requests_data.setdefault('original_url', url)
-                            return requests_data
-                        if self.last_error:
-                            return {'url': url, **self.last_error}
-                        return {'error': 'Mercado Livre apresentou captcha/bloqueio', 'url': url, 'error_code': 'MERCADOLIVRE_CAPTCHA'}
-                    page_source = self.driver.page_source
-                if self.is_blocked_page(page_source):
-                    requests_data = self.scrape_mercadolivre_requests(url)
+        try:
+            page_source = self.driver.page_source
+            if self.is_blocked_page(page_source):
+                if self.retry_if_blocked(wait_seconds=2, ready_timeout=8):
+                    requests_data = self.scrape_mercadolivre_requests(url) if fallback_to_requests else None
                     if requests_data:
                         requests_data.setdefault('original_url', url)
                         return requests_data
                     if self.last_error:
                         return {'url': url, **self.last_error}
                     return {'error': 'Mercado Livre apresentou captcha/bloqueio', 'url': url, 'error_code': 'MERCADOLIVRE_CAPTCHA'}
-            except Exception:
-                pass
-            
-            data = {'url': url}
-            
-            # Título
-            title_selectors = [
-                '.poly-component__title',
-                'h1.ui-pdp-title',
-                '.ui-pdp-title'
-            ]
-            title = self.extract_title_from_selectors(title_selectors, min_len=5)
-            if title:
-                data['title'] = title
-                logger.info(f"Título encontrado: {title}")
-            
-            # Preço
-            formatted = None
-            price_val = None
-            try:
-                money_amount = None
-                money_candidates = [
-                    '.poly-price__current .andes-money-amount',
-                    '.ui-pdp-price__current .andes-money-amount',
-                ]
-                for sel in money_candidates:
-                    els = self.driver.find_elements(By.CSS_SELECTOR, sel)
-                    if els:
-                        money_amount = els[0]
-                        break
-                if money_amount is not None:
-                    ml_price_text = self.extract_ml_money_amount_text(money_amount)
-                    if ml_price_text:
-                        formatted, price_val = self.clean_price(ml_price_text, apply_amazon_fixes=False)
-            except Exception:
-                pass
+                page_source = self.driver.page_source
+            if self.is_blocked_page(page_source):
+                requests_data = self.scrape_mercadolivre_requests(url) if fallback_to_requests else None
+                if requests_data:
+                    requests_data.setdefault('original_url', url)
+                    return requests_data
+                if self.last_error:
+                    return {'url': url, **self.last_error}
+                return {'error': 'Mercado Livre apresentou captcha/bloqueio', 'url': url, 'error_code': 'MERCADOLIVRE_CAPTCHA'}
+        except Exception:
+            pass
+        
+        data = {'url': url}
+        
+        # Título
+        title = self.extract_title_from_selectors(MERCADOLIVRE_SELENIUM_TITLE_SELECTORS, min_len=5)
+        if title:
+            data['title'] = title
+            PARSER_LOGGER.info("Título encontrado: %s", title)
+        
+        # Preço
+        formatted = None
+        price_val = None
+        try:
+            money_amount = None
+            for sel in self.ordered_selectors([tuple(MERCADOLIVRE_SELENIUM_PRICE_SELECTORS)], 'mercadolivre_selenium_money'):
+                start = time.perf_counter()
+                els = self.driver.find_elements(By.CSS_SELECTOR, sel)
+                self.record_selector('mercadolivre_selenium_money', sel, bool(els), start)
+                if els:
+                    money_amount = els[0]
+                    break
+            if money_amount is not None:
+                ml_price_text = self.extract_ml_money_amount_text(money_amount)
+                if ml_price_text:
+                    formatted, price_val = self.clean_price(ml_price_text, apply_amazon_fixes=False)
+        except Exception:
+            pass
 
-            if not formatted:
-                price_selectors = [
-                    '.poly-price__current .andes-money-amount__fraction',
-                    '.ui-pdp-price__current .andes-money-amount__fraction'
-                ]
-                formatted, price_val = self.extract_price_from_selectors(price_selectors, apply_amazon_fixes=False)
-            if formatted:
-                data['price'] = formatted
-                data['price_value'] = price_val
-                logger.info(f"Preço encontrado: {formatted}")
-            
-            # Imagem
-            image_selectors = [
-                '.poly-component__picture',
-                '.ui-pdp-gallery__figure__image',
-                'img[src*="http2.mlstatic.com"]'
-            ]
-            img_src = self.extract_image_from_selectors(image_selectors)
-            if img_src:
-                data['image_url'] = img_src
-                logger.info(f"Imagem encontrada: {img_src}")
+        if not formatted:
+            price_selectors = [(
+                '.poly-price__current .andes-money-amount__fraction',
+                '.ui-pdp-price__current .andes-money-amount__fraction'
+            )]
+            formatted, price_val = self.extract_price_from_selectors(price_selectors, apply_amazon_fixes=False, chain='mercadolivre_selenium_fraction')
+        if formatted:
+            data['price'] = formatted
+            data['price_value'] = price_val
+            PARSER_LOGGER.info("Preço encontrado: %s", formatted)
+        
+        # Imagem
+        img_src = self.extract_image_from_selectors(MERCADOLIVRE_SELENIUM_IMAGE_SELECTORS)
+        if img_src:
+            data['image_url'] = img_src
+            PARSER_LOGGER.info("Imagem encontrada: %s", img_src)
+
+        if self.has_any_data(data):
+            return data
+
+        # Fallback com requests quando Selenium não retorna dados
+        requests_data = self.scrape_mercadolivre_requests(url) if fallback_to_requests else None
+        if requests_data:
+            requests_data.setdefault('original_url', url)
+            return requests_data
+
+        if self.last_error:
+            return {'url': url, **self.last_error}
+        return {'error': 'Nenhum dado encontrado no Mercado Livre', 'url': url, 'error_code': 'MERCADOLIVRE_NO_DATA'}
+
+    def extract_amazon_identity(self, url):
+        """Retorna ASIN + parâmetros de variação da URL canônica (ou None)"""
+        canonical = self.canonicalize_amazon_url(url)
+        parsed = urlparse(canonical)
+        match = re.match(r'^/dp/([A-Z0-9]{10})$', parsed.path)
+        if not match:
+            return None
+        identity = match.group(1)
+        if parsed.query:
+            identity += f"?{parsed.query}"
+        return identity
+
+    def extract_mercadolivre_identity(self, url):
+        """Retorna o id MLB normalizado presente na URL (ou None)"""
+        match = re.search(r'(MLB[A-Z]?)-?(\d{6,})', url or '', re.IGNORECASE)
+        if not match:
+            return None
+        return f"{match.group(1).upper()}{match.group(2)}"
 
-            if self.has_any_data(data):
-                return data
+    def product_cache_key(self, site, url):
+        """Chave do cache de resultados pela identidade canônica do produto, sem ir à rede.
+
+        Link curto/afiliado sem ASIN/MLB só tem chave se a resolução já estiver no RESOLVE_CACHE;
+        senão a resolução fica para o scrape, depois do rate limiter."""
+        if site == 'amazon':
+            extract = self.extract_amazon_identity
+        elif site == 'mercadolivre':
+            extract = self.extract_mercadolivre_identity
+        else:
+            return None
+        try:
+            identity = extract(url)
+            if not identity:
+                cached = RESOLVE_CACHE.get(url)
+                if cached and cached["ok"]:
+                    identity = extract(cached["resolved_url"])
+        except Exception as e:
+            log_event(logging.WARNING, "result_cache_key_failed", site=site, url=url, error=str(e))
+            return None
+        return f"{site}:{identity}" if identity else None
+
+    def rebind_cached_result(self, data, url):
+        """Aponta um resultado do cache para o link colado desta vez (afiliado/encurtado)"""
+        data['url'] = url
+        if 'original_url' in data:
+            data['original_url'] = url
+        data['cache_hit'] = True
+        return data
+
+    def hedging_enabled(self):
+        return HEDGE_ENABLED and not ALWAYS_USE_SELENIUM and not (IS_PRODUCTION and not ALLOW_SELENIUM_IN_PROD)
+
+    def hedge_cancelled(self):
+        return scrape_cancelled()
+
+    def is_complete_result(self, data):
+        return isinstance(data, dict) and 'error' not in data and all(data.get(k) for k in ('title', 'price', 'image_url'))
 
-            # Fallback com requests quando Selenium não retorna dados
-            requests_data = self.scrape_mercadolivre_requests(url)
+    def hedge_selenium_attempt(self, site, url):
+        """Tentativa só-Selenium do hedge; a thread do pool pega seu próprio driver"""
+        with self.leased_driver() as lease:
+            if lease is None or self.hedge_cancelled():
+                return None
+            if site == 'amazon':
+                return self.scrape_amazon_selenium(url, fallback_to_requests=False)
+            return self.scrape_mercadolivre_selenium(url, fallback_to_requests=False)
+
+    def hedged_scrape(self, site, url):
+        """Requests primeiro; sem resultado completo após HEDGE_DELAY_SECONDS o Selenium corre em
+        paralelo e o primeiro resultado completo vence. O perdedor é cancelado: o Selenium para no
+        próximo ponto de checagem e o requests antes da próxima tentativa HTTP ou chunk lido.
+
+        Cada perna roda com um ScrapeContext filho; só o da perna escolhida volta para a chamada."""
+        with self.scrape_context(url) as parent:
+            return self.race_hedge_legs(parent, site, url)
+
+    def race_hedge_legs(self, parent, site, url):
+        requests_fn = self.scrape_amazon_requests if site == 'amazon' else self.scrape_mercadolivre_requests
+        start = time.time()
+        cancel = threading.Event()
+        legs = {'requests': parent.child(cancel)}
+        requests_future = submit_in_context(HEDGE_EXECUTOR, run_in_scrape_context, legs['requests'], requests_fn, url)
+        done, _ = wait_futures([requests_future], timeout=HEDGE_DELAY_SECONDS)
+        if done:
+            # Respondeu antes do hedge: mesmo comportamento do fluxo sequencial
+            incr_metric("hedge_skipped")
+            requests_data = requests_future.result()
+            parent.merge(legs['requests'])
             if requests_data:
-                requests_data.setdefault('original_url', url)
                 return requests_data
+            with self.leased_driver() as lease:
+                if lease is None:
+                    if self.last_error:
+                        return {'url': url, **self.last_error}
+                    return {'error': 'WebDriver não inicializado', 'url': url, 'error_code': 'WEBDRIVER_UNAVAILABLE'}
+                if site == 'amazon':
+                    return self.scrape_amazon_selenium(url, fallback_to_requests=False)
+                return self.scrape_mercadolivre_selenium(url, fallback_to_requests=False)
+
+        incr_metric("hedge_fired")
+        legs['selenium'] = parent.child(cancel)
+        selenium_future = submit_in_context(
+            HEDGE_EXECUTOR, run_in_scrape_context, legs['selenium'], self.hedge_selenium_attempt, site, url
+        )
+        engines = {requests_future: 'requests', selenium_future: 'selenium'}
+        results = {}
+        pending = set(engines)
+        winner = None
+        deadline = start + HEDGE_TIMEOUT_SECONDS
+        while pending and winner is None:
+            done, pending = wait_futures(pending, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    results[engines[future]] = future.result()
+                except Exception as e:
+                    results[engines[future]] = {'error': str(e), 'url': url}
+                if winner is None and self.is_complete_result(results[engines[future]]):
+                    winner = engines[future]
+        for future in pending:
+            future.cancel()
+        cancel.set()
+
+        if winner:
+            incr_metric(f"hedge_win_{winner}")
+            data = results[winner]
+            parent.merge(legs[winner])
+        else:
+            incr_metric("hedge_no_complete")
+            # Sem resultado completo: dados parciais do requests, depois o que o Selenium trouxe
+            source = next((name for name in ('requests', 'selenium') if results.get(name)), None)
+            if source is None:
+                source = next((name for name in ('requests', 'selenium') if legs[name].last_error), 'requests')
+            data = results.get(source)
+            parent.merge(legs[source])
+        log_event(
+            logging.INFO,
+            "hedge_result",
+            site=site,
+            winner=winner,
+            finished=sorted(results),
+            elapsed_ms=int((time.time() - start) * 1000)
+        )
+        if data:
+            return data
+        if self.last_error:
+            return {'url': url, **self.last_error}
+        return {'error': 'Tempo limite do scraping com hedge excedido', 'url': url, 'error_code': 'HEDGE_TIMEOUT'}
+
+    def selenium_enabled(self, site):
+        """Indica se o fluxo síncrono ainda teria fallback Selenium para o site"""
+        if not IS_PRODUCTION:
+            return True
+        if not ALLOW_SELENIUM_IN_PROD:
+            return False
+        if site == 'amazon':
+            return AMAZON_USE_SELENIUM_IN_PROD
+        return MERCADOLIVRE_USE_SELENIUM_IN_PROD
 
-            if self.last_error:
-                return {'url': url, **self.last_error}
-            return {'error': 'Nenhum dado encontrado no Mercado Livre', 'url': url, 'error_code': 'MERCADOLIVRE_NO_DATA'}
-            
-        except Exception as e:
-            logger.error(f"Erro ao extrair dados do Mercado Livre: {e}")
-            self.set_last_error("MERCADOLIVRE_SCRAPE_EXCEPTION", "Erro ao extrair dados do Mercado Livre", error=str(e))
-            return {'error': str(e), 'url': url, 'error_code': 'MERCADOLIVRE_SCRAPE_EXCEPTION'}
-    
-    def scrape_product(self, url):
+    def scrape_product(self, url, force_refresh=False, request_id=None):
         """Função principal de scraping"""
-        try:
-            site = self.identify_site(url)
-            logger.info(f"Site identificado: {site}")
-            delay = PROD_SCRAPE_DELAY_SECONDS if IS_PRODUCTION else BASE_SCRAPE_DELAY_SECONDS
-            if delay > 0:
-                logger.info(f"Aguardando delay de {delay}s antes do scraping")
-                time.sleep(delay)
+        with self.scrape_context(url, request_id) as context:
+            start = time.perf_counter()
+            site = 'other'
+            try:
+                site = context.site = self.identify_site(url)
+                SITE_LOGGER.info("Site identificado: %s", site)
+                if site not in ('amazon', 'mercadolivre'):
+                    return {'error': f'Site não suportado: {site}', 'url': url, 'error_code': 'SITE_UNSUPPORTED'}
+
+                cache_key = self.product_cache_key(site, url)
+                if cache_key and not force_refresh:
+                    cached = RESULT_CACHE.get(cache_key)
+                    if cached:
+                        data, age = cached
+                        log_event(logging.INFO, "result_cache_hit", site=site, cache_key=cache_key, age_s=round(age, 1))
+                        return record_scrape(site, "sync", start, self.rebind_cached_result(data, url), outcome="cache_hit")
+
+                RATE_LIMITER.acquire(site)
             
-            if site == 'amazon':
-                return self.scrape_amazon(url)
-            elif site == 'mercadolivre':
-                return self.scrape_mercadolivre(url)
-            else:
-                return {'error': f'Site não suportado: {site}', 'url': url, 'error_code': 'SITE_UNSUPPORTED'}
+                if site == 'amazon':
+                    result = self.scrape_amazon(url)
+                else:
+                    result = self.scrape_mercadolivre(url)
+
+                if isinstance(result, dict) and 'error' not in result:
+                    # Link curto frio: a chave sai da URL que o próprio scrape resolveu
+                    cache_key = cache_key or self.product_cache_key(site, result.get('resolved_url') or url)
+                    if cache_key:
+                        RESULT_CACHE.set(cache_key, site, result)
+                return record_scrape(site, "sync", start, result)
                 
-        except Exception as e:
-            logger.error(f"Erro no scraping: {e}")
-            return {'error': str(e), 'url': url}
+            except Exception as e:
+                logger.error("Erro no scraping: %s", e)
+                return record_scrape(site, "sync", start, {'error': str(e), 'url': url})
     
     def generate_message(self, product_data, free_shipping=False, coupon_name=None, coupon_discount=None):
         """Gera mensagem padronizada para WhatsApp com emojis"""
@@ -1528,9 +4592,50 @@ window.chrome = window.chrome || { runtime: {} };
             return message
             
         except Exception as e:
-            logger.error(f"Erro ao gerar mensagem: {e}")
+            logger.error("Erro ao gerar mensagem: %s", e)
             return "Erro ao gerar mensagem"
     
+    def build_supabase_payload(self, product_data, message):
+        return {
+            "mensagem": json.dumps(message, ensure_ascii=False),
+            "imagem_url": product_data.get('image_url', ''),
+            "enviado": False,
+            "criado_em": datetime.now().isoformat()
+        }
+
+    def validate_supabase_payload(self, payload):
+        """Checa a linha antes do spool (o /save responde 'queued' sem esperar o Supabase);
+        retorna a mensagem de erro ou None"""
+        image_url = payload.get('imagem_url')
+        if image_url is not None and not isinstance(image_url, str):
+            return "image_url deve ser texto"
+        if image_url and urlparse(image_url).scheme not in ('http', 'https'):
+            return "image_url deve ser uma URL http(s)"
+        size = len(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        if size > SAVE_MAX_ROW_BYTES:
+            return f"Registro com {size} bytes excede o limite de {SAVE_MAX_ROW_BYTES}"
+        return None
+
+    def insert_supabase_rows(self, rows, timeout):
+        """POST em lote (array) na tabela produtos; retorna (status, corpo) para o spool"""
+        if not SUPABASE_URL or not SUPABASE_KEY_SERVICE:
+            return None, "Supabase não configurado no ambiente"
+        params = None
+        prefer = "return=minimal"
+        if SAVE_IDEMPOTENCY_COLUMN:
+            params = {"on_conflict": SAVE_IDEMPOTENCY_COLUMN}
+            prefer += ",resolution=ignore-duplicates"
+        with timed_stage('supabase_save', 'supabase', host=SUPABASE_HOST) as stage:
+            response = HTTP_CLIENT.post(
+                f"{SUPABASE_URL}/rest/v1/produtos",
+                headers={**SUPABASE_HEADERS, "Prefer": prefer},
+                params=params,
+                json=rows,
+                timeout=timeout
+            )
+            stage["outcome"] = http_outcome(response.status_code)
+        return response.status_code, response.text
+
     def save_to_supabase(self, product_data, message):
         """Salva no Supabase"""
         try:
@@ -1538,63 +4643,577 @@ window.chrome = window.chrome || { runtime: {} };
                 logger.error("Supabase não configurado no ambiente")
                 return False
 
-            payload = {
-                "mensagem": json.dumps(message, ensure_ascii=False),
-                "imagem_url": product_data.get('image_url', ''),
-                "enviado": False,
-                "criado_em": datetime.now().isoformat()
-            }
+            payload = self.build_supabase_payload(product_data, message)
             
-            response = requests.post(
-                f"{SUPABASE_URL}/rest/v1/produtos",
-                headers=SUPABASE_HEADERS,
-                json=payload
-            )
+            with timed_stage('supabase_save', 'supabase', host=SUPABASE_HOST) as stage:
+                response = HTTP_CLIENT.post(
+                    f"{SUPABASE_URL}/rest/v1/produtos",
+                    headers=SUPABASE_HEADERS,
+                    json=payload,
+                    timeout=SAVE_SPOOL_TIMEOUT_SECONDS
+                )
+                stage["outcome"] = http_outcome(response.status_code)
             
             if response.status_code == 201:
                 logger.info("Produto salvo no Supabase com sucesso")
                 return True
             else:
-                logger.error(f"Erro ao salvar no Supabase: {response.text}")
+                logger.error("Erro ao salvar no Supabase: %s", response.text)
                 return False
                 
         except Exception as e:
-            logger.error(f"Erro ao salvar no Supabase: {e}")
+            logger.error("Erro ao salvar no Supabase: %s", e)
             return False
 
     def fetch_supabase_products(self, limit=20):
-        """Busca os últimos produtos salvos no Supabase"""
-        try:
-            if not SUPABASE_URL or not SUPABASE_KEY_SERVICE:
-                logger.error("Supabase não configurado no ambiente")
-                return []
-
-            params = {
-                "select": "mensagem,imagem_url,enviado,criado_em",
-                "order": "criado_em.desc",
-                "limit": str(limit)
-            }
-            response = requests.get(
+        """Busca os últimos produtos salvos no Supabase
+
+        Falhas de rede/HTTP sobem como exceção em vez de virar lista vazia: o cache de /data
+        não guarda o erro e o feed ao vivo mantém o snapshot anterior."""
+        if not SUPABASE_URL or not SUPABASE_KEY_SERVICE:
+            logger.error("Supabase não configurado no ambiente")
+            return []
+
+        params = {
+            "select": "mensagem,imagem_url,enviado,criado_em",
+            "order": "criado_em.desc",
+            "limit": str(limit)
+        }
+        with timed_stage('supabase_fetch', 'supabase', host=SUPABASE_HOST) as stage:
+            response = HTTP_CLIENT.get(
                 f"{SUPABASE_URL}/rest/v1/produtos",
                 headers=SUPABASE_HEADERS,
                 params=params,
                 timeout=10
             )
-            if response.status_code == 200:
-                return response.json()
-            logger.error(f"Erro ao buscar produtos no Supabase: {response.text}")
-        except Exception as e:
-            logger.error(f"Erro ao buscar produtos no Supabase: {e}")
-        return []
-    
+            stage["outcome"] = http_outcome(response.status_code)
+        if response.status_code != 200:
+            raise RuntimeError(f"Supabase HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def fetch_supabase_page(self, filters, cursor=None, offset=0, page_size=1000,
+                            columns="mensagem,imagem_url,enviado,criado_em", order="criado_em.desc"):
+        """Uma página de produtos (criado_em desc) a partir do cursor de keyset"""
+        conditions = list(filters)
+        if cursor is not None:
+            # lte + offset: linhas com o mesmo criado_em do fim da página anterior não se perdem
+            conditions.append(f"criado_em.lte.{cursor}")
+        params = {
+            "select": columns,
+            "order": order,
+            "limit": str(page_size)
+        }
+        if conditions:
+            params["and"] = f"({','.join(conditions)})"
+        if offset:
+            params["offset"] = str(offset)
+        with timed_stage('supabase_fetch', 'supabase', host=SUPABASE_HOST) as stage:
+            response = HTTP_CLIENT.get(
+                f"{SUPABASE_URL}/rest/v1/produtos",
+                headers=SUPABASE_HEADERS,
+                params=params,
+                timeout=EXPORT_PAGE_TIMEOUT_SECONDS
+            )
+            stage["outcome"] = http_outcome(response.status_code)
+        if response.status_code != 200:
+            raise RuntimeError(f"Supabase HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def iter_supabase_products(self, since=None, until=None, enviado=None, limit=None, page_size=1000,
+                               columns="mensagem,imagem_url,enviado,criado_em"):
+        """Percorre todos os produtos (criado_em desc) página a página, em memória constante
+
+        since/until filtram criado_em (since inclusivo, until exclusivo); enviado filtra pelo status.
+        """
+        if not SUPABASE_URL or not SUPABASE_KEY_SERVICE:
+            raise RuntimeError("Supabase não configurado no ambiente")
+        filters = []
+        if since:
+            filters.append(f"criado_em.gte.{since}")
+        if until:
+            filters.append(f"criado_em.lt.{until}")
+        if enviado is not None:
+            filters.append(f"enviado.is.{'true' if enviado else 'false'}")
+        cursor = None
+        offset = 0
+        emitted = 0
+        while limit is None or emitted < limit:
+            size = page_size if limit is None else min(page_size, limit - emitted)
+            rows = self.fetch_supabase_page(filters, cursor=cursor, offset=offset, page_size=size, columns=columns)
+            for row in rows:
+                yield row
+            emitted += len(rows)
+            if len(rows) < size:
+                return
+            last = rows[-1].get("criado_em")
+            if last is None:
+                return
+            ties = sum(1 for row in rows if row.get("criado_em") == last)
+            offset = offset + ties if last == cursor else ties
+            cursor = last
+
+    def iter_supabase_products_by_id(self, after_id=None, columns="id", page_size=1000):
+        """Percorre os produtos em ordem de id (after_id exclusivo); keyset pela chave primária,
+        estável mesmo com linhas apagadas no meio da varredura"""
+        if not SUPABASE_URL or not SUPABASE_KEY_SERVICE:
+            raise RuntimeError("Supabase não configurado no ambiente")
+        while True:
+            filters = [f"id.gt.{after_id}"] if after_id is not None else []
+            rows = self.fetch_supabase_page(filters, page_size=page_size, columns=columns, order="id.asc")
+            for row in rows:
+                yield row
+            if len(rows) < page_size or rows[-1].get("id") is None:
+                return
+            after_id = rows[-1]["id"]
+
     def close(self):
-        """Fecha o WebDriver"""
-        if self.driver:
-            self.driver.quit()
-            logger.info("WebDriver fechado")
+        """Fecha os WebDrivers do pool"""
+        self.driver_pool.shutdown()
+        logger.info("WebDrivers fechados")
 
 # Inicializa o scraper
 scraper = FreeIslandScraper()
+mark_boot_phase("scraper")
+if STARTUP_MODE == 'eager':
+    for lazy in LazyImport.registry:
+        try:
+            lazy.resolve()
+        except ImportError as e:
+            logger.warning("Import opcional indisponível (%s): %s", lazy.module, e)
+    compile_parse_plans()
+    mark_boot_phase("heavy_imports")
+
+DATA_CACHE = RecentRowsCache(scraper.fetch_supabase_products, ttl=DATA_CACHE_TTL_SECONDS)
+LIVE_FEED = LiveFeed(
+    lambda limit: DATA_CACHE.get(limit)[0],
+    limit=SSE_ROWS_LIMIT,
+    poll_interval=SSE_POLL_SECONDS,
+    max_clients=SSE_MAX_CLIENTS
+)
+
+
+PRODUCT_MIRROR = ProductMirror(
+    PRODUCT_MIRROR_PATH,
+    lambda after_id: scraper.iter_supabase_products_by_id(
+        after_id=after_id, columns=ProductMirror.COLUMNS, page_size=EXPORT_PAGE_SIZE
+    ),
+    lambda limit: scraper.iter_supabase_products(limit=limit, page_size=limit, columns=ProductMirror.COLUMNS),
+    sync_interval=PRODUCT_MIRROR_SYNC_SECONDS,
+    refresh_rows=PRODUCT_MIRROR_REFRESH_ROWS,
+    reconcile_interval=PRODUCT_MIRROR_RECONCILE_SECONDS
+)
+
+
+def rows_changed():
+    """Linhas novas no Supabase: invalida o cache de /data, acorda o feed ao vivo e marca o espelho"""
+    DATA_CACHE.invalidate()
+    PRODUCT_MIRROR.mark_stale()
+    LIVE_FEED.notify()
+
+
+SAVE_SPOOL = SaveSpool(
+    SAVE_SPOOL_PATH,
+    scraper.insert_supabase_rows,
+    batch_size=SAVE_SPOOL_BATCH_SIZE,
+    timeout=SAVE_SPOOL_TIMEOUT_SECONDS,
+    poll_interval=SAVE_SPOOL_POLL_SECONDS,
+    retry_base=SAVE_SPOOL_RETRY_BASE_SECONDS,
+    retry_max=SAVE_SPOOL_RETRY_MAX_SECONDS,
+    max_attempts=SAVE_SPOOL_MAX_ATTEMPTS,
+    on_flush=rows_changed,
+    id_column=SAVE_IDEMPOTENCY_COLUMN or None
+)
+if SAVE_SPOOL_ENABLED:
+    # Reenvia o que ficou pendente de um worker anterior
+    SAVE_SPOOL.start()
+
+HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=max(2, HEDGE_MAX_WORKERS, REQUEST_THREADS * 2), thread_name_prefix='scrape-hedge')
+BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, BATCH_MAX_WORKERS), thread_name_prefix='scrape-batch')
+BATCH_SITE_SEMAPHORES = {
+    'amazon': threading.BoundedSemaphore(max(1, BATCH_AMAZON_CONCURRENCY)),
+    'mercadolivre': threading.BoundedSemaphore(max(1, BATCH_MERCADOLIVRE_CONCURRENCY)),
+}
+
+
+AsyncFetchResult = namedtuple('AsyncFetchResult', ['status_code', 'url', 'text', 'bytes_read'], defaults=(None,))
+
+
+class AsyncScrapeEngine:
+    """Pipeline resolve -> fetch -> parse em asyncio, alternativo ao fluxo requests/time.sleep.
+
+    Roda num event loop dedicado (thread daemon) para que as rotas Flask síncronas
+    possam chamá-lo via run(). Reaproveita os caches e os parsers do FreeIslandScraper,
+    então devolve os mesmos dicts de scrape_amazon_requests/scrape_mercadolivre_requests.
+    Cobre apenas o caminho requests; fallback Selenium continua no fluxo síncrono.
+    """
+
+    def __init__(self, scraper, max_concurrency=200, site_concurrency=None, limit_per_host=20, timeout=60):
+        self.scraper = scraper
+        self.max_concurrency = max_concurrency
+        self.site_concurrency = site_concurrency or {}
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.loop = None
+        self.session = None
+        self.semaphore = None
+        self.site_semaphores = {}
+        self.start_lock = threading.Lock()
+
+    def available(self):
+        return aiohttp.is_available()
+
+    def ensure_loop(self):
+        with self.start_lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-scrape-loop', daemon=True).start()
+                self.loop = loop
+        return self.loop
+
+    def run(self, coro, timeout=None):
+        """Executa uma corrotina no loop do engine a partir de uma thread síncrona"""
+        trace = CURRENT_TRACE.get()
+        if trace is not None:
+            coro = run_in_trace(trace, coro)
+        future = asyncio.run_coroutine_threadsafe(coro, self.ensure_loop())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300
+            )
+            # DummyCookieJar: cookies não vazam entre scrapes (mesma regra do PooledHttpClient);
+            # trust_env: respeita HTTP(S)_PROXY/NO_PROXY como o requests faz no engine síncrono
+            self.session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(), trust_env=True)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.site_semaphores = {
+                site: asyncio.Semaphore(max(1, limit)) for site, limit in self.site_concurrency.items()
+            }
+        return self.session
+
+    async def fetch(self, method, url, *, headers=None, timeout=12, retries=2, base_sleep=0.8, read_body=True, markers=None, site=None):
+        """Equivalente assíncrono de request_with_retries (backoff com asyncio.sleep).
+
+        Com markers (e STREAM_FETCH_ENABLED) o corpo é lido em chunks como em fetch_product_page.
+        """
+        if site:
+            with timed_stage('fetch', site, host=urlparse(url).netloc) as stage:
+                result = await self.fetch_with_retries(method, url, headers, timeout, retries, base_sleep, read_body, markers, site)
+                stage["outcome"] = http_outcome(result.status_code)
+                stage["bytes"] = result.bytes_read
+                return result
+        return await self.fetch_with_retries(method, url, headers, timeout, retries, base_sleep, read_body, markers, site)
+
+    async def fetch_with_retries(self, method, url, headers, timeout, retries, base_sleep, read_body, markers, site):
+        session = self.get_session()
+        last_exc = None
+        for attempt in range(retries + 1):
+            try:
+                if attempt > 0:
+                    await asyncio.sleep(base_sleep * (2 ** (attempt - 1)))
+                attempt_start = time.perf_counter()
+                async with session.request(
+                    method, url, headers=headers, allow_redirects=True,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    text = ''
+                    bytes_read = response.content_length
+                    if read_body and method != 'HEAD' and markers and STREAM_FETCH_ENABLED:
+                        if response.status == 200:
+                            text, bytes_read = await self.read_streamed(response, markers, site)
+                    elif read_body and method != 'HEAD':
+                        text = await response.text(errors='replace')
+                    return AsyncFetchResult(response.status, str(response.url), text, bytes_read)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                record_span("http_attempt", attempt_start, host=urlparse(url).netloc, method=method,
+                            attempt=attempt + 1, outcome="error", error=type(e).__name__)
+                last_exc = e
+        raise last_exc
+
+    async def read_streamed(self, response, markers, site):
+        body = StreamedBody(markers, encoding=response.charset)
+        async for chunk in response.content.iter_chunked(STREAM_FETCH_CHUNK_BYTES):
+            if body.feed(chunk):
+                break
+        html = body.finish()
+        # aiohttp descomprime sozinho: bytes na rede só são conhecidos sem Content-Encoding
+        wire_bytes = None if response.headers.get('Content-Encoding') else body.bytes_read
+        body.log(site, str(response.url), content_length=response.content_length, wire_bytes=wire_bytes, engine="async")
+        return html, body.bytes_read
+
+    async def cache_get(self, url):
+        return await asyncio.to_thread(RESOLVE_CACHE.get, url)
+
+    async def cache_set(self, url, site, resolved, outcome):
+        await asyncio.to_thread(self.scraper.cache_resolution, url, site, resolved, outcome)
+
+    async def resolve_amazon_url(self, url):
+        cached = await self.cache_get(url)
+        if cached:
+            return cached["resolved_url"]
+        headers = self.scraper.amazon_request_headers()
+        resolved, outcome = url, "error"
+        with timed_stage('resolve', 'amazon', host=urlparse(url).netloc) as stage:
+            for method, timeout in (('HEAD', 8), ('GET', 10)):
+                try:
+                    response = await self.fetch(method, url, headers=headers, timeout=timeout, read_body=False)
+                    if response.url:
+                        resolved, outcome = response.url, resolution_outcome(response.status_code)
+                        break
+                except Exception:
+                    continue
+            stage["outcome"] = outcome
+        await self.cache_set(url, 'amazon', resolved, outcome)
+        return resolved
+
+    async def resolve_mercadolivre_url(self, url):
+        cached = await self.cache_get(url)
+        if cached:
+            return cached["resolved_url"]
+        with timed_stage('resolve', 'mercadolivre', host=urlparse(url).netloc) as stage:
+            resolved, outcome = await self.follow_mercadolivre_redirects(url)
+            stage["outcome"] = outcome
+        await self.cache_set(url, 'mercadolivre', resolved, outcome)
+        return resolved
+
+    async def follow_mercadolivre_redirects(self, url):
+        headers = self.scraper.mercadolivre_resolve_headers()
+        resolved = url
+        status = None
+        try:
+            await self.fetch('GET', "https://www.mercadolivre.com.br/", headers=headers, timeout=8, read_body=False)
+        except Exception:
+            pass
+        for method in ('HEAD', 'GET'):
+            try:
+                response = await self.fetch(method, url, headers=headers, timeout=8 if method == 'HEAD' else 10, read_body=False)
+                status = response.status_code
+                if response.url:
+                    resolved = response.url
+            except Exception:
+                pass
+            if resolved != url:
+                break
+
+        try:
+            if self.scraper.is_mercadolivre_social_url(resolved):
+                response = await self.fetch('GET', resolved, headers=headers, timeout=10)
+                candidate = await asyncio.to_thread(self.scraper.find_mercadolivre_canonical_candidate, response.text)
+                if candidate:
+                    try:
+                        product = await self.fetch('GET', candidate, headers=headers, timeout=10, read_body=False)
+                        if product.url:
+                            return product.url, "ok"
+                    except Exception:
+                        return candidate, "ok"
+                return self.scraper.strip_mercadolivre_tracking(resolved), resolution_outcome(status)
+        except Exception:
+            pass
+        return resolved, resolution_outcome(status)
+
+    def error(self, code, message, **details):
+        log_event(logging.WARNING, "scrape_stage_error", code=code, error_message=message, engine="async", **details)
+        err = {"error_code": code, "error": message}
+        if details:
+            err["details"] = details
+        return err
+
+    async def scrape_amazon_requests(self, url):
+        """Versão assíncrona de scrape_amazon_requests; retorna (data, erro)"""
+        sc = self.scraper
+        headers = sc.amazon_request_headers()
+        try:
+            start = time.time()
+            resolved_url = await self.resolve_amazon_url(url)
+            request_url = sc.canonicalize_amazon_url(resolved_url)
+            response = await self.fetch('GET', request_url, headers=headers, timeout=12, markers=AMAZON_STREAM_MARKERS, site='amazon')
+            log_event(
+                logging.INFO,
+                "amazon_requests_response",
+                engine="async",
+                status=response.status_code,
+                elapsed_ms=int((time.time() - start) * 1000),
+                final_url=response.url,
+                request_url=request_url,
+                content_length=len(response.text)
+            )
+            if response.status_code != 200:
+                return None, self.error("AMAZON_REQUESTS_NON_200", "Resposta não-200 da Amazon (requests)", status=response.status_code, final_url=response.url)
+            html = response.text
+            if sc.is_amazon_captcha(html):
+                canonical_retry = sc.canonicalize_amazon_url(response.url or request_url)
+                if canonical_retry != request_url:
+                    retry_response = await self.fetch('GET', canonical_retry, headers=headers, timeout=12, markers=AMAZON_STREAM_MARKERS, site='amazon')
+                    if retry_response.status_code == 200 and not sc.is_amazon_captcha(retry_response.text):
+                        response = retry_response
+                        html = retry_response.text
+                if sc.is_amazon_captcha(html):
+                    return None, self.error("AMAZON_REQUESTS_BLOCKED", "Bloqueio/captcha detectado (requests)", final_url=response.url)
+            sc.log_amazon_markers(html, response.url)
+            data = await asyncio.to_thread(sc.extract_product_data, 'amazon', html, url, response.url or resolved_url or url)
+            if sc.has_any_data(data):
+                return data, None
+            return None, self.error("AMAZON_REQUESTS_NO_DATA", "Nenhum dado encontrado (requests)", final_url=response.url)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return None, self.error("AMAZON_REQUESTS_EXCEPTION", "Erro ao requisitar Amazon (requests)", error=str(e))
+
+    async def scrape_mercadolivre_requests(self, url):
+        """Versão assíncrona de scrape_mercadolivre_requests; retorna (data, erro)"""
+        sc = self.scraper
+        headers = sc.mercadolivre_request_headers()
+        try:
+            start = time.time()
+            resolved_url = await self.resolve_mercadolivre_url(url)
+            response = await self.fetch('GET', resolved_url, headers=headers, timeout=12, markers=MERCADOLIVRE_STREAM_MARKERS, site='mercadolivre')
+            log_event(
+                logging.INFO,
+                "mercadolivre_requests_response",
+                engine="async",
+                status=response.status_code,
+                elapsed_ms=int((time.time() - start) * 1000),
+                final_url=response.url,
+                content_length=len(response.text)
+            )
+            if response.status_code != 200:
+                return None, self.error("MERCADOLIVRE_REQUESTS_NON_200", "Resposta não-200 do Mercado Livre (requests)", status=response.status_code, final_url=response.url)
+
+            html = response.text
+            doc = HtmlDocument(html)
+            social_data = await asyncio.to_thread(sc.extract_mercadolivre_social_card, doc, response.url, url)
+            if social_data and social_data.get('price'):
+                return social_data, None
+
+            candidate_url = await asyncio.to_thread(sc.find_mercadolivre_card_url, doc)
+            if candidate_url and candidate_url != response.url:
+                try:
+                    product_response = await self.fetch('GET', candidate_url, headers=headers, timeout=12, markers=MERCADOLIVRE_STREAM_MARKERS, site='mercadolivre')
+                    if product_response.status_code == 200:
+                        html = product_response.text
+                        doc = HtmlDocument(html)
+                        response = product_response
+                        if sc.is_mercadolivre_captcha(html) and social_data:
+                            return social_data, None
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass
+
+            if sc.is_mercadolivre_captcha(html):
+                if social_data:
+                    return social_data, None
+                return None, self.error("MERCADOLIVRE_REQUESTS_BLOCKED", "Bloqueio/captcha detectado (requests)", final_url=response.url)
+            sc.log_mercadolivre_markers(html, response.url)
+            data = await asyncio.to_thread(sc.extract_product_data, 'mercadolivre', doc, url, response.url or resolved_url or url)
+            if sc.has_any_data(data):
+                return data, None
+            return None, self.error("MERCADOLIVRE_REQUESTS_NO_DATA", "Nenhum dado encontrado (requests)", final_url=response.url)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return None, self.error("MERCADOLIVRE_REQUESTS_EXCEPTION", "Erro ao requisitar Mercado Livre (requests)", error=str(e))
+
+    async def product_cache_key(self, site, url):
+        """Como FreeIslandScraper.product_cache_key: sem rede, só URL e RESOLVE_CACHE (numa thread)"""
+        sc = self.scraper
+        identity = sc.extract_amazon_identity(url) if site == 'amazon' else sc.extract_mercadolivre_identity(url)
+        if identity:
+            return f"{site}:{identity}"
+        return await asyncio.to_thread(sc.product_cache_key, site, url)
+
+    async def scrape_product(self, url, force_refresh=False):
+        """Equivalente assíncrono de FreeIslandScraper.scrape_product (sem Selenium)"""
+        start = time.perf_counter()
+        site = self.scraper.identify_site(url)
+        if site not in ('amazon', 'mercadolivre'):
+            return {'error': f'Site não suportado: {site}', 'url': url, 'error_code': 'SITE_UNSUPPORTED'}
+        self.get_session()
+        cache_key = None
+        try:
+            async with self.semaphore, self.site_semaphores[site]:
+                cache_key = await self.product_cache_key(site, url)
+                if cache_key and not force_refresh:
+                    cached = RESULT_CACHE.get(cache_key)
+                    if cached:
+                        data, age = cached
+                        log_event(logging.INFO, "result_cache_hit", site=site, cache_key=cache_key, age_s=round(age, 1), engine="async")
+                        return record_scrape(site, "async", start, self.scraper.rebind_cached_result(data, url), outcome="cache_hit")
+
+                await RATE_LIMITER.acquire_async(site)
+
+                scrape = self.scrape_amazon_requests if site == 'amazon' else self.scrape_mercadolivre_requests
+                data, error = await asyncio.wait_for(scrape(url), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            data, error = None, self.error("ASYNC_SCRAPE_TIMEOUT", "Tempo limite do scraping assíncrono excedido", url=url)
+        except Exception as e:
+            logger.error("Erro no scraping assíncrono: %s", e)
+            return record_scrape(site, "async", start, {'error': str(e), 'url': url})
+
+        if data:
+            cache_key = cache_key or await self.product_cache_key(site, data.get('resolved_url') or url)
+            if cache_key:
+                RESULT_CACHE.set(cache_key, site, data)
+            return record_scrape(site, "async", start, data)
+        return record_scrape(site, "async", start, {'url': url, **error})
+
+    async def scrape_many(self, urls, force_refresh=False):
+        """Dispara todos os scrapes no mesmo loop; resultados na ordem de entrada"""
+        return await asyncio.gather(*(self.scrape_product(u, force_refresh=force_refresh) for u in urls))
+
+
+ASYNC_ENGINE = AsyncScrapeEngine(
+    scraper,
+    max_concurrency=ASYNC_MAX_CONCURRENT_SCRAPES,
+    site_concurrency={
+        'amazon': ASYNC_AMAZON_CONCURRENCY,
+        'mercadolivre': ASYNC_MERCADOLIVRE_CONCURRENCY,
+    },
+    limit_per_host=ASYNC_LIMIT_PER_HOST,
+    timeout=ASYNC_SCRAPE_TIMEOUT_SECONDS
+)
+
+
+def use_async_engine(options):
+    engine = str(options.get('engine') or SCRAPE_ENGINE).lower()
+    if engine != 'async':
+        return False
+    if not ASYNC_ENGINE.available():
+        log_event(logging.WARNING, "async_engine_unavailable", reason="aiohttp_not_installed")
+        return False
+    return True
+
+
+def option_enabled(value):
+    """Booleano vindo do JSON do cliente: aceita true/1/"yes" e trata "false"/"0" como falso"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def scrape_with_engine(url, options, request_id=None):
+    """Escolhe o engine (sync/async) para um scrape; async cai no fluxo síncrono se Selenium puder ajudar"""
+    force_refresh = option_enabled(options.get('force_refresh', False))
+    if use_async_engine(options):
+        product_data = ASYNC_ENGINE.run(
+            ASYNC_ENGINE.scrape_product(url, force_refresh=force_refresh),
+            timeout=ASYNC_SCRAPE_TIMEOUT_SECONDS + 10
+        )
+        site = scraper.identify_site(url)
+        if 'error' in product_data and site in ('amazon', 'mercadolivre') and scraper.selenium_enabled(site):
+            log_event(logging.INFO, "async_engine_selenium_fallback", url=url, error_code=product_data.get("error_code"))
+            return scraper.scrape_product(url, force_refresh=True, request_id=request_id)
+        return product_data
+    return scraper.scrape_product(url, force_refresh=force_refresh, request_id=request_id)
 
 @app.route('/')
 def index():
@@ -1625,87 +5244,287 @@ def auth():
 def dashboard():
     return render_template('dashboard.html', user_name=session.get('user_name'))
 
+def build_scrape_payload(url, options, request_id, product_data=None):
+    """Executa scraping + mensagem e devolve (payload, status) no formato de /scrape.
+
+    product_data pode vir pronto (ex: lote já raspado pelo engine assíncrono).
+    """
+    start = time.time()
+    if not url:
+        payload, status = error_response("URL_MISSING", "URL não fornecida", 400, request_id=request_id)
+        log_event(logging.WARNING, "scrape_failed", request_id=request_id, url="", error_code="URL_MISSING")
+        return payload, status
+
+    # Fazer scraping
+    if product_data is None:
+        product_data = scrape_with_engine(url, options, request_id)
+
+    if 'error' in product_data:
+        details = {
+            "source": "scrape_product",
+            "site": scraper.identify_site(url),
+            "error_code": product_data.get("error_code")
+        }
+        upstream_block_codes = {
+            "AMAZON_REQUESTS_BLOCKED",
+            "MERCADOLIVRE_REQUESTS_BLOCKED",
+            "AMAZON_CAPTCHA",
+            "MERCADOLIVRE_CAPTCHA",
+            "AMAZON_BLOCKED_OR_EMPTY",
+            "MERCADOLIVRE_BLOCKED_OR_EMPTY",
+        }
+        status = 429 if product_data.get("error_code") in upstream_block_codes else 502
+        payload, status = error_response("SCRAPE_FAILED", product_data['error'], status, details=details, request_id=request_id)
+        log_event(
+            logging.ERROR,
+            "scrape_failed",
+            request_id=request_id,
+            url=url,
+            error_code=product_data.get("error_code"),
+            details=details
+        )
+        incr_metric("scrape_fail")
+        return payload, status
+
+    # Gerar mensagem
+    free_shipping = options.get('free_shipping', False)
+    coupon_name = options.get('coupon_name')
+    coupon_discount = options.get('coupon_discount')
+
+    if isinstance(product_data, dict):
+        product_data.setdefault('original_url', url)
+    message = scraper.generate_message(
+        product_data, 
+        free_shipping, 
+        coupon_name, 
+        coupon_discount
+    )
+
+    elapsed_ms = int((time.time() - start) * 1000)
+    missing_fields = [k for k in ("title", "price", "image_url") if not product_data.get(k)]
+    if missing_fields:
+        log_event(
+            logging.WARNING,
+            "scrape_partial",
+            request_id=request_id,
+            url=url,
+            site=scraper.identify_site(url),
+            missing=missing_fields
+        )
+    log_event(logging.INFO, "scrape_success", request_id=request_id, url=url, elapsed_ms=elapsed_ms)
+    incr_metric("scrape_ok")
+    return {
+        'product': product_data,
+        'message': message,
+        'success': True,
+        'request_id': request_id
+    }, 200
+
+
 @app.route('/scrape', methods=['POST'])
 @login_required
 def scrape():
     try:
         request_id = new_request_id()
-        start = time.time()
         data = request.get_json()
-        url = data.get('url')
+        with start_trace(request_id) as trace:
+            payload, status = build_scrape_payload(data.get('url'), data, request_id)
+        attach_trace(payload, trace, data)
+        return jsonify(payload), status
         
-        if not url:
-            payload, status = error_response("URL_MISSING", "URL não fornecida", 400, request_id=request_id)
-            log_event(logging.WARNING, "scrape_failed", request_id=request_id, url="", error_code="URL_MISSING")
+    except Exception as e:
+        log_event(logging.ERROR, "scrape_exception", error=str(e), error_code="SCRAPE_EXCEPTION")
+        payload, status = error_response("SCRAPE_EXCEPTION", str(e), 500, request_id=locals().get("request_id"))
+        return jsonify(payload), status
+
+
+def attach_trace(payload, trace, options):
+    """Com debug ligado (corpo ou ?debug=1), devolve os spans junto da resposta"""
+    debug = options.get('debug') if isinstance(options, dict) else None
+    if trace is not None and (debug or request.args.get('debug', '').lower() in ('1', 'true', 'yes')):
+        payload['trace'] = trace.to_dict()
+    return payload
+
+
+def run_batch_item(url, options, request_id):
+    """Executa um item do lote respeitando o limite de concorrência do site"""
+    try:
+        site = scraper.identify_site(url) if url else 'unknown'
+        semaphore = BATCH_SITE_SEMAPHORES.get(site)
+        with start_trace(request_id) as trace:
+            if semaphore is None:
+                payload, status = build_scrape_payload(url, options, request_id)
+            else:
+                with semaphore:
+                    payload, status = build_scrape_payload(url, options, request_id)
+        if trace is not None and options.get('debug'):
+            payload['trace'] = trace.to_dict()
+        return payload, status
+    except Exception as e:
+        log_event(logging.ERROR, "scrape_exception", request_id=request_id, error=str(e), error_code="SCRAPE_EXCEPTION")
+        return error_response("SCRAPE_EXCEPTION", str(e), 500, request_id=request_id)
+
+
+def split_batch_item(item, shared):
+    # Cada item pode ser a URL ou um objeto {"url": ..., <opções que sobrescrevem as do lote>}
+    options = dict(shared)
+    if isinstance(item, dict):
+        options.update({k: v for k, v in item.items() if k != 'url'})
+        url = item.get('url')
+    else:
+        url = item
+    url = url.strip() if isinstance(url, str) else None
+    return url, options
+
+
+def batch_rate_budget(entries, deadline):
+    """Itens do lote (índice -> (site, espera)) cujo token do rate limiter só sai depois do prazo.
+
+    Eles são respondidos na hora como rate_limited em vez de ocupar a fila até virar timeout.
+    Itens que já estão no cache de resultados não gastam token e não entram na conta.
+    """
+    pending = {}
+    limited = {}
+    now = time.time()
+    for index, url, options in entries:
+        site = scraper.identify_site(url)
+        if site not in ('amazon', 'mercadolivre'):
+            continue
+        if not option_enabled(options.get('force_refresh', False)):
+            cache_key = scraper.product_cache_key(site, url)
+            if cache_key and RESULT_CACHE.contains(cache_key):
+                continue
+        wait = RATE_LIMITER.projected_wait(site, pending.get(site, 0) + 1)
+        if now + wait + BATCH_SCRAPE_ESTIMATE_SECONDS > deadline:
+            limited[index] = (site, wait)
+        else:
+            pending[site] = pending.get(site, 0) + 1
+    if limited:
+        log_event(logging.WARNING, "batch_rate_limited", count=len(limited), sites=sorted({site for site, _ in limited.values()}))
+    return limited
+
+
+def batch_rate_limited_response(site, wait, request_id):
+    return error_response(
+        "RATE_LIMITED", "Cota de scraping do site esgotada para o prazo do lote; reenvie depois", 429,
+        details={"site": site, "retry_after_s": round(wait, 1)}, request_id=request_id
+    )
+
+
+def scrape_batch_async(items, shared, request_id, start):
+    """Lote inteiro no event loop do engine assíncrono (sem threads por URL)"""
+    parsed = [split_batch_item(item, shared) for item in items]
+    valid = [(i, url, options) for i, (url, options) in enumerate(parsed) if url]
+    limited = batch_rate_budget(valid, start + BATCH_TIMEOUT_SECONDS)
+    valid = [entry for entry in valid if entry[0] not in limited]
+    request_ids = [new_request_id() for _ in parsed]
+    traces = {i: Trace(request_ids[i], max_spans=TRACE_MAX_SPANS) for i, _, _ in valid} if TRACING_ENABLED else {}
+
+    async def run_all():
+        # Cada scrape vira uma task com o próprio trace no contexto
+        return await asyncio.gather(*(
+            run_in_trace(traces.get(i), ASYNC_ENGINE.scrape_product(url, force_refresh=option_enabled(options.get('force_refresh', False))))
+            for i, url, options in valid
+        ))
+
+    remaining = max(1.0, start + BATCH_TIMEOUT_SECONDS - time.time())
+    try:
+        scraped = ASYNC_ENGINE.run(run_all(), timeout=remaining) if valid else []
+        products = {i: product for (i, _, _), product in zip(valid, scraped)}
+    except FutureTimeoutError:
+        products = {i: {'error': 'Tempo limite do lote excedido', 'url': url, 'error_code': 'BATCH_TIMEOUT'} for i, url, _ in valid}
+    for trace in traces.values():
+        trace.finish()
+        TRACE_STORE.add(trace)
+
+    results = []
+    for i, (url, options) in enumerate(parsed):
+        if i in limited:
+            payload, status = batch_rate_limited_response(*limited[i], request_ids[i])
+            results.append({'url': url, 'status': status, **payload})
+            continue
+        payload, status = build_scrape_payload(url, options, request_ids[i], product_data=products.get(i))
+        if i in traces and options.get('debug'):
+            payload['trace'] = traces[i].to_dict()
+        results.append({'url': url, 'status': status, **payload})
+
+    ok_count = sum(1 for r in results if r['status'] == 200)
+    elapsed_ms = int((time.time() - start) * 1000)
+    log_event(logging.INFO, "scrape_batch_done", request_id=request_id, count=len(results), ok=ok_count, elapsed_ms=elapsed_ms, engine="async")
+    return {
+        'success': True,
+        'request_id': request_id,
+        'count': len(results),
+        'ok': ok_count,
+        'failed': len(results) - ok_count,
+        'rate_limited': len(limited),
+        'elapsed_ms': elapsed_ms,
+        'engine': 'async',
+        'results': results
+    }
+
+
+@app.route('/scrape/batch', methods=['POST'])
+@login_required
+def scrape_batch():
+    try:
+        request_id = new_request_id()
+        start = time.time()
+        data = request.get_json() or {}
+        items = data.get('urls') or []
+        if not isinstance(items, list) or not items:
+            payload, status = error_response("URLS_MISSING", "Lista de URLs não fornecida", 400, request_id=request_id)
             return jsonify(payload), status
-        
-        # Fazer scraping
-        product_data = scraper.scrape_product(url)
-        
-        if 'error' in product_data:
-            details = {
-                "source": "scrape_product",
-                "site": scraper.identify_site(url),
-                "error_code": product_data.get("error_code")
-            }
-            upstream_block_codes = {
-                "AMAZON_REQUESTS_BLOCKED",
-                "MERCADOLIVRE_REQUESTS_BLOCKED",
-                "AMAZON_CAPTCHA",
-                "MERCADOLIVRE_CAPTCHA",
-                "AMAZON_BLOCKED_OR_EMPTY",
-                "MERCADOLIVRE_BLOCKED_OR_EMPTY",
-            }
-            status = 429 if product_data.get("error_code") in upstream_block_codes else 502
-            payload, status = error_response("SCRAPE_FAILED", product_data['error'], status, details=details, request_id=request_id)
-            log_event(
-                logging.ERROR,
-                "scrape_failed",
-                request_id=request_id,
-                url=url,
-                error_code=product_data.get("error_code"),
-                details=details
+        if len(items) > BATCH_MAX_URLS:
+            payload, status = error_response(
+                "BATCH_TOO_LARGE", f"Máximo de {BATCH_MAX_URLS} URLs por lote", 400,
+                details={"received": len(items), "max": BATCH_MAX_URLS}, request_id=request_id
             )
-            METRICS["scrape_fail"] = METRICS.get("scrape_fail", 0) + 1
             return jsonify(payload), status
-        
-        # Gerar mensagem
-        free_shipping = data.get('free_shipping', False)
-        coupon_name = data.get('coupon_name')
-        coupon_discount = data.get('coupon_discount')
-        
-        if isinstance(product_data, dict):
-            product_data.setdefault('original_url', url)
-        message = scraper.generate_message(
-            product_data, 
-            free_shipping, 
-            coupon_name, 
-            coupon_discount
-        )
 
+        shared = {k: data.get(k) for k in ('free_shipping', 'coupon_name', 'coupon_discount', 'force_refresh', 'engine', 'debug') if k in data}
+        if use_async_engine(shared):
+            return jsonify(scrape_batch_async(items, shared, request_id, start))
+        deadline = start + BATCH_TIMEOUT_SECONDS
+        parsed = [split_batch_item(item, shared) for item in items]
+        limited = batch_rate_budget([(i, url, options) for i, (url, options) in enumerate(parsed) if url], deadline)
+        jobs = []
+        for i, (url, options) in enumerate(parsed):
+            item_request_id = new_request_id()
+            if i in limited:
+                jobs.append((url, item_request_id, None, limited[i]))
+                continue
+            jobs.append((url, item_request_id, BATCH_EXECUTOR.submit(run_batch_item, url, options, item_request_id), None))
+
+        results = []
+        for url, item_request_id, future, rate_limited in jobs:
+            if rate_limited:
+                payload, status = batch_rate_limited_response(*rate_limited, item_request_id)
+                results.append({'url': url, 'status': status, **payload})
+                continue
+            try:
+                payload, status = future.result(timeout=max(0.0, deadline - time.time()))
+            except FutureTimeoutError:
+                future.cancel()
+                payload, status = error_response("BATCH_TIMEOUT", "Tempo limite do lote excedido", 504, request_id=item_request_id)
+            results.append({'url': url, 'status': status, **payload})
+
+        ok_count = sum(1 for r in results if r['status'] == 200)
         elapsed_ms = int((time.time() - start) * 1000)
-        missing_fields = [k for k in ("title", "price", "image_url") if not product_data.get(k)]
-        if missing_fields:
-            log_event(
-                logging.WARNING,
-                "scrape_partial",
-                request_id=request_id,
-                url=url,
-                site=scraper.identify_site(url),
-                missing=missing_fields
-            )
-        log_event(logging.INFO, "scrape_success", request_id=request_id, url=url, elapsed_ms=elapsed_ms)
-        METRICS["scrape_ok"] = METRICS.get("scrape_ok", 0) + 1
+        log_event(logging.INFO, "scrape_batch_done", request_id=request_id, count=len(results), ok=ok_count, elapsed_ms=elapsed_ms)
         return jsonify({
-            'product': product_data,
-            'message': message,
             'success': True,
-            'request_id': request_id
+            'request_id': request_id,
+            'count': len(results),
+            'ok': ok_count,
+            'failed': len(results) - ok_count,
+            'rate_limited': len(limited),
+            'elapsed_ms': elapsed_ms,
+            'results': results
         })
-        
     except Exception as e:
-        log_event(logging.ERROR, "scrape_exception", error=str(e), error_code="SCRAPE_EXCEPTION")
-        payload, status = error_response("SCRAPE_EXCEPTION", str(e), 500, request_id=locals().get("request_id"))
+        log_event(logging.ERROR, "scrape_batch_exception", error=str(e), error_code="SCRAPE_BATCH_EXCEPTION")
+        payload, status = error_response("SCRAPE_BATCH_EXCEPTION", str(e), 500, request_id=locals().get("request_id"))
         return jsonify(payload), status
 
 @app.route('/save', methods=['POST'])
@@ -1713,30 +5532,52 @@ def scrape():
 def save():
     try:
         request_id = new_request_id()
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         product_data = data.get('product')
         message = data.get('message')
         
-        if not product_data or not message:
-            METRICS["save_fail"] = METRICS.get("save_fail", 0) + 1
+        if not product_data or not message or not isinstance(product_data, dict):
+            incr_metric("save_fail")
             payload, status = error_response("SAVE_INVALID", "Dados incompletos", 400, request_id=request_id)
             return jsonify(payload), status
+
+        row = scraper.build_supabase_payload(product_data, message)
+        invalid = scraper.validate_supabase_payload(row)
+        if invalid:
+            incr_metric("save_fail")
+            log_event(logging.WARNING, "save_invalid", request_id=request_id, error=invalid)
+            payload, status = error_response("SAVE_INVALID", invalid, 400, request_id=request_id)
+            return jsonify(payload), status
         
-        # Salvar no Supabase
+        if SAVE_SPOOL_ENABLED:
+            spool_id = SAVE_SPOOL.enqueue(row)
+            if spool_id is not None:
+                incr_metric("save_ok")
+                log_event(logging.INFO, "save_queued", request_id=request_id, spool_id=spool_id)
+                return jsonify({
+                    'success': True,
+                    'queued': True,
+                    'spool_id': spool_id,
+                    'message': 'Produto salvo na fila de envio ao Supabase!',
+                    'request_id': request_id
+                })
+
+        # Salvar no Supabase (direto, sem spool)
         success = scraper.save_to_supabase(product_data, message)
         
         if success:
-            METRICS["save_ok"] = METRICS.get("save_ok", 0) + 1
+            rows_changed()
+            incr_metric("save_ok")
             log_event(logging.INFO, "save_success", request_id=request_id)
             return jsonify({'success': True, 'message': 'Produto salvo com sucesso!', 'request_id': request_id})
         else:
-            METRICS["save_fail"] = METRICS.get("save_fail", 0) + 1
+            incr_metric("save_fail")
             log_event(logging.ERROR, "save_failed", request_id=request_id)
             payload, status = error_response("SAVE_FAILED", "Erro ao salvar produto", 502, request_id=request_id)
             return jsonify(payload), status
             
     except Exception as e:
-        METRICS["save_fail"] = METRICS.get("save_fail", 0) + 1
+        incr_metric("save_fail")
         log_event(logging.ERROR, "save_exception", error=str(e), error_code="SAVE_EXCEPTION")
         payload, status = error_response("SAVE_EXCEPTION", str(e), 500, request_id=locals().get("request_id"))
         return jsonify(payload), status
@@ -1752,28 +5593,157 @@ def data():
         except Exception:
             limit = 20
 
-        rows = scraper.fetch_supabase_products(limit=limit)
-        METRICS["data_ok"] = METRICS.get("data_ok", 0) + 1
-        return jsonify({'rows': rows, 'success': True, 'request_id': request_id})
+        rows, etag, last_modified = DATA_CACHE.get(limit)
+        incr_metric("data_ok")
+        response = jsonify({'rows': rows, 'success': True, 'request_id': request_id})
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            DATA_CACHE.not_modified += 1
+        return response
     except Exception as e:
-        METRICS["data_fail"] = METRICS.get("data_fail", 0) + 1
+        incr_metric("data_fail")
         log_event(logging.ERROR, "data_exception", error=str(e), error_code="DATA_EXCEPTION")
         payload, status = error_response("DATA_EXCEPTION", str(e), 500, request_id=locals().get("request_id"))
         return jsonify({**payload, 'success': False}), status
 
 
+METRICS_REGISTRY.gauge_callback(
+    "freeisland_save_spool_depth", "Linhas pendentes no spool do /save",
+    lambda: [({}, SAVE_SPOOL.stats()["depth"])]
+)
+def driver_pool_gauges():
+    stats = scraper.driver_pool.stats()
+    return [({"state": "total"}, stats["total"]), ({"state": "idle"}, stats["idle"])]
+
+
+METRICS_REGISTRY.gauge_callback("freeisland_driver_pool", "WebDrivers do pool (total e ociosos)", driver_pool_gauges)
+METRICS_REGISTRY.gauge_callback(
+    "freeisland_result_cache_entries", "Entradas no cache de resultados",
+    lambda: [({}, RESULT_CACHE.stats()["size"])]
+)
+METRICS_REGISTRY.gauge_callback(
+    "freeisland_live_feed_clients", "Streams SSE abertos",
+    lambda: [({}, LIVE_FEED.stats()["clients"])]
+)
+
+
+def metrics_authorized():
+    if METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        return hmac.compare_digest(header, f"Bearer {METRICS_TOKEN}")
+    return 'user_id' in session
+
+
+@app.route('/metrics')
+def metrics():
+    if not metrics_authorized():
+        payload, status = error_response("METRICS_UNAUTHORIZED", "Não autorizado", 401)
+        return jsonify(payload), status
+    return app.response_class(METRICS_REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/data/changes', methods=['GET'])
+@login_required
+def data_changes():
+    try:
+        request_id = new_request_id()
+        try:
+            limit = max(1, min(int(request.args.get('limit', '200')), CHANGES_MAX_LIMIT))
+        except Exception:
+            limit = 200
+        try:
+            PRODUCT_MIRROR.sync()
+        except Exception as e:
+            # Supabase fora: serve o que o espelho já tem; o próximo pedido tenta de novo
+            log_event(logging.WARNING, "data_changes_stale", request_id=request_id, error=str(e))
+        result = PRODUCT_MIRROR.changes(request.args.get('since'), limit=limit)
+        incr_metric("data_changes_ok")
+        return jsonify({**result, 'count': len(result['rows']), 'success': True, 'request_id': request_id})
+    except Exception as e:
+        incr_metric("data_changes_fail")
+        log_event(logging.ERROR, "data_changes_exception", error=str(e), error_code="DATA_CHANGES_EXCEPTION")
+        payload, status = error_response("DATA_CHANGES_EXCEPTION", str(e), 500, request_id=locals().get("request_id"))
+        return jsonify({**payload, 'success': False}), status
+
+@app.route('/data/stream', methods=['GET'])
+@login_required
+def data_stream():
+    request_id = new_request_id()
+    if not SSE_ENABLED:
+        payload, status = error_response("SSE_DISABLED", "Feed ao vivo desabilitado", 404, request_id=request_id)
+        return jsonify({**payload, 'success': False}), status
+    subscriber = LIVE_FEED.subscribe()
+    if subscriber is None:
+        incr_metric("data_stream_rejected")
+        payload, status = error_response("SSE_FULL", "Limite de conexões ao vivo atingido", 503, request_id=request_id)
+        response = jsonify({**payload, 'success': False})
+        response.status_code = status
+        response.headers['Retry-After'] = str(int(SSE_POLL_SECONDS))
+        return response
+    incr_metric("data_stream_opened")
+    log_event(logging.INFO, "data_stream_open", request_id=request_id, clients=LIVE_FEED.stats()["clients"])
+
+    def generate():
+        # Stream com vida limitada: não prende uma thread do worker para sempre; o EventSource reconecta
+        deadline = time.time() + SSE_STREAM_MAX_SECONDS
+        try:
+            yield "retry: 3000\n\n"
+            yield sse_event("snapshot", {"rows": LIVE_FEED.snapshot()})
+            while time.time() < deadline and LIVE_FEED.is_subscribed(subscriber):
+                try:
+                    event = subscriber.get(timeout=min(SSE_KEEPALIVE_SECONDS, max(0.1, deadline - time.time())))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event("rows", event)
+        except Exception as e:
+            log_event(logging.ERROR, "data_stream_exception", request_id=request_id, error=str(e))
+        finally:
+            LIVE_FEED.unsubscribe(subscriber)
+            log_event(logging.INFO, "data_stream_close", request_id=request_id)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/diagnostics')
 @login_required
 def diagnostics():
     try:
         request_id = new_request_id()
+        trace_id = request.args.get('trace')
+        if trace_id:
+            trace = TRACE_STORE.get(trace_id)
+            if trace is None:
+                payload, status = error_response("TRACE_NOT_FOUND", "Trace não encontrado (ou já descartado)", 404, request_id=request_id)
+                return jsonify(payload), status
+            return jsonify({"success": True, "request_id": request_id, "trace": trace.to_dict()})
         payload = {
             "success": True,
             "request_id": request_id,
             "app_version": APP_VERSION,
             "is_production": IS_PRODUCTION,
-            "metrics": METRICS,
-            "last_error": scraper.last_error,
+            "metrics": dict(METRICS),
+            "last_error": SCRAPE_ERRORS.latest(),
+            "scrape_errors": SCRAPE_ERRORS.recent(),
+            "http_pool": HTTP_CLIENT.stats(),
+            "result_cache": RESULT_CACHE.stats(),
+            "resolve_cache": RESOLVE_CACHE.stats(),
+            "rate_limiter": RATE_LIMITER.stats(),
+            "save_spool": SAVE_SPOOL.stats(),
+            "data_cache": DATA_CACHE.stats(),
+            "live_feed": LIVE_FEED.stats(),
+            "product_mirror": PRODUCT_MIRROR.stats(),
+            "latency": METRICS_REGISTRY.summary("freeisland_stage_duration_seconds"),
+            "traces": TRACE_STORE.recent(20),
+            "logging": logging_stats(),
+            "selector_stats": SELECTOR_STATS.stats(),
+            "hedge": hedge_stats(),
+            "driver_pool": scraper.driver_pool.stats(),
+            "startup": startup_report(),
             "events": list(EVENT_BUFFER)[-80:]
         }
         return jsonify(payload)
@@ -1782,54 +5752,198 @@ def diagnostics():
         return jsonify(payload), status
 
 
+EXPORT_FIELDS = ["mensagem", "imagem_url", "enviado", "criado_em"]
+
+
+def parse_export_args(args):
+    """Filtros das exportações: since/until (ISO 8601), enviado (true/false), limit (opcional, sem teto)"""
+    filters = {"since": None, "until": None, "enviado": None, "limit": None}
+    for key in ("since", "until"):
+        value = (args.get(key) or '').strip()
+        if value:
+            try:
+                datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError(f"'{key}' deve ser uma data ISO 8601")
+            filters[key] = value
+    enviado = (args.get('enviado') or '').strip().lower()
+    if enviado:
+        if enviado not in ('true', 'false', '1', '0'):
+            raise ValueError("'enviado' deve ser true ou false")
+        filters["enviado"] = enviado in ('true', '1')
+    limit = (args.get('limit') or '').strip()
+    if limit:
+        try:
+            filters["limit"] = max(1, int(limit))
+        except ValueError:
+            raise ValueError("'limit' deve ser um inteiro")
+    return filters
+
+
+def export_response(request_id, kind, chunks, mimetype, extension):
+    """Resposta streamada da exportação; ?gzip=1 comprime incrementalmente (.gz)"""
+    gzip_enabled = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = f"freeisland_export_{APP_VERSION}.{extension}"
+    started = time.perf_counter()
+
+    def body():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip_enabled else None
+        sent = 0
+        try:
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                sent += len(data)
+                if compressor:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+            if compressor:
+                yield compressor.flush()
+            log_event(logging.INFO, "export_done", request_id=request_id, kind=kind, gzip=gzip_enabled,
+                      bytes=sent, duration_ms=round((time.perf_counter() - started) * 1000, 1))
+        except Exception as e:
+            # Cabeçalhos já foram enviados: só resta registrar e encerrar o corpo truncado
+            incr_metric("export_fail")
+            log_event(logging.ERROR, "export_exception", request_id=request_id, kind=kind, error=str(e))
+
+    resp = app.response_class(response=body(), status=200, mimetype='application/gzip' if gzip_enabled else mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}.gz"' if gzip_enabled else f'attachment; filename="{filename}"'
+    resp.headers['X-Request-Id'] = request_id
+    return resp
+
+
+def open_export(request_id):
+    """Valida filtros e busca a primeira linha antes do stream, para erros ainda virarem status HTTP"""
+    filters = parse_export_args(request.args)
+    rows = scraper.iter_supabase_products(page_size=EXPORT_PAGE_SIZE, **filters)
+    first = next(rows, None)
+    incr_metric("export_ok")
+    log_event(logging.INFO, "export_start", request_id=request_id, **{k: v for k, v in filters.items() if v is not None})
+    return rows if first is None else itertools.chain([first], rows)
+
+
+def export_truncated(request_id, kind, e, count):
+    """Falha no meio do stream (status 200 já enviado): registra e devolve o erro para o trailer"""
+    incr_metric("export_fail")
+    incr_metric("export_truncated")
+    log_event(logging.ERROR, "export_truncated", request_id=request_id, kind=kind, rows=count, error=str(e))
+    return {"error_code": "EXPORT_TRUNCATED", "error": str(e), "rows_sent": count}
+
+
+def export_error(request_id, e):
+    if isinstance(e, ValueError):
+        payload, status = error_response("EXPORT_INVALID", str(e), 400, request_id=request_id)
+    else:
+        incr_metric("export_fail")
+        log_event(logging.ERROR, "export_exception", request_id=request_id, error=str(e))
+        payload, status = error_response("EXPORT_FAILED", str(e), 502, request_id=request_id)
+    return jsonify({**payload, 'success': False}), status
+
+
 @app.route('/export.json')
 @login_required
 def export_json():
     request_id = new_request_id()
-    limit = request.args.get('limit', '200')
     try:
-        limit_int = max(1, min(int(limit), 1000))
-    except Exception:
-        limit_int = 200
-    rows = scraper.fetch_supabase_products(limit=limit_int)
-    return jsonify({
-        "success": True,
-        "request_id": request_id,
-        "rows": rows,
-        "count": len(rows)
-    })
+        rows = open_export(request_id)
+    except Exception as e:
+        return export_error(request_id, e)
+
+    def chunks():
+        # success vai no fim: só lá se sabe se o Supabase entregou todas as páginas
+        yield f'{{"request_id": {json.dumps(request_id)}, "rows": ['
+        count = 0
+        try:
+            for row in rows:
+                yield (", " if count else "") + json.dumps(row, ensure_ascii=False)
+                count += 1
+        except Exception as e:
+            error = export_truncated(request_id, "json", e, count)
+            yield f'], "count": {count}, "success": false, "error": {json.dumps(error, ensure_ascii=False)}}}'
+            return
+        yield f'], "count": {count}, "success": true}}'
+
+    return export_response(request_id, "json", chunks(), 'application/json', 'json')
 
 
 @app.route('/export.csv')
 @login_required
 def export_csv():
     request_id = new_request_id()
-    limit = request.args.get('limit', '200')
     try:
-        limit_int = max(1, min(int(limit), 1000))
-    except Exception:
-        limit_int = 200
-    rows = scraper.fetch_supabase_products(limit=limit_int)
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=["mensagem", "imagem_url", "enviado", "criado_em"], extrasaction='ignore')
-    writer.writeheader()
-    for r in rows or []:
-        writer.writerow(r)
-    csv_text = output.getvalue()
-    resp = app.response_class(
-        response=csv_text,
-        status=200,
-        mimetype='text/csv'
-    )
-    resp.headers['Content-Disposition'] = f'attachment; filename="freeisland_export_{APP_VERSION}.csv"'
-    resp.headers['X-Request-Id'] = request_id
-    return resp
+        rows = open_export(request_id)
+    except Exception as e:
+        return export_error(request_id, e)
+
+    def chunks():
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        count = 0
+        try:
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+                if count % EXPORT_PAGE_SIZE == 0:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate()
+        except Exception as e:
+            # Última linha '#error,...': quem importa o CSV distingue um arquivo truncado de um completo
+            error = export_truncated(request_id, "csv", e, count)
+            csv.writer(output).writerow(['#error', error["error_code"], error["error"]])
+        yield output.getvalue()
+
+    return export_response(request_id, "csv", chunks(), 'text/csv', 'csv')
+
+def hedge_stats():
+    fired = METRICS.get("hedge_fired", 0)
+    return {
+        "enabled": HEDGE_ENABLED,
+        "delay_seconds": HEDGE_DELAY_SECONDS,
+        "fired": fired,
+        "skipped": METRICS.get("hedge_skipped", 0),
+        "requests_win_rate": round(METRICS.get("hedge_win_requests", 0) / fired, 3) if fired else None,
+        "selenium_win_rate": round(METRICS.get("hedge_win_selenium", 0) / fired, 3) if fired else None,
+        "no_complete_rate": round(METRICS.get("hedge_no_complete", 0) / fired, 3) if fired else None,
+    }
+
+
+def startup_report():
+    """Relatório de orçamento de startup no estilo python -X importtime"""
+    total_ms = BOOT_PHASES.get("ready") or max(BOOT_PHASES.values() or [0])
+    phases = []
+    previous = 0.0
+    for name, at_ms in BOOT_PHASES.items():
+        phases.append({"phase": name, "at_ms": at_ms, "self_ms": round(at_ms - previous, 1)})
+        previous = at_ms
+    lazy_modules = []
+    for lazy in LazyImport.registry:
+        if any(m["module"] == lazy.module for m in lazy_modules):
+            continue
+        timing = LAZY_IMPORT_TIMINGS.get(lazy.module)
+        lazy_modules.append({"module": lazy.module, "loaded": timing is not None, **(timing or {})})
+    lazy_modules.sort(key=lambda m: m.get("import_ms") or 0, reverse=True)
+    return {
+        "mode": STARTUP_MODE,
+        "boot_total_ms": total_ms,
+        "budget_ms": STARTUP_BUDGET_MS,
+        "within_budget": total_ms <= STARTUP_BUDGET_MS,
+        "phases": phases,
+        "lazy_imports": lazy_modules,
+    }
+
 
 @app.route('/logout')
 def logout():
     session.clear()
     return redirect(url_for('login_page'))
 
+mark_boot_phase("ready")
+log_event(logging.INFO, "startup_ready", mode=STARTUP_MODE, boot_ms=BOOT_PHASES["ready"], budget_ms=STARTUP_BUDGET_MS)
+if BOOT_PHASES["ready"] > STARTUP_BUDGET_MS:
+    log_event(logging.WARNING, "startup_over_budget", boot_ms=BOOT_PHASES["ready"], budget_ms=STARTUP_BUDGET_MS, phases=dict(BOOT_PHASES))
+
 if __name__ == '__main__':
     try:
         app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,262 @@
+"""Benchmark offline do scraping (requests) e da normalização de preços.
+
+As páginas de benchmarks/fixtures são servidas por um servidor HTTP local; nada sai
+para a rede (a resolução de links é pré-carregada no cache). Para cada benchmark mede
+throughput, latência p50/p95 e pico de memória (tracemalloc, numa passada à parte), e
+compara o resultado com benchmarks/expected.json.
+
+Uso:
+    python benchmarks/run.py                  # roda e compara com expected.json
+    python benchmarks/run.py --iterations 50
+    python benchmarks/run.py --only amazon    # só benchmarks cujo nome contém "amazon"
+    python benchmarks/run.py --json           # saída em JSON (para comparar entre commits)
+    python benchmarks/run.py --record         # regrava expected.json com o resultado atual
+
+Sai com status 1 se algum resultado divergir do expected.json.
+"""
+import argparse
+import http.server
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+EXPECTED_PATH = os.path.join(BENCH_DIR, 'expected.json')
+RESULT_FIELDS = ('title', 'price', 'price_value', 'image_url', 'extraction_stage')
+
+PRICE_INPUTS = [
+    'R$ 199,90',
+    'R$ 1.349,00',
+    'R$ 1.049,9',
+    '39999',
+    '1299',
+    'R$\n2.499\n,\n90',
+    '12.345,67',
+    '899.99',
+    'R$ 0,99',
+    'preço indisponível',
+]
+AMAZON_URLS = [
+    'https://www.amazon.com.br/Fone-Ouvido-Bluetooth/dp/B0C1234567/ref=sr_1_1?keywords=fone&qid=1700000000&sr=8-1',
+    'https://www.amazon.com.br/dp/B0C1234567?th=1&psc=1&tag=afiliado-20',
+    'https://www.amazon.com.br/gp/product/B0C7654321/?pf_rd_r=XYZ&linkCode=ll1',
+    'https://www.amazon.com.br/s?k=cafeteira&ref=nb_sb_noss',
+    'https://amzn.to/3abcDEF',
+]
+
+
+def prepare_environment(workdir):
+    # Estado em disco isolado, sem Selenium no boot, sem spool/rate limit e ordem de seletores fixa
+    os.environ.update({
+        'STARTUP_MODE': 'lazy',
+        'SAVE_SPOOL_ENABLED': 'false',
+        'RATE_LIMIT_ENABLED': 'false',
+        'HEDGE_ENABLED': 'false',
+        'ADAPTIVE_SELECTOR_ORDER': 'false',
+        'RESOLVE_CACHE_PATH': os.path.join(workdir, 'resolve_cache.sqlite3'),
+        'SELECTOR_STATS_PATH': os.path.join(workdir, 'selector_stats.sqlite3'),
+        'SAVE_SPOOL_PATH': os.path.join(workdir, 'save_spool.sqlite3'),
+        'PRODUCT_MIRROR_PATH': os.path.join(workdir, 'product_mirror.sqlite3'),
+        'LOG_FILE_PATH': os.path.join(workdir, 'freeisland.log'),
+    })
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    """Serve /<site>/<nome> a partir de fixtures/<site>/<nome>.html"""
+
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em writes separados: sem isso o delayed ACK soma ~40 ms por página
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = os.path.normpath(self.path.split('?')[0].strip('/'))
+        file_path = os.path.join(FIXTURES_DIR, path + '.html')
+        if path.startswith('..') or not os.path.isfile(file_path):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, name='fixture-server', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name + '.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def build_benchmarks(app, base_url):
+    scraper = app.scraper
+
+    def scrape(site, name):
+        url = f'{base_url}/{site}/{name}'
+        # Resolução pré-carregada: o benchmark não depende de rede nem de redirects reais
+        app.RESOLVE_CACHE.set(url, site, url, ok=True)
+        scrape_fn = scraper.scrape_amazon_requests if site == 'amazon' else scraper.scrape_mercadolivre_requests
+
+        def run():
+            with scraper.scrape_context(url) as context:
+                data = scrape_fn(url)
+            if not data:
+                return {'error_code': (context.last_error or {}).get('error_code')}
+            return {k: data.get(k) for k in RESULT_FIELDS if data.get(k) is not None}
+        return run
+
+    social_html = read_fixture('mercadolivre/social')
+
+    def social_card():
+        data = scraper.extract_mercadolivre_social_card(social_html, 'https://www.mercadolivre.com.br/social/loja', 'https://meli.la/abc')
+        return {k: data.get(k) for k in RESULT_FIELDS if data.get(k) is not None} if data else None
+
+    def clean_prices():
+        return [list(scraper.clean_price(text)) for text in PRICE_INPUTS]
+
+    def canonicalize_urls():
+        return [scraper.canonicalize_amazon_url(url) for url in AMAZON_URLS]
+
+    benchmarks = [
+        ('scrape_amazon_requests/product', scrape('amazon', 'product'), 1),
+        ('scrape_amazon_requests/product_dom', scrape('amazon', 'product_dom'), 1),
+        ('scrape_amazon_requests/variant', scrape('amazon', 'variant'), 1),
+        ('scrape_amazon_requests/captcha', scrape('amazon', 'captcha'), 1),
+        ('scrape_amazon_requests/conflicting_offer', scrape('amazon', 'conflicting_offer'), 1),
+        ('scrape_amazon_requests/price_integer', scrape('amazon', 'price_integer'), 1),
+        ('scrape_amazon_requests/price_high', scrape('amazon', 'price_high'), 1),
+        ('scrape_amazon_requests/price_meta', scrape('amazon', 'price_meta'), 1),
+        ('scrape_mercadolivre_requests/product', scrape('mercadolivre', 'product'), 1),
+        ('scrape_mercadolivre_requests/product_dom', scrape('mercadolivre', 'product_dom'), 1),
+        ('scrape_mercadolivre_requests/social', scrape('mercadolivre', 'social'), 1),
+        ('scrape_mercadolivre_requests/captcha', scrape('mercadolivre', 'captcha'), 1),
+        ('scrape_mercadolivre_requests/conflicting_offer', scrape('mercadolivre', 'conflicting_offer'), 1),
+        ('extract_mercadolivre_social_card', social_card, 1),
+        ('clean_price', clean_prices, len(PRICE_INPUTS)),
+        ('canonicalize_amazon_url', canonicalize_urls, len(AMAZON_URLS)),
+    ]
+    return benchmarks
+
+
+def run_benchmark(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    result = None
+    for i in range(iterations):
+        start = time.perf_counter()
+        output = fn()
+        latencies.append(time.perf_counter() - start)
+        if i == 0:
+            result = output
+    # Pico de memória numa passada separada: o tracemalloc distorce o tempo
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, latencies, peak
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', default='')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--record', action='store_true')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='freeisland-bench-')
+    prepare_environment(workdir)
+    import app
+    # Captchas das fixtures geram WARNINGs esperados; só erros reais aparecem
+    logging.getLogger().setLevel(logging.ERROR)
+
+    server, base_url = start_fixture_server()
+    expected = {}
+    if os.path.exists(EXPECTED_PATH):
+        with open(EXPECTED_PATH, encoding='utf-8') as f:
+            expected = json.load(f)
+
+    rows = []
+    recorded = {}
+    failures = 0
+    for name, fn, items in build_benchmarks(app, base_url):
+        if args.only and args.only not in name:
+            continue
+        result, latencies, peak = run_benchmark(fn, max(1, args.iterations), max(0, args.warmup))
+        # Normaliza tuplas/None como o JSON gravado
+        result = json.loads(json.dumps(result, ensure_ascii=False).replace(base_url, 'BASE'))
+        recorded[name] = result
+        if args.record:
+            status = 'recorded'
+        elif name not in expected:
+            status = 'no-expected'
+        elif expected[name] == result:
+            status = 'ok'
+        else:
+            status = 'DIVERGED'
+            failures += 1
+        total = sum(latencies)
+        rows.append({
+            'name': name,
+            'iterations': len(latencies),
+            'ops_per_s': round(len(latencies) * items / total, 1) if total else None,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'peak_kib': round(peak / 1024, 1),
+            'status': status,
+            **({'expected': expected.get(name), 'got': result} if status == 'DIVERGED' else {}),
+        })
+    server.shutdown()
+
+    if args.record:
+        # Com --only, os benchmarks que não rodaram mantêm o valor gravado
+        with open(EXPECTED_PATH, 'w', encoding='utf-8') as f:
+            json.dump({**expected, **recorded}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'benchmark':<48} {'iters':>5} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>9}  status")
+        for row in rows:
+            print(f"{row['name']:<48} {row['iterations']:>5} {row['ops_per_s']:>10} {row['p50_ms']:>9} "
+                  f"{row['p95_ms']:>9} {row['peak_kib']:>9}  {row['status']}")
+            if row['status'] == 'DIVERGED':
+                print(f"    esperado: {json.dumps(row['expected'], ensure_ascii=False)}")
+                print(f"    obtido:   {json.dumps(row['got'], ensure_ascii=False)}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
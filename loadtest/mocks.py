@@ -0,0 +1,316 @@
+"""Dublês locais de Amazon, Mercado Livre e Supabase para o teste de carga.
+
+Um único servidor HTTP faz dois papéis:
+- proxy HTTP (HTTP_PROXY do app): requisições com URI absoluta para amzn.to, meli.la,
+  amazon.com.br e mercadolivre.com.br recebem as páginas de benchmarks/fixtures, com
+  redirects dos links curtos, latência configurável, uma fração de respostas lentas e
+  uma fração de páginas de captcha. CONNECT (HTTPS) é recusado na hora, então nada sai
+  para a rede;
+- Supabase (SUPABASE_URL do app): /rest/v1/produtos em memória, com o subconjunto do
+  PostgREST que o app usa (select, order, limit, offset, and=(...) e filtros col=op.valor).
+
+Uso isolado (o loadtest/run.py sobe este módulo num processo separado):
+    python loadtest/mocks.py --port 8765 --latency-ms 100 --captcha-ratio 0.05
+"""
+import argparse
+import http.server
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+AMAZON_SHORT_RE = re.compile(r'^/lt(\d+)$')
+AMAZON_PRODUCT_RE = re.compile(r'^/(?:[^/]+/)?dp/B0(\d{8})$')
+MERCADOLIVRE_SHORT_RE = re.compile(r'^/lt(\d+)$')
+MERCADOLIVRE_PRODUCT_RE = re.compile(r'^/MLB-(\d+)-')
+
+
+def amazon_product_url(n):
+    return f'http://www.amazon.com.br/dp/B0{n:08d}'
+
+
+def amazon_short_url(n):
+    return f'http://amzn.to/lt{n}'
+
+
+def mercadolivre_product_url(n):
+    return f'http://produto.mercadolivre.com.br/MLB-{n}-produto-teste-_JM'
+
+
+def mercadolivre_short_url(n):
+    return f'http://meli.la/lt{n}'
+
+
+def load_fixture(site, name):
+    with open(os.path.join(FIXTURES_DIR, site, name + '.html'), 'rb') as f:
+        return f.read()
+
+
+class ProductStore:
+    """Tabela produtos em memória com o subconjunto do PostgREST usado pelo app"""
+
+    OPERATORS = {
+        'eq': lambda a, b: a == b,
+        'gt': lambda a, b: a is not None and a > b,
+        'gte': lambda a, b: a is not None and a >= b,
+        'lt': lambda a, b: a is not None and a < b,
+        'lte': lambda a, b: a is not None and a <= b,
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []
+        self.next_id = 1
+
+    def insert(self, rows, on_conflict=None):
+        """Com on_conflict, linhas com valor já existente nessa coluna são ignoradas
+        (Prefer: resolution=ignore-duplicates)"""
+        now = datetime.now().isoformat()
+        inserted = 0
+        with self.lock:
+            seen = {row.get(on_conflict) for row in self.rows} if on_conflict else set()
+            for row in rows:
+                if on_conflict and row.get(on_conflict) is not None:
+                    if row[on_conflict] in seen:
+                        continue
+                    seen.add(row[on_conflict])
+                row = dict(row)
+                row.setdefault('criado_em', now)
+                row['id'] = self.next_id
+                self.next_id += 1
+                self.rows.append(row)
+                inserted += 1
+        return inserted
+
+    def parse_condition(self, condition):
+        column, _, rest = condition.partition('.')
+        op, _, value = rest.partition('.')
+        if op == 'is':
+            expected = {'true': True, 'false': False, 'null': None}.get(value, value)
+            return lambda row: row.get(column) is expected
+        compare = self.OPERATORS.get(op)
+        if compare is None:
+            raise ValueError(f'operador não suportado: {op}')
+        if re.fullmatch(r'-?\d+', value):
+            # Colunas numéricas (id): compara como número, como o Postgres
+            value = int(value)
+        return lambda row: compare(row.get(column), value)
+
+    def select(self, params):
+        conditions = []
+        order = None
+        limit = None
+        offset = 0
+        columns = None
+        for key, value in params:
+            if key == 'select':
+                columns = [c.strip() for c in value.split(',') if c.strip() and c.strip() != '*'] or None
+            elif key == 'order':
+                order = value
+            elif key == 'limit':
+                limit = int(value)
+            elif key == 'offset':
+                offset = int(value)
+            elif key == 'and':
+                for condition in value.strip('()').split(','):
+                    conditions.append(self.parse_condition(condition))
+            else:
+                conditions.append(self.parse_condition(f'{key}.{value}'))
+        with self.lock:
+            rows = [row for row in self.rows if all(check(row) for check in conditions)]
+        if order:
+            column, _, direction = order.partition('.')
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or ''), reverse=direction == 'desc')
+        rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        if columns:
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return rows
+
+    def __len__(self):
+        with self.lock:
+            return len(self.rows)
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    """Roteia por URI absoluta (proxy para os sites) ou caminho relativo (Supabase)"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_CONNECT(self):
+        # Sem TLS aqui: HTTPS (ex: warmup do Mercado Livre) falha rápido em vez de ir à rede
+        self.server.count('connect_refused')
+        self.send_body(403, b'', 'text/plain')
+        self.close_connection = True
+
+    def do_GET(self):
+        self.route()
+
+    def do_HEAD(self):
+        self.route()
+
+    def do_POST(self):
+        self.route()
+
+    def route(self):
+        if self.path.startswith('http://'):
+            parts = urlsplit(self.path)
+            host = parts.hostname or ''
+            if host.endswith('amzn.to') or 'amazon.com.br' in host:
+                return self.amazon(host, parts.path)
+            if host.endswith('meli.la') or 'mercadolivre.com.br' in host:
+                return self.mercadolivre(host, parts.path)
+            self.server.count('unknown_host')
+            return self.send_body(404, b'', 'text/plain')
+        parts = urlsplit(self.path)
+        if parts.path == '/rest/v1/produtos':
+            return self.supabase(parts.query)
+        if parts.path == '/stats':
+            return self.send_json(200, self.server.stats())
+        return self.send_body(404, b'', 'text/plain')
+
+    def amazon(self, host, path):
+        short = AMAZON_SHORT_RE.match(path) if host.endswith('amzn.to') else None
+        if short:
+            return self.redirect('amazon_redirect', amazon_product_url(int(short.group(1))))
+        if AMAZON_PRODUCT_RE.match(path):
+            return self.product_page('amazon')
+        return self.send_body(404, b'', 'text/plain')
+
+    def mercadolivre(self, host, path):
+        short = MERCADOLIVRE_SHORT_RE.match(path) if host.endswith('meli.la') else None
+        if short:
+            return self.redirect('mercadolivre_redirect', mercadolivre_product_url(int(short.group(1))))
+        if MERCADOLIVRE_PRODUCT_RE.match(path):
+            return self.product_page('mercadolivre')
+        if path in ('', '/'):
+            return self.send_body(200, b'<html><body>home</body></html>', 'text/html; charset=utf-8')
+        return self.send_body(404, b'', 'text/plain')
+
+    def redirect(self, counter, location):
+        self.server.count(counter)
+        time.sleep(self.server.options.redirect_ms / 1000)
+        self.send_response(301)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def product_page(self, site):
+        options = self.server.options
+        if self.command == 'HEAD':
+            # HEAD só aparece na resolução de links; não sorteia captcha nem lentidão
+            return self.send_body(200, self.server.pages[site]['product'], 'text/html; charset=utf-8')
+        delay = options.latency_ms
+        if random.random() < options.slow_ratio:
+            delay = options.slow_ms
+            self.server.count(f'{site}_slow')
+        time.sleep(delay / 1000)
+        if random.random() < options.captcha_ratio:
+            self.server.count(f'{site}_captcha')
+            return self.send_body(200, self.server.pages[site]['captcha'], 'text/html; charset=utf-8')
+        self.server.count(f'{site}_product')
+        self.send_body(200, self.server.pages[site]['product'], 'text/html; charset=utf-8')
+
+    def supabase(self, query):
+        if not self.headers.get('apikey'):
+            return self.send_json(401, {'message': 'No API key found in request'})
+        time.sleep(self.server.options.supabase_ms / 1000)
+        store = self.server.store
+        if self.command == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b'null')
+            except ValueError:
+                return self.send_json(400, {'message': 'invalid json'})
+            rows = payload if isinstance(payload, list) else [payload]
+            if not rows or not all(isinstance(row, dict) for row in rows):
+                return self.send_json(400, {'message': 'invalid rows'})
+            params = dict(parse_qsl(query))
+            on_conflict = params.get('on_conflict') if 'ignore-duplicates' in (self.headers.get('Prefer') or '') else None
+            if store.insert(rows, on_conflict=on_conflict) < len(rows):
+                self.server.count('supabase_duplicate_ignored')
+            self.server.count('supabase_insert')
+            if 'return=minimal' in (self.headers.get('Prefer') or ''):
+                return self.send_body(201, b'', 'application/json')
+            return self.send_json(201, rows)
+        try:
+            rows = store.select(parse_qsl(query, keep_blank_values=True))
+        except ValueError as e:
+            return self.send_json(400, {'message': str(e)})
+        self.server.count('supabase_select')
+        self.send_json(200, rows)
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD' and body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, options):
+        super().__init__(address, MockHandler)
+        self.options = options
+        self.store = ProductStore()
+        self.pages = {
+            site: {name: load_fixture(site, name) for name in ('product', 'captcha')}
+            for site in ('amazon', 'mercadolivre')
+        }
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+
+    def count(self, name):
+        with self.counters_lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def stats(self):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return {'requests': counters, 'rows': len(self.store)}
+
+
+def add_mock_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=100, help='latência das páginas de produto')
+    parser.add_argument('--slow-ratio', type=float, default=0.05, help='fração de páginas lentas')
+    parser.add_argument('--slow-ms', type=float, default=3000, help='latência das páginas lentas')
+    parser.add_argument('--captcha-ratio', type=float, default=0.05, help='fração de páginas de captcha')
+    parser.add_argument('--redirect-ms', type=float, default=20, help='latência dos redirects de links curtos')
+    parser.add_argument('--supabase-ms', type=float, default=30, help='latência do Supabase')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    server = MockServer((args.host, args.port), args)
+    # Primeira linha do stdout: o run.py lê a porta escolhida daqui
+    print(f'http://{args.host}:{server.server_address[1]}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""Teste de carga ponta a ponta do app sob gunicorn, contra dublês locais.
+
+Sobe loadtest/mocks.py (Amazon, Mercado Livre e Supabase) num processo separado e, para
+cada configuração de workers x threads, sobe o gunicorn com os mesmos argumentos do
+Procfile, apontando o app para os dublês (HTTP_PROXY/HTTPS_PROXY e SUPABASE_URL) em modo
+produção (RENDER=true: sem Selenium). Faz login em /auth, aquece os links (a resolução
+de links curtos fica no cache persistente) e então usuários virtuais disparam /scrape,
+/save e /data pela duração pedida. Reporta throughput, latência p50/p95/p99 e taxa de
+erro por endpoint e por configuração.
+
+Uso:
+    python loadtest/run.py                                # Procfile (1x8) e 2x4, 30 s cada
+    python loadtest/run.py --configs 1x8,2x4,4x2 --concurrency 32 --duration 60
+    python loadtest/run.py --mix scrape=6,save=2,data=2 --captcha-ratio 0.1
+    python loadtest/run.py --env SCRAPE_ENGINE=async --env RATE_LIMIT_ENABLED=true
+    python loadtest/run.py --json                         # saída em JSON
+
+Erro é qualquer resposta fora de 200/304 (inclui os 429 das páginas de captcha) ou falha
+de conexão; o JSON traz a contagem por status.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shlex
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(LOADTEST_DIR)
+sys.path.insert(0, LOADTEST_DIR)
+
+import mocks  # noqa: E402
+
+LOGIN_EMAIL = 'loadtest@example.com'
+LOGIN_PASSWORD = 'loadtest'
+ENDPOINTS = ('scrape', 'save', 'data')
+OK_STATUSES = (200, 304)
+
+
+def parse_configs(text):
+    configs = []
+    for item in text.split(','):
+        workers, _, threads = item.strip().lower().partition('x')
+        configs.append((int(workers), int(threads)))
+    return configs
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f'endpoint desconhecido no --mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def procfile_command():
+    with open(os.path.join(REPO_DIR, 'Procfile'), encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('web:'):
+                return shlex.split(line.split(':', 1)[1])
+    raise RuntimeError('Procfile sem processo web')
+
+
+def gunicorn_command(workers, threads, port):
+    # Argumentos do Procfile, trocando só workers/threads e o bind
+    args = procfile_command()
+    command = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+            continue
+        if arg in ('--workers', '-w', '--threads', '--bind', '-b'):
+            skip = True
+            continue
+        command.append(arg)
+    return command + ['--workers', str(workers), '--threads', str(threads), '--bind', f'127.0.0.1:{port}']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_mocks(args):
+    command = [
+        sys.executable, os.path.join(LOADTEST_DIR, 'mocks.py'),
+        '--latency-ms', str(args.latency_ms),
+        '--slow-ratio', str(args.slow_ratio),
+        '--slow-ms', str(args.slow_ms),
+        '--captcha-ratio', str(args.captcha_ratio),
+        '--redirect-ms', str(args.redirect_ms),
+        '--supabase-ms', str(args.supabase_ms),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError('mocks.py não subiu')
+    return process, url
+
+
+def app_environment(mock_url, workdir, overrides):
+    env = dict(os.environ)
+    env.update({
+        'RENDER': 'true',
+        'FLASK_SECRET_KEY': 'loadtest-secret',
+        'LOGIN_EMAIL': LOGIN_EMAIL,
+        'LOGIN_PASSWORD': LOGIN_PASSWORD,
+        'SUPABASE_URL': mock_url,
+        'SUPABASE_SERVICE_KEY': 'loadtest-service-key',
+        'HTTP_PROXY': mock_url,
+        'HTTPS_PROXY': mock_url,
+        'http_proxy': mock_url,
+        'https_proxy': mock_url,
+        'NO_PROXY': '127.0.0.1,localhost',
+        'no_proxy': '127.0.0.1,localhost',
+        'STARTUP_MODE': 'lazy',
+        'RATE_LIMIT_ENABLED': 'false',
+        'RESOLVE_CACHE_PATH': os.path.join(workdir, 'resolve_cache.sqlite3'),
+        'SELECTOR_STATS_PATH': os.path.join(workdir, 'selector_stats.sqlite3'),
+        'SAVE_SPOOL_PATH': os.path.join(workdir, 'save_spool.sqlite3'),
+        'PRODUCT_MIRROR_PATH': os.path.join(workdir, 'product_mirror.sqlite3'),
+        'LOG_FILE_PATH': os.path.join(workdir, 'freeisland.log'),
+    })
+    env.update(overrides)
+    return env
+
+
+def start_app(workers, threads, env, workdir, timeout=60):
+    port = free_port()
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(
+        gunicorn_command(workers, threads, port), cwd=REPO_DIR, env=env,
+        stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn saiu com status {process.returncode}; veja {log.name}')
+        try:
+            if requests.get(f'{base_url}/login', timeout=2).status_code == 200:
+                return process, base_url, log
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_app(process, log)
+    raise RuntimeError(f'gunicorn não respondeu em {timeout}s; veja {log.name}')
+
+
+def stop_app(process, log):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    log.close()
+
+
+def login(base_url):
+    response = requests.post(
+        f'{base_url}/auth', data={'email': LOGIN_EMAIL, 'senha': LOGIN_PASSWORD},
+        allow_redirects=False, timeout=10
+    )
+    session_cookie = response.cookies.get('session')
+    if response.status_code != 302 or not session_cookie:
+        raise RuntimeError(f'login falhou (HTTP {response.status_code})')
+    # Cookie Secure em produção: o requests não o reenviaria por http, então vai no cabeçalho
+    return f'session={session_cookie}'
+
+
+def product_urls(count, short_ratio):
+    urls = []
+    for n in range(1, count + 1):
+        short = n <= count * short_ratio
+        urls.append(mocks.amazon_short_url(n) if short else mocks.amazon_product_url(n))
+        urls.append(mocks.mercadolivre_short_url(n) if short else mocks.mercadolivre_product_url(n))
+    return urls
+
+
+class VirtualUser:
+    """Sessão de um operador do dashboard: scrape, salva o último produto e relê /data com ETag"""
+
+    def __init__(self, base_url, cookie, urls, mix, timeout, force_refresh, seed):
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.http.trust_env = False
+        self.http.headers['Cookie'] = cookie
+        self.urls = urls
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.timeout = timeout
+        self.force_refresh = force_refresh
+        self.random = random.Random(seed)
+        self.last_scrape = None
+        self.etag = None
+
+    def scrape(self, url=None):
+        url = url or self.random.choice(self.urls)
+        response = self.http.post(
+            f'{self.base_url}/scrape', json={'url': url, 'force_refresh': self.force_refresh}, timeout=self.timeout
+        )
+        if response.status_code == 200:
+            self.last_scrape = response.json()
+        return response.status_code
+
+    def save(self):
+        if not self.last_scrape:
+            self.scrape()
+        scraped = self.last_scrape or {'product': {'title': 'Produto de carga', 'image_url': ''}, 'message': 'carga'}
+        response = self.http.post(
+            f'{self.base_url}/save', json={'product': scraped['product'], 'message': scraped['message']},
+            timeout=self.timeout
+        )
+        return response.status_code
+
+    def data(self):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        response = self.http.get(f'{self.base_url}/data', headers=headers, timeout=self.timeout)
+        if response.status_code == 200:
+            self.etag = response.headers.get('ETag')
+        return response.status_code
+
+    def run(self, deadline, samples):
+        while time.time() < deadline:
+            name = self.random.choices(self.names, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                status = getattr(self, name)()
+            except requests.RequestException as e:
+                status = type(e).__name__
+            samples.append((name, status, time.perf_counter() - start))
+
+
+def warm_up(base_url, cookie, urls, concurrency, timeout):
+    # Primeira passada por cada link: resolve (e grava no cache persistente) os links curtos
+    def scrape(url):
+        return VirtualUser(base_url, cookie, urls, {'scrape': 1}, timeout, True, 0).scrape(url)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(scrape, urls))
+
+
+def run_load(base_url, cookie, urls, args):
+    samples = []
+    deadline = time.time() + args.duration
+    users = [
+        VirtualUser(base_url, cookie, urls, args.mix, args.request_timeout, not args.allow_cache_hits, args.seed + i)
+        for i in range(args.concurrency)
+    ]
+    threads = [threading.Thread(target=user.run, args=(deadline, samples), daemon=True) for user in users]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.time() - start
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def summarize(samples, elapsed):
+    summary = {}
+    groups = [('all', samples)] + [(name, [s for s in samples if s[0] == name]) for name in ENDPOINTS]
+    for name, group in groups:
+        if not group:
+            continue
+        latencies = [s[2] for s in group]
+        statuses = {}
+        for _, status, _ in group:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(count for status, count in statuses.items() if status not in map(str, OK_STATUSES))
+        summary[name] = {
+            'requests': len(group),
+            'rps': round(len(group) / elapsed, 1) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'error_rate': round(errors / len(group), 4),
+            'statuses': statuses,
+        }
+    return summary
+
+
+def run_config(workers, threads, mock_url, urls, args):
+    workdir = tempfile.mkdtemp(prefix=f'freeisland-load-{workers}x{threads}-')
+    env = app_environment(mock_url, workdir, dict(args.env))
+    process, base_url, log = start_app(workers, threads, env, workdir)
+    try:
+        cookie = login(base_url)
+        warm_up(base_url, cookie, urls, args.concurrency, args.request_timeout)
+        samples, elapsed = run_load(base_url, cookie, urls, args)
+    finally:
+        stop_app(process, log)
+    return {
+        'config': f'{workers}x{threads}',
+        'workers': workers,
+        'threads': threads,
+        'elapsed_s': round(elapsed, 1),
+        'endpoints': summarize(samples, elapsed),
+        'workdir': workdir,
+    }
+
+
+def parse_env(text):
+    key, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError('use CHAVE=valor')
+    return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--configs', type=parse_configs, default=parse_configs('1x8,2x4'),
+                        help='workers x threads do gunicorn, separados por vírgula')
+    parser.add_argument('--concurrency', type=int, default=16, help='usuários virtuais simultâneos')
+    parser.add_argument('--duration', type=float, default=30, help='segundos de carga por configuração')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('scrape=6,save=2,data=2'))
+    parser.add_argument('--products', type=int, default=20, help='produtos distintos por site')
+    parser.add_argument('--short-ratio', type=float, default=0.5, help='fração dos links que são curtos (redirect)')
+    parser.add_argument('--allow-cache-hits', action='store_true', help='não manda force_refresh no /scrape')
+    parser.add_argument('--request-timeout', type=float, default=130)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--env', type=parse_env, action='append', default=[], help='CHAVE=valor extra para o app')
+    parser.add_argument('--json', action='store_true')
+    mocks.add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock_process, mock_url = start_mocks(args)
+    urls = product_urls(max(1, args.products), args.short_ratio)
+    results = []
+    try:
+        for workers, threads in args.configs:
+            results.append(run_config(workers, threads, mock_url, urls, args))
+        upstream = requests.get(f'{mock_url}/stats', timeout=5).json()
+    finally:
+        mock_process.terminate()
+        mock_process.wait()
+
+    if args.json:
+        print(json.dumps({'results': results, 'upstream': upstream}, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'config':<7} {'endpoint':<8} {'reqs':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err %':>7}")
+    for result, name in itertools.product(results, ('all',) + ENDPOINTS):
+        row = result['endpoints'].get(name)
+        if row:
+            print(f"{result['config']:<7} {name:<8} {row['requests']:>6} {row['rps']:>8} {row['p50_ms']:>9} "
+                  f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['error_rate'] * 100:>7.2f}")
+    print(f"upstream: {json.dumps(upstream, ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+"""Configuração comum dos testes: o app é importado com bancos e log isolados num diretório temporário"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATA_DIR = tempfile.mkdtemp(prefix='freeisland-tests-')
+
+os.environ.setdefault('STARTUP_MODE', 'lazy')
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+for name, filename in (
+    ('RESOLVE_CACHE_PATH', 'resolve_cache.sqlite3'),
+    ('SELECTOR_STATS_PATH', 'selector_stats.sqlite3'),
+    ('SAVE_SPOOL_PATH', 'save_spool.sqlite3'),
+    ('PRODUCT_MIRROR_PATH', 'product_mirror.sqlite3'),
+    ('LOG_FILE_PATH', 'freeisland.log'),
+):
+    os.environ[name] = os.path.join(TEST_DATA_DIR, filename)
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+import app
+
+COMPLETE = {'title': 'Produto', 'price': 'R$ 10,00', 'image_url': 'https://img/x.jpg', 'url': 'u'}
+
+
+@pytest.fixture
+def hedge(monkeypatch):
+    monkeypatch.setattr(app, 'HEDGE_DELAY_SECONDS', 0.05)
+    monkeypatch.setattr(app, 'HEDGE_TIMEOUT_SECONDS', 5)
+    return app.scraper
+
+
+def test_losing_requests_leg_is_cancelled_and_does_not_leak_its_error(hedge, monkeypatch):
+    observed = {}
+    finished = threading.Event()
+
+    def slow_requests(url):
+        # Espera o cancelamento como faria request_with_retries entre tentativas
+        deadline = time.time() + 2
+        while not app.scrape_cancelled() and time.time() < deadline:
+            time.sleep(0.01)
+        observed['cancelled'] = app.scrape_cancelled()
+        hedge.set_last_error('HTTP_ERROR', 'perdedor')
+        finished.set()
+        return None
+
+    def selenium(site, url):
+        observed['selenium_context'] = app.CURRENT_SCRAPE.get()
+        return dict(COMPLETE)
+
+    monkeypatch.setattr(hedge, 'scrape_amazon_requests', slow_requests)
+    monkeypatch.setattr(hedge, 'hedge_selenium_attempt', selenium)
+
+    with hedge.scrape_context('u') as parent:
+        result = hedge.hedged_scrape('amazon', 'u')
+        assert finished.wait(2)
+        assert result == COMPLETE
+        assert observed['cancelled'] is True
+        assert observed['selenium_context'] is not parent
+        assert parent.last_error is None
+
+
+def test_winner_error_is_merged_back_when_no_leg_completes(hedge, monkeypatch):
+    def failing_requests(url):
+        time.sleep(0.1)
+        hedge.set_last_error('CAPTCHA', 'bloqueado')
+        return None
+
+    def selenium(site, url):
+        hedge.set_last_error('WEBDRIVER_UNAVAILABLE', 'sem driver')
+        return None
+
+    monkeypatch.setattr(hedge, 'scrape_amazon_requests', failing_requests)
+    monkeypatch.setattr(hedge, 'hedge_selenium_attempt', selenium)
+
+    with hedge.scrape_context('u') as parent:
+        result = hedge.hedged_scrape('amazon', 'u')
+        assert parent.last_error['error_code'] == 'CAPTCHA'
+        assert result['error_code'] == 'CAPTCHA'
+
+
+def test_request_with_retries_stops_when_leg_is_cancelled():
+    context = app.ScrapeContext(url='u').child(threading.Event())
+    context.cancel.set()
+    with pytest.raises(app.ScrapeCancelled):
+        app.run_in_scrape_context(context, app.request_with_retries, 'GET', 'http://127.0.0.1:9/')
+
+
+def test_executor_has_two_slots_per_request_thread():
+    assert app.HEDGE_EXECUTOR._max_workers >= 2 * app.REQUEST_THREADS
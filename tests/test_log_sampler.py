@@ -0,0 +1,43 @@
+import logging
+
+import app
+
+
+def make_record(msg, *args, name='werkzeug', level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_preformatted_messages_share_a_bounded_key():
+    sampler = app.LogSampler({}, 10, 'app')
+    for i in range(50):
+        sampler.filter(make_record(f'GET https://www.amazon.com.br/dp/B0{i:08d}'))
+
+    assert list(sampler.windows) == ['werkzeug:INFO']
+    assert sampler.rate_limited == {'werkzeug:INFO': 40}
+
+
+def test_template_and_event_keys():
+    sampler = app.LogSampler({}, 10, 'app')
+    assert sampler.key(make_record('Acessando Amazon: %s -> %s', 'a', 'b')) == 'Acessando Amazon: %s -> %s'
+    assert sampler.key(make_record('x', name='app.price')) == 'price'
+    assert sampler.key(make_record(app.JsonLogMessage({'message': 'scrape_done'}), name='app')) == 'scrape_done'
+
+
+def test_old_minute_windows_are_evicted(monkeypatch):
+    now = [600.0]
+    monkeypatch.setattr(app.time, 'time', lambda: now[0])
+    sampler = app.LogSampler({}, 1, 'app')
+    assert sampler.filter(make_record('a %s', 1))
+    assert not sampler.filter(make_record('a %s', 2))
+
+    now[0] += 60
+    assert sampler.filter(make_record('b %s', 1))
+    assert list(sampler.windows) == ['b %s']
+    assert sampler.filter(make_record('a %s', 3))
+
+
+def test_sampling_and_warnings():
+    sampler = app.LogSampler({'price': 0.0}, 0, 'app')
+    assert not sampler.filter(make_record('x', name='app.price'))
+    assert sampler.filter(make_record('x', name='app.price', level=logging.WARNING))
+    assert sampler.sampled_out == {'price': 1}
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+import app
+from conftest import TEST_DATA_DIR
+
+
+class FakeProducts:
+    """Tabela produtos em memória com os dois fetchers que o espelho usa"""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+
+    def insert(self, mensagem, enviado=False):
+        row = {'id': self.next_id, 'mensagem': mensagem, 'imagem_url': '', 'enviado': enviado,
+               'criado_em': f'2026-01-01T00:00:{self.next_id:02d}'}
+        self.rows[row['id']] = row
+        self.next_id += 1
+        return row
+
+    def fetch_after(self, after_id):
+        return [dict(row) for row_id, row in sorted(self.rows.items()) if after_id is None or row_id > after_id]
+
+    def fetch_recent(self, limit):
+        return [dict(row) for _, row in sorted(self.rows.items(), reverse=True)[:limit]]
+
+
+@pytest.fixture
+def table():
+    return FakeProducts()
+
+
+@pytest.fixture
+def mirror(request, table):
+    path = os.path.join(TEST_DATA_DIR, f'mirror-{request.node.name}.sqlite3')
+    mirror = app.ProductMirror(path, table.fetch_after, table.fetch_recent, sync_interval=0, refresh_rows=1)
+    yield mirror
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def test_rows_are_keyed_by_primary_key(table, mirror):
+    # Mesmo criado_em em duas linhas: as duas precisam existir no espelho
+    first = table.insert('a')
+    second = table.insert('b')
+    second['criado_em'] = first['criado_em']
+    mirror.sync(force=True)
+
+    result = mirror.changes()
+    assert [row['id'] for row in result['rows']] == [1, 2]
+    assert result['reset'] is False
+
+
+def test_changes_only_returns_what_changed_after_the_cursor(table, mirror):
+    table.insert('a')
+    table.insert('b')
+    mirror.sync(force=True)
+    cursor = mirror.changes()['cursor']
+
+    assert mirror.sync() == 0
+    assert mirror.changes(cursor)['rows'] == []
+
+    table.insert('c')
+    mirror.sync()
+    result = mirror.changes(cursor)
+    assert [row['mensagem'] for row in result['rows']] == ['c']
+    assert mirror.changes(result['cursor'])['rows'] == []
+
+
+def test_reconcile_detects_old_updates_and_deletes(table, mirror):
+    for message in ('a', 'b', 'c'):
+        table.insert(message)
+    mirror.sync(force=True)
+    cursor = mirror.changes()['cursor']
+
+    # Fora da janela refresh_rows=1: só a varredura completa enxerga
+    table.rows[1]['enviado'] = True
+    del table.rows[2]
+    mirror.sync()
+    assert mirror.changes(cursor)['rows'] == []
+
+    mirror.sync(force=True)
+    rows = mirror.changes(cursor)['rows']
+    assert {row['id']: row['deleted'] for row in rows} == {1: False, 2: True}
+    assert rows[0]['enviado'] is True
+    assert mirror.stats()['tombstones'] == 1
+
+
+def test_fresh_sync_skips_tombstones(table, mirror):
+    table.insert('a')
+    table.insert('b')
+    mirror.sync(force=True)
+    del table.rows[1]
+    mirror.sync(force=True)
+
+    assert [row['id'] for row in mirror.changes()['rows']] == [2]
+
+
+def test_seq_is_shared_through_the_file(table, mirror):
+    table.insert('a')
+    mirror.sync(force=True)
+    other = app.ProductMirror(mirror.path, table.fetch_after, table.fetch_recent, sync_interval=0)
+    table.insert('b')
+    other.sync(force=True)
+    table.insert('c')
+    mirror.sync(force=True)
+
+    seqs = [int(mirror.changes(f"{mirror.epoch}-{n}", limit=1)['cursor'].split('-')[1]) for n in range(3)]
+    assert seqs == [1, 2, 3]
+
+
+def test_cursor_ahead_or_from_another_epoch_resets(table, mirror):
+    table.insert('a')
+    mirror.sync(force=True)
+
+    ahead = mirror.changes(f'{mirror.epoch}-99')
+    assert ahead['reset'] is True
+    assert [row['id'] for row in ahead['rows']] == [1]
+    assert mirror.changes('outroepoch-1')['reset'] is True
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+import app
+
+SHORT = 'https://amzn.to/3testKey'
+PRODUCT = 'https://www.amazon.com.br/dp/B0TESTKEY1'
+RESULT = {'title': 'Produto', 'price': 'R$ 10,00', 'image_url': 'https://img/x.jpg'}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app.scraper, 'follow_amazon_redirects', lambda url: calls.append('network') or (url, 'error'))
+    monkeypatch.setattr(app.RATE_LIMITER, 'acquire', lambda site: calls.append('rate_limit'))
+
+    def scrape_amazon(url):
+        # O scrape real resolve o link curto (depois do rate limiter) e grava no RESOLVE_CACHE
+        calls.append('scrape')
+        app.RESOLVE_CACHE.set(url, 'amazon', PRODUCT)
+        return {**RESULT, 'url': url, 'resolved_url': PRODUCT}
+
+    monkeypatch.setattr(app.scraper, 'scrape_amazon', scrape_amazon)
+    return calls
+
+
+def test_cache_key_never_goes_to_the_network(calls):
+    assert app.scraper.product_cache_key('amazon', SHORT + 'cold') is None
+    assert app.scraper.product_cache_key('amazon', PRODUCT) == 'amazon:B0TESTKEY1'
+    assert calls == []
+
+
+def test_cold_short_link_is_rate_limited_then_cached_under_its_product(calls):
+    first = app.scraper.scrape_product(SHORT)
+    assert calls == ['rate_limit', 'scrape']
+    assert app.RESULT_CACHE.contains('amazon:B0TESTKEY1')
+
+    second = app.scraper.scrape_product(SHORT)
+    assert calls == ['rate_limit', 'scrape']
+    assert second['cache_hit'] is True
+    assert first['title'] == second['title']
+
+
+def test_async_cache_key_uses_only_the_resolve_cache():
+    engine = app.ASYNC_ENGINE
+    app.RESOLVE_CACHE.set(SHORT + 'async', 'amazon', PRODUCT)
+    assert asyncio.run(engine.product_cache_key('amazon', SHORT + 'async')) == 'amazon:B0TESTKEY1'
+    assert asyncio.run(engine.product_cache_key('amazon', SHORT + 'unknown')) is None
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+import app
+from conftest import TEST_DATA_DIR
+
+
+class FlakySupabase:
+    """Aceita o lote mas responde com falha nas primeiras chamadas (timeout depois do commit)"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.rows = {}
+
+    def __call__(self, rows, timeout):
+        self.calls.append([row['save_id'] for row in rows])
+        for row in rows:
+            self.rows.setdefault(row['save_id'], row)
+        if self.failures:
+            self.failures -= 1
+            return 503, 'upstream timeout'
+        return 201, ''
+
+
+@pytest.fixture
+def spool_path(request):
+    path = os.path.join(TEST_DATA_DIR, f'spool-{request.node.name}.sqlite3')
+    yield path
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def make_spool(path, send_batch):
+    spool = app.SaveSpool(path, send_batch, retry_base=0, poll_interval=60, id_column='save_id')
+    # Sem o flusher em background: o teste dirige os envios com flush_once()
+    spool.start = lambda: None
+    return spool
+
+
+def test_retry_resends_the_same_ids(spool_path):
+    supabase = FlakySupabase(failures=2)
+    spool = make_spool(spool_path, supabase)
+    spool.enqueue({'mensagem': 'a', 'imagem_url': ''})
+    spool.enqueue({'mensagem': 'b', 'imagem_url': ''})
+
+    for _ in range(3):
+        spool.flush_once()
+
+    assert len(supabase.calls) == 3
+    assert supabase.calls[0] == supabase.calls[1] == supabase.calls[2]
+    assert len(set(supabase.calls[0])) == 2
+    assert len(supabase.rows) == 2
+    assert spool.stats()['depth'] == 0
+
+
+def test_enqueue_keeps_an_existing_id(spool_path):
+    supabase = FlakySupabase(failures=0)
+    spool = make_spool(spool_path, supabase)
+    spool.enqueue({'mensagem': 'a', 'save_id': 'fixo'})
+    spool.flush_once()
+    assert supabase.calls == [['fixo']]
+
+
+def test_permanent_error_isolates_the_bad_row(spool_path):
+    sent = []
+
+    def send_batch(rows, timeout):
+        sent.append(len(rows))
+        if any(row['mensagem'] == 'ruim' for row in rows):
+            return 400, 'invalid input'
+        return 201, ''
+
+    spool = make_spool(spool_path, send_batch)
+    for message in ('a', 'ruim', 'b'):
+        spool.enqueue({'mensagem': message})
+    spool.flush_once()
+
+    assert sent == [3, 1, 1, 1]
+    stats = spool.stats()
+    assert stats['depth'] == 0
+    assert stats['dead'] == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(app, 'SAVE_SPOOL_ENABLED', True)
+    monkeypatch.setattr(app.SAVE_SPOOL, 'enqueue', lambda payload: enqueued.append(payload) or len(enqueued))
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'teste'
+    client.enqueued = enqueued
+    return client
+
+
+def test_save_rejects_invalid_row_before_spooling(client):
+    response = client.post('/save', json={'product': {'image_url': 'javascript:alert(1)'}, 'message': 'oi'})
+    assert response.status_code == 400
+    assert response.get_json()['error_code'] == 'SAVE_INVALID'
+    assert client.enqueued == []
+
+
+def test_save_queues_valid_row(client):
+    response = client.post('/save', json={'product': {'image_url': 'https://img/x.jpg'}, 'message': 'oi'})
+    assert response.status_code == 200
+    assert response.get_json()['queued'] is True
+    assert client.enqueued[0]['imagem_url'] == 'https://img/x.jpg'